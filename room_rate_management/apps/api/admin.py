@@ -1,9 +1,77 @@
 from django.contrib import admin
 
-from apps.api.models import Discount, DiscountRoomRate, OverriddenRoomRate, RoomRate
+from apps.api.models import Discount, DiscountRoomRate, LowestRoomRateCalendar, OverriddenRoomRate, OverriddenRoomRateRange, RoomRate, RoomRateBestDiscount
+from apps.api.services.BestDiscountService import refresh_best_discounts
+from apps.api.services.LowestRoomRateCalendarService import refresh_lowest_room_rate_calendars
 
 # Register your models here.
-admin.site.register(RoomRate)
-admin.site.register(Discount)
-admin.site.register(OverriddenRoomRate)
-admin.site.register(DiscountRoomRate)
+
+class PricingInputAdmin(admin.ModelAdmin):
+    """
+        Admin of a model the lowest room rates are calculated from
+
+        Like the API views, saving or deleting recalculates the best discounts and the calendars of the rooms the
+        change touched, before and after the change.
+    """
+    refresh_discounts = False
+
+    def get_room_ids(self, obj):
+        return [obj.room_rate_id]
+
+    def refresh(self, room_ids):
+        room_ids = set(room_ids)
+        if self.refresh_discounts:
+            refresh_best_discounts(room_ids)
+        refresh_lowest_room_rate_calendars(room_ids)
+
+    def save_model(self, request, obj, form, change):
+        #a mapping or an override may be moved to another room, which needs refreshing as well
+        room_ids = set(self.get_room_ids(self.model.objects.get(pk=obj.pk))) if change else set()
+        super().save_model(request, obj, form, change)
+        self.refresh(room_ids | set(self.get_room_ids(obj)))
+
+    def delete_model(self, request, obj):
+        room_ids = list(self.get_room_ids(obj))
+        super().delete_model(request, obj)
+        self.refresh(room_ids)
+
+    def delete_queryset(self, request, queryset):
+        room_ids = [room_id for obj in queryset for room_id in self.get_room_ids(obj)]
+        super().delete_queryset(request, queryset)
+        self.refresh(room_ids)
+
+class DerivedDataAdmin(admin.ModelAdmin):
+    """
+        Read only admin of the data recalculated from the rates and discounts, edits would drift from them
+    """
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(RoomRate)
+class RoomRateAdmin(PricingInputAdmin):
+
+    def get_room_ids(self, obj):
+        return [obj.room_id]
+
+@admin.register(Discount)
+class DiscountAdmin(PricingInputAdmin):
+    refresh_discounts = True
+
+    def get_room_ids(self, obj):
+        return DiscountRoomRate.objects.filter(discount=obj).values_list('room_rate_id', flat=True)
+
+@admin.register(DiscountRoomRate)
+class DiscountRoomRateAdmin(PricingInputAdmin):
+    refresh_discounts = True
+
+admin.site.register(OverriddenRoomRate, PricingInputAdmin)
+admin.site.register(OverriddenRoomRateRange, PricingInputAdmin)
+admin.site.register(RoomRateBestDiscount, DerivedDataAdmin)
+admin.site.register(LowestRoomRateCalendar, DerivedDataAdmin)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RoomRateApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.api'
+
+    def ready(self):
+        import apps.api.signals  # noqa: F401
@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class LowestRoomRateCache:
+    """
+        In-process LRU cache with a time to live for the lowest room rate responses
+
+        Entries are keyed on (room_id, start_date, end_date) and can be invalidated per room.
+    """
+
+    def __init__(self, max_size=1024, timeout=300, timer=time.monotonic):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.timer = timer
+        self.entries = OrderedDict()
+        self.keys_by_room = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, room_id, start_date, end_date):
+        key = (room_id, start_date, end_date)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= self.timer():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, room_id, start_date, end_date, value):
+        key = (room_id, start_date, end_date)
+        with self.lock:
+            self.entries[key] = (self.timer() + self.timeout, value)
+            self.entries.move_to_end(key)
+            self.keys_by_room.setdefault(room_id, set()).add(key)
+
+            #evict the least recently used entries once the cache is full
+            while len(self.entries) > self.max_size:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate_rooms(self, room_ids):
+        with self.lock:
+            for room_id in room_ids:
+                for key in self.keys_by_room.pop(room_id, ()):
+                    self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_room.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _remove(self, key):
+        self.entries.pop(key, None)
+        room_keys = self.keys_by_room.get(key[0])
+        if room_keys is not None:
+            room_keys.discard(key)
+            if not room_keys:
+                del self.keys_by_room[key[0]]
+
+
+class SharedLowestRoomRateCache:
+    """
+        Lowest room rate cache stored in one of the Django CACHES, shared by all the workers and hosts
+
+        Every room has a version counter which is part of the keys of its entries. Invalidating a room
+        bumps the counter, so its old entries are never read again and simply expire. Clearing bumps a
+        generation counter which is part of every key in the same way, the backend may hold other keys.
+    """
+
+    def __init__(self, cache, timeout=300, key_prefix='lowest_room_rate'):
+        self.cache = cache
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, room_id, start_date, end_date):
+        value = self.cache.get(self._entry_key(room_id, start_date, end_date))
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, room_id, start_date, end_date, value):
+        self.cache.set(self._entry_key(room_id, start_date, end_date), value, self.timeout)
+
+    def invalidate_rooms(self, room_ids):
+        for room_id in room_ids:
+            self._bump(self._version_key(room_id))
+
+    def clear(self):
+        self._bump(self._generation_key())
+
+    def stats(self):
+        #the shared backends do not report evictions, the hits and misses are the ones of this process
+        with self.lock:
+            return {
+                "size": None,
+                "max_size": None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": None,
+            }
+
+    def _generation_key(self):
+        return f"{self.key_prefix}:generation"
+
+    def _version_key(self, room_id):
+        return f"{self.key_prefix}:version:{room_id}"
+
+    def _entry_key(self, room_id, start_date, end_date):
+        generation_key, version_key = self._generation_key(), self._version_key(room_id)
+        versions = self.cache.get_many([generation_key, version_key])
+        for key in (generation_key, version_key):
+            if key not in versions:
+                #add keeps the version another worker may have created in the meantime
+                self.cache.add(key, self._new_version(), None)
+                versions[key] = self.cache.get(key)
+        return f"{self.key_prefix}:{room_id}:{versions[generation_key]}:{versions[version_key]}:{start_date}:{end_date}"
+
+    def _bump(self, key):
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            #the counter was never set or has been evicted, start it again from a fresh value
+            self.cache.set(key, self._new_version(), None)
+
+    def _new_version(self):
+        #a time based start value keeps entries written before an evicted counter from being read again
+        return time.time_ns()
+
+
+def create_lowest_room_rate_cache(options):
+    if options.get('BACKEND', 'local') == 'django':
+        return SharedLowestRoomRateCache(
+            caches[options.get('ALIAS', 'default')],
+            timeout=options['TIMEOUT'],
+        )
+    return LowestRoomRateCache(
+        max_size=options['MAX_SIZE'],
+        timeout=options['TIMEOUT'],
+    )
+
+
+lowest_room_rate_cache = create_lowest_room_rate_cache(settings.LOWEST_ROOM_RATE_CACHE)
@@ -0,0 +1,133 @@
+import asyncio
+import random
+import statistics
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+
+from apps.api.models import RoomRate
+from apps.api.services.PricingBenchmarkService import BENCHMARK_START_DATE, seed_pricing_data
+
+
+class Command(BaseCommand):
+    help = ("Load tests the sync (WSGI) and the async (ASGI) lowest room rate views and compares their throughput. "
+        "Without --wsgi-url and --asgi-url both handlers are driven in-process, with them the requests go over HTTP "
+        "to running servers, e.g. gunicorn and uvicorn.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Number of requests per path")
+        parser.add_argument('--concurrency', type=int, default=16, help="Number of requests in flight")
+        parser.add_argument('--days', type=int, default=30, help="Length of the requested date ranges")
+        parser.add_argument('--search-rooms', type=int, default=10, help="Number of rooms per search request")
+        parser.add_argument('--seed-rooms', type=int, default=0, help="Seed this many synthetic rooms first and delete them afterwards")
+        parser.add_argument('--wsgi-url', help="Base URL of a WSGI server, e.g. http://127.0.0.1:8000")
+        parser.add_argument('--asgi-url', help="Base URL of an ASGI server, e.g. http://127.0.0.1:8001")
+
+    def handle(self, *args, **options):
+        if (options['wsgi_url'] is None) != (options['asgi_url'] is None):
+            raise CommandError("Pass both --wsgi-url and --asgi-url, or neither")
+
+        seeded_room_ids = []
+        if options['seed_rooms']:
+            seeded_room_ids = [room_rate.room_id for room_rate in seed_pricing_data(options['seed_rooms'], options['days'] * 4)]
+        try:
+            room_ids = seeded_room_ids or list(RoomRate.objects.order_by('room_id').values_list('room_id', flat=True)[:1000])
+            if not room_ids:
+                raise CommandError("No room rates to price, pass --seed-rooms")
+            #the requests are closed before the worker threads open their own connections
+            connections.close_all()
+
+            paths = self.get_paths(room_ids, options)
+            if options['wsgi_url']:
+                results = {
+                    "WSGI": self.run_http(options['wsgi_url'], paths, options['concurrency']),
+                    "ASGI": self.run_http(options['asgi_url'], [f"/api/async{path[4:]}" for path in paths], options['concurrency']),
+                }
+            else:
+                with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                    results = {
+                        "WSGI": self.run_wsgi(paths, options['concurrency']),
+                        "ASGI": asyncio.run(self.run_asgi([f"/api/async{path[4:]}" for path in paths], options['concurrency'])),
+                    }
+        finally:
+            if seeded_room_ids:
+                RoomRate.objects.filter(room_id__in=seeded_room_ids).delete()
+
+        for name, (seconds, latencies) in results.items():
+            self.stdout.write(
+                f"{name}: {len(latencies) / seconds:8.1f} requests/s, median {statistics.median(latencies):7.2f} ms, "
+                f"p95 {sorted(latencies)[int(len(latencies) * 0.95) - 1]:7.2f} ms over {len(latencies)} requests"
+            )
+
+    def get_paths(self, room_ids, options):
+        #every request asks for another date range, so the lowest room rate cache does not answer them
+        random.seed(0)
+        paths = []
+        for index in range(options['requests']):
+            start_date = BENCHMARK_START_DATE + timedelta(days=index)
+            end_date = start_date + timedelta(days=options['days'] - 1)
+            dates = f"start_date={start_date.isoformat()}&end_date={end_date.isoformat()}"
+            if index % 2:
+                search_room_ids = random.sample(room_ids, min(options['search_rooms'], len(room_ids)))
+                paths.append(f"/api/LowestRoomRates/?{dates}&room_ids={','.join(str(room_id) for room_id in search_room_ids)}")
+            else:
+                paths.append(f"/api/LowestRoomRates/{random.choice(room_ids)}?{dates}")
+        return paths
+
+    def timed(self, send, path):
+        started = time.perf_counter()
+        status_code = send(path)
+        if status_code != 200:
+            raise CommandError(f"{path} returned {status_code}")
+        return (time.perf_counter() - started) * 1000
+
+    def run_wsgi(self, paths, concurrency):
+        local = threading.local()
+
+        def send(path):
+            #one test client per worker thread, each thread has its own database connection
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            return local.client.get(path).status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            latencies = list(executor.map(lambda path: self.timed(send, path), paths))
+        seconds = time.perf_counter() - started
+        connections.close_all()
+        return seconds, latencies
+
+    async def run_asgi(self, paths, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(path):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path)
+                if response.status_code != 200:
+                    raise CommandError(f"{path} returned {response.status_code}")
+                return (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(send(path) for path in paths))
+        return time.perf_counter() - started, latencies
+
+    def run_http(self, base_url, paths, concurrency):
+        def send(path):
+            with urllib.request.urlopen(base_url.rstrip('/') + path) as response:
+                response.read()
+                return response.status
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            latencies = list(executor.map(lambda path: self.timed(send, path), paths))
+        return time.perf_counter() - started, latencies
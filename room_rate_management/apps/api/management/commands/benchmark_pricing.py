@@ -0,0 +1,66 @@
+import json
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from apps.api.services.PricingBenchmarkService import compare_pricing_benchmarks, run_pricing_benchmark, seed_pricing_data
+
+
+def integer_list(value):
+    return [int(item) for item in value.split(',')]
+
+
+class Command(BaseCommand):
+    help = ("Seeds synthetic rooms, overrides and discounts and measures the latency, query count and peak memory "
+        "of the pricing service and endpoints. The seeded rows are rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=integer_list, default=[1, 10, 100], help="Comma separated room counts of the multi room scenarios")
+        parser.add_argument('--days', type=integer_list, default=[7, 30, 365], help="Comma separated date range lengths")
+        parser.add_argument('--override-ratio', type=float, default=0.3, help="Share of the nights with an overridden rate")
+        parser.add_argument('--discounts', type=int, default=20, help="Number of discounts")
+        parser.add_argument('--repeat', type=int, default=5, help="Number of timed calls per scenario")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed")
+        parser.add_argument('--output', help="File to save the results to as JSON")
+        parser.add_argument('--baseline', help="JSON results of an earlier run to compare with")
+
+    def handle(self, *args, **options):
+        room_counts, day_counts = options['rooms'], options['days']
+        if min(room_counts) < 1 or min(day_counts) < 1 or options['repeat'] < 1:
+            raise CommandError("Room counts, day counts and repeat must be positive")
+        if connection.vendor != 'sqlite':
+            self.stderr.write(self.style.WARNING(f"Benchmarking against {connection.vendor}, results are only comparable between runs on the same database"))
+
+        with transaction.atomic():
+            room_rates = seed_pricing_data(max(room_counts), max(day_counts), options['override_ratio'], options['discounts'], options['seed'])
+            results = run_pricing_benchmark(room_rates, room_counts, day_counts, options['repeat'])
+            transaction.set_rollback(True)
+
+        for result in results:
+            self.stdout.write(
+                f"{result['scenario']:<40} rooms={result['rooms']:<5} days={result['days'] or '-':<5} "
+                f"median={result['latency_ms']['median']:>9.2f} ms queries={result['queries']:<3} peak={result['peak_memory_kb']:>9.1f} KiB"
+            )
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Compared with {options['baseline']}"))
+            for comparison in compare_pricing_benchmarks(results, baseline['results']):
+                (old_ms, new_ms), (old_queries, new_queries), (old_memory, new_memory) = comparison['median_ms'], comparison['queries'], comparison['peak_memory_kb']
+                self.stdout.write(
+                    f"{comparison['scenario']:<40} rooms={comparison['rooms']:<5} days={comparison['days'] or '-':<5} "
+                    f"median {old_ms:.2f} -> {new_ms:.2f} ms, queries {old_queries} -> {new_queries}, peak {old_memory:.1f} -> {new_memory:.1f} KiB"
+                )
+
+        if options['output']:
+            report = {
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "database": connection.vendor,
+                "options": {key: options[key] for key in ('rooms', 'days', 'override_ratio', 'discounts', 'repeat', 'seed')},
+                "results": results,
+            }
+            with open(options['output'], 'w') as output_file:
+                json.dump(report, output_file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results saved to {options['output']}"))
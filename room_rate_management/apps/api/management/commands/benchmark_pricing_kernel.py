@@ -0,0 +1,68 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.api.models import RoomRate
+from apps.api.services import PricingKernelService
+from apps.api.services.LowestRoomRateService import calculate_lowest_room_rates
+
+
+class Command(BaseCommand):
+    help = "Compares the NumPy pricing kernel with the Decimal loop on synthetic in-memory rates"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=200, help="Number of rooms")
+        parser.add_argument('--days', type=int, default=730, help="Number of days in the date range")
+        parser.add_argument('--override-ratio', type=float, default=0.3, help="Share of the nights with an overridden rate")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed")
+
+    def handle(self, *args, **options):
+        if not PricingKernelService.is_available():
+            raise CommandError("numpy is not installed")
+
+        rooms, days = options['rooms'], options['days']
+        random.seed(options['seed'])
+        start_date = date(2024, 1, 1)
+        end_date = start_date + timedelta(days=days - 1)
+
+        #unsaved rooms with random rates, overrides and discounts, the database is not used
+        room_rates = [RoomRate(room_id=room_id, room_name=f"room {room_id}", default_rate=self.random_amount(50, 500)) for room_id in range(1, rooms + 1)]
+        overridden_rates = {
+            room_rate.room_id: {
+                start_date + timedelta(days=day): self.random_amount(40, 600)
+                for day in range(days) if random.random() < options['override_ratio']
+            }
+            for room_rate in room_rates
+        }
+        best_discounts = {room_rate.room_id: (self.random_amount(0, 60), self.random_amount(0, 40)) for room_rate in room_rates}
+
+        started = time.perf_counter()
+        decimal_rates = [
+            [lowest_room_rate["lowest_rate"] for lowest_room_rate in calculate_lowest_room_rates(room_rate.default_rate, overridden_rates[room_rate.room_id], *best_discounts[room_rate.room_id], start_date, end_date)]
+            for room_rate in room_rates
+        ]
+        decimal_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        kernel_rates = PricingKernelService.price_rooms(room_rates, overridden_rates, best_discounts, start_date, end_date)
+        kernel_seconds = time.perf_counter() - started
+
+        mismatches = sum(
+            PricingKernelService.from_cents(kernel_rate) != decimal_rate
+            for room_kernel_rates, room_decimal_rates in zip(kernel_rates.tolist(), decimal_rates)
+            for kernel_rate, decimal_rate in zip(room_kernel_rates, room_decimal_rates)
+        )
+
+        self.stdout.write(f"rooms x days: {rooms} x {days} = {rooms * days}")
+        self.stdout.write(f"decimal loop: {decimal_seconds * 1000:.1f} ms")
+        self.stdout.write(f"numpy kernel: {kernel_seconds * 1000:.1f} ms")
+        self.stdout.write(f"speedup:      {decimal_seconds / kernel_seconds:.1f}x")
+        if mismatches:
+            raise CommandError(f"{mismatches} rates differ between the kernel and the Decimal loop")
+        self.stdout.write(self.style.SUCCESS("kernel rates match the Decimal loop to the cent"))
+
+    def random_amount(self, low, high):
+        return Decimal(random.randint(low * 100, high * 100)) / 100
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.api.renderers import orjson
+from apps.api.services.PricingBenchmarkService import run_serializer_benchmark
+
+
+class Command(BaseCommand):
+    help = ("Compares the per row cost of the DRF serializers and the fast serialization paths of the lowest room rate, "
+        "room rate and overridden room rate responses on synthetic data. The seeded rows are rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help="Number of rows of every scenario")
+        parser.add_argument('--repeat', type=int, default=5, help="Number of timed calls per scenario")
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['repeat'] < 1:
+            raise CommandError("Rows and repeat must be positive")
+        if orjson is None:
+            self.stderr.write(self.style.WARNING("orjson is not installed, the fast paths render with the JSONRenderer"))
+
+        with transaction.atomic():
+            results = run_serializer_benchmark(options['rows'], options['repeat'])
+            transaction.set_rollback(True)
+
+        for result in results:
+            self.stdout.write(
+                f"{result['scenario']:<20} {result['path']:<10} rows={result['rows']:<7} per row={result['per_row_us']:>8.3f} us "
+                f"median={result['latency_ms']['median']:>9.2f} ms peak={result['peak_memory_kb']:>9.1f} KiB"
+            )
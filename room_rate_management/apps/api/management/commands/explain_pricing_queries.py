@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.api.models import RoomRate
+from apps.api.services.LowestRoomRateCalendarService import get_calendar_horizon, get_calendar_lowest_room_rates
+from apps.api.services.LowestRoomRateService import get_lowest_room_rates, rank_rooms_by_total_rate
+from apps.api.services.LowestRoomRateStreamService import stream_lowest_room_rates, stream_lowest_room_rates_for_rooms
+
+
+class Command(BaseCommand):
+    help = "Prints the SQL and the query plan of every query the lowest room rate pricing runs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--room-id', type=int, help="Room to price, the first room if not given")
+        parser.add_argument('--days', type=int, default=30, help="Number of days in the date range, starting today")
+
+    def handle(self, *args, **options):
+        room_rate = RoomRate.objects.filter(room_id=options['room_id']) if options['room_id'] else RoomRate.objects.order_by('room_id')
+        room_rate = room_rate.first()
+        if room_rate is None:
+            raise CommandError("No room rate to price")
+
+        start_date = datetime.combine(get_calendar_horizon()[0], datetime.min.time())
+        end_date = start_date + timedelta(days=options['days'] - 1)
+        pricing_paths = [
+            ("lowest room rates", lambda: get_lowest_room_rates(room_rate, start_date, end_date)),
+            ("precomputed calendar", lambda: get_calendar_lowest_room_rates(room_rate, start_date, end_date)),
+            ("streamed lowest room rates", lambda: list(stream_lowest_room_rates(room_rate, start_date, end_date))),
+            ("streamed search", lambda: [list(lowest_room_rates) for room, lowest_room_rates in stream_lowest_room_rates_for_rooms(RoomRate.objects.all(), start_date, end_date)]),
+            ("total rate ranking", lambda: rank_rooms_by_total_rate(RoomRate.objects.filter(room_id=room_rate.room_id), start_date, end_date)),
+        ]
+
+        #SQLite prints the plan with EXPLAIN QUERY PLAN, MySQL and PostgreSQL with EXPLAIN
+        explain = "EXPLAIN QUERY PLAN " if connection.vendor == 'sqlite' else "EXPLAIN "
+        for name, price in pricing_paths:
+            with CaptureQueriesContext(connection) as queries:
+                price()
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name}: {len(queries)} queries"))
+            for query in queries.captured_queries:
+                self.stdout.write(query['sql'])
+                with connection.cursor() as cursor:
+                    cursor.execute(explain + query['sql'])
+                    for row in cursor.fetchall():
+                        self.stdout.write("    " + " | ".join(str(column) for column in row))
+                self.stdout.write("")
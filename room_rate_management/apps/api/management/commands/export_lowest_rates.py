@@ -0,0 +1,56 @@
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.api.services.LowestRoomRateCalendarService import get_calendar_horizon
+from apps.api.models import RoomRate
+from apps.api.services.LowestRoomRateExportService import iter_lowest_room_rate_batches, write_lowest_room_rates_columnar, write_lowest_room_rates_csv
+from apps.api.services.LowestRoomRateService import pricing_process_pool, use_process_pool
+
+
+class Command(BaseCommand):
+    help = ("Exports the daily lowest rates of every room for a date range to CSV or to a compact columnar binary file. "
+        "The rooms are priced and written a batch at a time, so the memory used does not grow with the number of rows.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['csv', 'columnar'], default='csv', help="Output format")
+        parser.add_argument('--output', default='-', help="File to write to, - writes CSV to stdout")
+        parser.add_argument('--start-date', help="First stay date as YYYY-MM-DD, today if not given")
+        parser.add_argument('--days', type=int, default=settings.LOWEST_ROOM_RATE_CALENDAR_DAYS, help="Number of days to export")
+        parser.add_argument('--rooms-per-batch', type=int, default=100, help="Number of rooms priced together")
+        parser.add_argument('--chunk-size', type=int, default=settings.LOWEST_ROOM_RATE_STREAM_CHUNK_SIZE, help="Number of rows read from the database at a time")
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['rooms_per_batch'] < 1 or options['chunk_size'] < 1:
+            raise CommandError("Days, rooms per batch and chunk size must be positive")
+        if options['format'] == 'columnar' and options['output'] == '-':
+            raise CommandError("Pass --output to write the columnar format")
+        try:
+            start_date = datetime.strptime(options['start_date'], '%Y-%m-%d').date() if options['start_date'] else get_calendar_horizon()[0]
+        except ValueError:
+            raise CommandError("Invalid date format. Use YYYY-MM-DD.")
+        end_date = start_date + timedelta(days=options['days'] - 1)
+
+        started = time.perf_counter()
+        with pricing_process_pool() as process_pool:
+            #small exports are priced in-process, starting the workers costs more
+            if not use_process_pool(process_pool, RoomRate.objects.count(), start_date, end_date):
+                process_pool = None
+            batches = iter_lowest_room_rate_batches(start_date, end_date, options['rooms_per_batch'], options['chunk_size'], process_pool)
+            if options['format'] == 'columnar':
+                with open(options['output'], 'wb') as output:
+                    rows = write_lowest_room_rates_columnar(output, batches, start_date, end_date)
+            elif options['output'] == '-':
+                rows = write_lowest_room_rates_csv(self.stdout, batches)
+            else:
+                with open(options['output'], 'w', newline='') as output:
+                    rows = write_lowest_room_rates_csv(output, batches)
+        seconds = time.perf_counter() - started
+
+        #the report goes to stderr when the rates are written to stdout
+        report = self.stderr if options['output'] == '-' else self.stdout
+        report.write(self.style.SUCCESS(
+            f"Exported {rows} lowest room rates from {start_date} to {end_date} in {seconds:.2f} s ({rows / seconds if seconds else 0:.0f} rows/s)"
+        ))
@@ -0,0 +1,53 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.api.services.RateImportService import IMPORT_MODELS, import_rates, iter_csv_rows, iter_jsonl_rows
+
+
+class Command(BaseCommand):
+    help = ("Imports room rates, overridden room rates or discounts from a CSV file with a header line or a JSONL file. "
+        "The columns are the fields of the POST endpoints. The rows are validated and bulk inserted in chunks, one "
+        "transaction per chunk, and rejected rows are reported without stopping the import.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(IMPORT_MODELS), help="What the file holds")
+        parser.add_argument('path', help="CSV or JSONL file to import")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="File format, taken from the file extension if not given")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Number of rows validated and written together")
+        parser.add_argument('--rejects', help="File to write the rejected rows to as JSON lines with the line number and the errors")
+        parser.add_argument('--no-refresh', action='store_true', help="Do not refresh the lowest room rate calendars of the written rooms, e.g. when rebuild_lowest_room_rate_calendar runs afterwards")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("Chunk size must be positive")
+        file_format = options['format'] or ('csv' if options['path'].lower().endswith('.csv') else 'jsonl')
+
+        rejects_file = open(options['rejects'], 'w') if options['rejects'] else None
+        reported_rejects = []
+
+        def on_reject(line_number, errors):
+            if rejects_file is not None:
+                rejects_file.write(json.dumps({"line":line_number,"errors":errors}) + "\n")
+            #only the first rejected rows are printed, all of them are in the rejects file
+            if len(reported_rejects) < 10:
+                reported_rejects.append((line_number, errors))
+
+        started = time.perf_counter()
+        try:
+            with open(options['path'], newline='' if file_format == 'csv' else None) as input_file:
+                rows = iter_csv_rows(input_file) if file_format == 'csv' else iter_jsonl_rows(input_file)
+                report = import_rates(options['kind'], rows, options['chunk_size'], on_reject, refresh=not options['no_refresh'])
+        finally:
+            if rejects_file is not None:
+                rejects_file.close()
+        seconds = time.perf_counter() - started
+
+        for line_number, errors in reported_rejects:
+            self.stderr.write(f"Line {line_number} rejected: {json.dumps(errors)}")
+        style = self.style.SUCCESS if not report['rejected'] else self.style.WARNING
+        self.stdout.write(style(
+            f"Imported {report['imported']} of {report['rows']} {options['kind'].replace('_', ' ')}, {report['rejected']} rejected, "
+            f"in {seconds:.2f} s ({report['rows'] / seconds if seconds else 0:.0f} rows/s)"
+        ))
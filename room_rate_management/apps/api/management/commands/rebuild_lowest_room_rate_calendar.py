@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.api.services.LowestRoomRateCalendarService import get_calendar_horizon, rebuild_lowest_room_rate_calendar
+from apps.api.services.LowestRoomRateService import pricing_process_pool
+
+
+class Command(BaseCommand):
+    help = "Recalculates the precomputed lowest room rates of every room for the calendar horizon"
+
+    def handle(self, *args, **options):
+        with pricing_process_pool() as process_pool:
+            rebuild_lowest_room_rate_calendar(process_pool)
+        horizon_start, horizon_end = get_calendar_horizon()
+        self.stdout.write(self.style.SUCCESS(f"Lowest room rate calendar rebuilt from {horizon_start} to {horizon_end}"))
@@ -0,0 +1,161 @@
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+request_timings = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """
+        SQL count and durations in seconds recorded for one request
+    """
+
+    def __init__(self):
+        self.sql_count = 0
+        self.durations = {}
+        self.view_started = None
+
+    def add(self, name, duration):
+        self.durations[name] = self.durations.get(name, 0) + duration
+
+    def record_query(self, execute, sql, params, many, context):
+        #database execute wrapper, counts and times every query without DEBUG's query log
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.add('sql', time.perf_counter() - started)
+
+    def end_view(self):
+        if self.view_started is not None:
+            self.add('view', time.perf_counter() - self.view_started)
+            self.view_started = None
+
+
+"""
+    Adds the time spent in the block to the timings of the current request
+
+    Does nothing when the request timing is switched off.
+
+Parameters:
+    name (str): The name of the timing, e.g. "serializer".
+"""
+@contextmanager
+def record_timing(name):
+    timings = request_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+class RequestTimingMiddleware:
+    """
+        Records the SQL count, the SQL time, the view time, the serializer time and the render time of every request
+
+        The timings are sent as a Server-Timing header and logged as one JSON line. The middleware is switched on by
+        REQUEST_TIMING['ENABLED'] independently of DEBUG, and removes itself from the chain when it is off. The body
+        of a streaming response is produced after the middleware returned, so its queries are not counted.
+        It works both in the sync and the async chain, so the async views are not moved onto a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            with self.record_queries(timings):
+                response = self.get_response(request)
+            #responses which are not rendered end their view here
+            timings.end_view()
+        finally:
+            request_timings.reset(token)
+        return self.finish(request, response, timings, started)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            #the async ORM runs the queries in the thread of the request's sync_to_async calls, which has its own
+            #connections, so the query wrappers are added and removed in that thread
+            queries = await sync_to_async(self.record_queries)(timings)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(queries.close)()
+            timings.end_view()
+        finally:
+            request_timings.reset(token)
+        return self.finish(request, response, timings, started)
+
+    def record_queries(self, timings):
+        #the wrappers are added to the connections of the calling thread, the returned stack removes them
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timings.record_query))
+        return stack
+
+    def finish(self, request, response, timings, started):
+        timings.add('total', time.perf_counter() - started)
+
+        if settings.REQUEST_TIMING['SERVER_TIMING_HEADER']:
+            response['Server-Timing'] = self.server_timing(timings)
+        if settings.REQUEST_TIMING['LOG']:
+            logger.info(json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "sql_count": timings.sql_count,
+                **{f"{name}_ms": round(duration * 1000, 3) for name, duration in timings.durations.items()},
+            }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = request_timings.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        #DRF responses are rendered after the view returned, the rendering is timed separately
+        timings = request_timings.get()
+        if timings is not None:
+            timings.end_view()
+            render_started = time.perf_counter()
+            response.add_post_render_callback(lambda response: timings.add('render', time.perf_counter() - render_started))
+        return response
+
+    def server_timing(self, timings):
+        metrics = []
+        for name, duration in timings.durations.items():
+            description = f';desc="{timings.sql_count} queries"' if name == 'sql' else ''
+            metrics.append(f"{name};dur={duration * 1000:.3f}{description}")
+        if 'sql' not in timings.durations:
+            metrics.append('sql;dur=0.000;desc="0 queries"')
+        return ", ".join(metrics)
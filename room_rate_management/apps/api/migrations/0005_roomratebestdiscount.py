@@ -0,0 +1,45 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def populate_best_discounts(apps, schema_editor):
+    DiscountRoomRate = apps.get_model('api', 'DiscountRoomRate')
+    RoomRateBestDiscount = apps.get_model('api', 'RoomRateBestDiscount')
+
+    best_discounts = {}
+    max_discounts = (
+        DiscountRoomRate.objects.values('room_rate_id', 'discount__discount_type')
+        .annotate(max_discount_value=Max('discount__discount_value'))
+    )
+    for max_discount in max_discounts:
+        best_discount = best_discounts.setdefault(
+            max_discount['room_rate_id'],
+            RoomRateBestDiscount(room_rate_id=max_discount['room_rate_id']),
+        )
+        if max_discount['discount__discount_type'] == 'fixed':
+            best_discount.max_fixed_discount = max_discount['max_discount_value']
+        else:
+            best_discount.max_percentage_discount = max_discount['max_discount_value']
+    RoomRateBestDiscount.objects.bulk_create(best_discounts.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_alter_overriddenroomrate_unique_together'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomRateBestDiscount',
+            fields=[
+                ('room_rate', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='best_discount', serialize=False, to='api.roomrate')),
+                ('max_fixed_discount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('max_percentage_discount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+            ],
+        ),
+        migrations.RunPython(populate_best_discounts, migrations.RunPython.noop),
+    ]
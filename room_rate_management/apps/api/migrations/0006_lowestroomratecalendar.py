@@ -0,0 +1,26 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_roomratebestdiscount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowestRoomRateCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stay_date', models.DateField()),
+                ('lowest_rate', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('room_rate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.roomrate')),
+            ],
+            options={
+                'unique_together': {('room_rate', 'stay_date')},
+            },
+        ),
+    ]
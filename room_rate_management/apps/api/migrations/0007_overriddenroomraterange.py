@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_lowestroomratecalendar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverriddenRoomRateRange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('weekdays', models.PositiveSmallIntegerField(default=127, help_text='Bit mask of the weekdays the rate applies to, bit 0 is Monday and bit 6 is Sunday')),
+                ('overridden_rate', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('room_rate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.roomrate')),
+            ],
+        ),
+    ]
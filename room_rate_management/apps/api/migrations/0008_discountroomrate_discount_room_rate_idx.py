@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_overriddenroomraterange'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='discountroomrate',
+            index=models.Index(fields=['discount', 'room_rate'], name='discount_room_rate_idx'),
+        ),
+    ]
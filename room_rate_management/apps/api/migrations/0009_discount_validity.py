@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_discountroomrate_discount_room_rate_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discount',
+            name='valid_from',
+            field=models.DateField(blank=True, help_text='First stay date the discount applies to, no limit if empty', null=True),
+        ),
+        migrations.AddField(
+            model_name='discount',
+            name='valid_to',
+            field=models.DateField(blank=True, help_text='Last stay date the discount applies to, no limit if empty', null=True),
+        ),
+        migrations.AddField(
+            model_name='discount',
+            name='weekdays',
+            field=models.PositiveSmallIntegerField(default=127, help_text='Bit mask of the stay weekdays the discount applies to, bit 0 is Monday and bit 6 is Sunday'),
+        ),
+        migrations.AddField(
+            model_name='roomratebestdiscount',
+            name='has_dated_discounts',
+            field=models.BooleanField(default=False),
+        ),
+    ]
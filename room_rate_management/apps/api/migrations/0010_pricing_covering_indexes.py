@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_discount_validity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lowestroomratecalendar',
+            index=models.Index(fields=['room_rate', 'stay_date', 'lowest_rate'], name='calendar_rate_covering_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='overriddenroomrate',
+            index=models.Index(fields=['room_rate', 'stay_date', 'overridden_rate'], name='overridden_rate_covering_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='overriddenroomraterange',
+            index=models.Index(fields=['room_rate', 'start_date', 'end_date', 'weekdays', 'overridden_rate'], name='range_rate_covering_idx'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 
+#bit mask of the weekdays a dated rate or discount applies to, bit 0 is Monday and bit 6 is Sunday
+ALL_WEEKDAYS = 0b1111111
 # Create your models here.
 class RoomRate(models.Model):
     room_id = models.AutoField(primary_key=True)
@@ -17,11 +19,14 @@ class OverriddenRoomRate(models.Model):
 
     class Meta:
         unique_together = ('room_rate', 'stay_date')
+        #covers the lowest room rate lookups, which only read the rate, so they never touch the table
+        indexes = [models.Index(fields=['room_rate','stay_date','overridden_rate'],name='overridden_rate_covering_idx')]
 
     def __str__(self) -> str:
         return f"{self.room_rate.room_name} - {self.stay_date}"
 
 class Discount(models.Model):
+    ALL_WEEKDAYS = ALL_WEEKDAYS
     FIXED = 'fixed'
     PERCENTAGE = 'percentage'
 
@@ -39,6 +44,12 @@ class Discount(models.Model):
         default=FIXED,
     )
     discount_value = models.DecimalField(max_digits=10, decimal_places=2)
+    valid_from = models.DateField(null=True, blank=True, help_text="First stay date the discount applies to, no limit if empty")
+    valid_to = models.DateField(null=True, blank=True, help_text="Last stay date the discount applies to, no limit if empty")
+    weekdays = models.PositiveSmallIntegerField(
+        default=ALL_WEEKDAYS,
+        help_text="Bit mask of the stay weekdays the discount applies to, bit 0 is Monday and bit 6 is Sunday",
+    )
 
     def __str__(self) -> str:
         return f"{self.discount_id} - {self.discount_name}"
@@ -49,10 +60,48 @@ class DiscountRoomRate(models.Model):
 
     class Meta:
         unique_together = ('room_rate', 'discount')
+        #the unique key serves the lookups by room, this index serves the lookups by discount
+        indexes = [models.Index(fields=['discount','room_rate'],name='discount_room_rate_idx')]
 
     def __str__(self) -> str:
         return f"{self.room_rate.room_name} {self.room_rate.room_id} - {self.discount.discount_name} {self.discount.discount_id}"
 
+class RoomRateBestDiscount(models.Model):
+    room_rate = models.OneToOneField(RoomRate,on_delete=models.CASCADE,primary_key=True,related_name='best_discount')
+    max_fixed_discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    max_percentage_discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    #the maximums only cover the discounts which apply to every stay date, dated discounts are resolved per day
+    has_dated_discounts = models.BooleanField(default=False)
+
+    def __str__(self) -> str:
+        return f"{self.room_rate_id} - {self.max_fixed_discount} / {self.max_percentage_discount}%"
+
+class LowestRoomRateCalendar(models.Model):
+    room_rate = models.ForeignKey(RoomRate,on_delete=models.CASCADE)
+    stay_date = models.DateField()
+    lowest_rate = models.DecimalField(decimal_places=2, max_digits=10)
+
+    class Meta:
+        unique_together = ('room_rate', 'stay_date')
+        indexes = [models.Index(fields=['room_rate','stay_date','lowest_rate'],name='calendar_rate_covering_idx')]
+
+    def __str__(self) -> str:
+        return f"{self.room_rate_id} - {self.stay_date} - {self.lowest_rate}"
 
+class OverriddenRoomRateRange(models.Model):
+    ALL_WEEKDAYS = ALL_WEEKDAYS
 
-    
+    room_rate = models.ForeignKey(RoomRate,on_delete=models.CASCADE)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    weekdays = models.PositiveSmallIntegerField(
+        default=ALL_WEEKDAYS,
+        help_text="Bit mask of the weekdays the rate applies to, bit 0 is Monday and bit 6 is Sunday",
+    )
+    overridden_rate = models.DecimalField(decimal_places=2, max_digits=10)
+
+    class Meta:
+        indexes = [models.Index(fields=['room_rate','start_date','end_date','weekdays','overridden_rate'],name='range_rate_covering_idx')]
+
+    def __str__(self) -> str:
+        return f"{self.room_rate_id} - {self.start_date} to {self.end_date} - {self.overridden_rate}"
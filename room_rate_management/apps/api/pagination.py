@@ -0,0 +1,132 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import Q
+from drf_yasg import openapi
+
+
+class InvalidPage(Exception):
+    pass
+
+
+class KeysetPaginator:
+    """
+        Keyset pagination over one or more unique, ordered fields
+
+        A page is read with a WHERE on the key of the last row of the previous page, so every page costs the same
+        index range scan no matter how deep it is, unlike LIMIT/OFFSET. The key of the last row is handed to the
+        client as an opaque cursor.
+    """
+
+    def __init__(self, model, key_fields):
+        self.model = model
+        self.key_fields = key_fields
+        self.default_page_size = settings.KEYSET_PAGINATION['DEFAULT_PAGE_SIZE']
+        self.max_page_size = settings.KEYSET_PAGINATION['MAX_PAGE_SIZE']
+
+    def is_requested(self, request):
+        #the list endpoints stay unpaginated unless the client asks for a page
+        query_params = self.get_query_params(request)
+        return 'page_size' in query_params or 'cursor' in query_params
+
+    def paginate(self, request, queryset):
+        page_size, queryset = self.get_page(request, queryset)
+        return self.split_page(list(queryset), page_size)
+
+    async def apaginate(self, request, queryset):
+        page_size, queryset = self.get_page(request, queryset)
+        return self.split_page([row async for row in queryset], page_size)
+
+    def get_query_params(self, request):
+        #DRF requests have query_params, the async views get plain Django requests
+        return getattr(request, 'query_params', request.GET)
+
+    def get_page(self, request, queryset):
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.key_fields)
+
+        cursor = self.get_query_params(request).get('cursor')
+        if cursor:
+            queryset = queryset.filter(self.after(self.decode_cursor(cursor)))
+        return page_size, queryset[:page_size + 1]
+
+    def split_page(self, rows, page_size):
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = self.encode_cursor(rows[-1])
+        return rows, next_cursor
+
+    def get_page_size(self, request):
+        page_size = self.get_query_params(request).get('page_size')
+        if page_size is None:
+            return self.default_page_size
+        try:
+            page_size = int(page_size)
+        except ValueError:
+            raise InvalidPage("Invalid page size. Use a positive integer.")
+        if page_size < 1:
+            raise InvalidPage("Invalid page size. Use a positive integer.")
+        return min(page_size, self.max_page_size)
+
+    def after(self, key):
+        #(a, b) > (x, y) is written as a > x OR (a = x AND b > y) so that every database can use the index
+        condition = Q()
+        for index, field in enumerate(self.key_fields):
+            step = Q(**{f"{field}__gt": key[index]})
+            for previous_field, previous_value in zip(self.key_fields[:index], key[:index]):
+                step &= Q(**{previous_field: previous_value})
+            condition |= step
+        return condition
+
+    def encode_cursor(self, row):
+        key = [self.get_value(row, field) for field in self.key_fields]
+        key = [value.isoformat() if hasattr(value, 'isoformat') else value for value in key]
+        return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(key, list) or len(key) != len(self.key_fields):
+                raise ValueError
+            return [self.to_key_value(field, value) for field, value in zip(self.key_fields, key)]
+        except (ValueError, TypeError, ValidationError):
+            raise InvalidPage("Invalid cursor")
+
+    def to_key_value(self, field, value):
+        #encode_cursor writes integers as JSON numbers and everything else as strings, a tampered cursor may not
+        #smuggle in nulls, floats, booleans or containers that the key lookups would choke on or silently coerce
+        field = self.model._meta.get_field(field)
+        field = getattr(field, 'target_field', field)
+        expected_type = int if isinstance(field, models.IntegerField) else str
+        if type(value) is not expected_type:
+            raise ValueError
+        return field.to_python(value)
+
+    def get_value(self, row, field):
+        if isinstance(row, dict):
+            return row[field]
+        return getattr(row, self.model._meta.get_field(field).attname)
+
+
+pagination_parameters = [
+    openapi.Parameter(
+        name="page_size",
+        in_=openapi.IN_QUERY,
+        type=openapi.TYPE_INTEGER,
+        description="Number of rows per page. When page_size or cursor is given the response is a page "
+            "{\"results\": [...], \"next_cursor\": \"...\"} instead of the full list",
+        required=False,
+        example=100,
+    ),
+    openapi.Parameter(
+        name="cursor",
+        in_=openapi.IN_QUERY,
+        type=openapi.TYPE_STRING,
+        description="The next_cursor of the previous page",
+        required=False,
+    ),
+]
@@ -0,0 +1,29 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional dependency
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+        JSONRenderer which encodes with orjson when it is installed
+
+        Only set on the fast path read views, whose data holds strings, integers, None, lists and dicts. orjson writes
+        the same compact, non-ASCII-escaped JSON as the JSONRenderer with the default COMPACT_JSON and UNICODE_JSON
+        settings for such data, so the responses stay byte-identical. orjson formats floats and datetimes differently
+        and renders non-finite floats as null, so it is not the default renderer. Indented responses, other settings
+        and data which orjson can not encode, like Decimals, lazy strings or non-string keys, are rendered by the
+        JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        #the JSONRenderer escapes the line and paragraph separators so that the JSON is a strict JavaScript subset
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
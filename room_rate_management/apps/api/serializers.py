@@ -1,6 +1,8 @@
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import serializers
 
-from apps.api.models import Discount, DiscountRoomRate, OverriddenRoomRate, RoomRate
+from apps.api.models import Discount, DiscountRoomRate, OverriddenRoomRate, OverriddenRoomRateRange, RoomRate
 
 
 class RoomRateSerializer(serializers.ModelSerializer):
@@ -20,16 +22,45 @@ class OverriddenRoomRateUpdateSerializer(serializers.ModelSerializer):
         model = OverriddenRoomRate
         fields = "__all__"
 
+class OverriddenRoomRateRangeSerializer(serializers.ModelSerializer):
+    room_rate = serializers.PrimaryKeyRelatedField(queryset=RoomRate.objects.all())
+    weekdays = serializers.IntegerField(min_value=1, max_value=OverriddenRoomRateRange.ALL_WEEKDAYS, required=False)
+    class Meta:
+        model = OverriddenRoomRateRange
+        fields = "__all__"
+
+    def validate(self, data):
+        start_date = data.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = data.get('end_date', getattr(self.instance, 'end_date', None))
+        if start_date is not None and end_date is not None and start_date > end_date:
+            raise serializers.ValidationError({"end_date": "End date must not be before the start date."})
+        return data
+
 class DiscountSerializer(serializers.ModelSerializer):
+    weekdays = serializers.IntegerField(min_value=1, max_value=Discount.ALL_WEEKDAYS, required=False)
     class Meta:
         model = Discount
         fields = "__all__"
 
+    def validate(self, data):
+        valid_from = data.get('valid_from', getattr(self.instance, 'valid_from', None))
+        valid_to = data.get('valid_to', getattr(self.instance, 'valid_to', None))
+        if valid_from is not None and valid_to is not None and valid_from > valid_to:
+            raise serializers.ValidationError({"valid_to": "Valid to must not be before valid from."})
+        return data
+
 class DiscountRoomRateSerializer(serializers.ModelSerializer):
     class Meta:
         model = DiscountRoomRate
         fields = "__all__"
 
+class DiscountRoomRateDetailSerializer(serializers.ModelSerializer):
+    room_rate = RoomRateSerializer()
+    discount = DiscountSerializer()
+    class Meta:
+        model = DiscountRoomRate
+        fields = "__all__"
+
 class LowestRoomRateListSerializer(serializers.Serializer):
     date = serializers.DateField()
     lowest_rate = serializers.DecimalField(decimal_places=2, max_digits=10)
@@ -37,4 +68,112 @@ class LowestRoomRateListSerializer(serializers.Serializer):
     class Meta:
         fields = ['date', 'lowest_rate']
 
+class RoomLowestRoomRateSerializer(serializers.Serializer):
+    room_id = serializers.IntegerField()
+    room_name = serializers.CharField()
+    total_rate = serializers.DecimalField(decimal_places=2, max_digits=None)
+    lowest_room_rates = LowestRoomRateListSerializer(many=True)
+
+class CheapestRoomSerializer(serializers.Serializer):
+    room_id = serializers.IntegerField()
+    room_name = serializers.CharField()
+    total_rate = serializers.DecimalField(decimal_places=2, max_digits=None)
+
+class LowestRoomRateSearchSerializer(serializers.Serializer):
+    rooms = RoomLowestRoomRateSerializer(many=True)
+    cheapest_room = CheapestRoomSerializer(allow_null=True)
+
+class RoomStayTotalSerializer(serializers.Serializer):
+    room_id = serializers.IntegerField()
+    room_name = serializers.CharField()
+    nights = serializers.IntegerField()
+    total_rate = serializers.DecimalField(decimal_places=2, max_digits=None)
+    average_rate = serializers.DecimalField(decimal_places=2, max_digits=None, allow_null=True)
+    min_rate = serializers.DecimalField(decimal_places=2, max_digits=10, allow_null=True)
+    max_rate = serializers.DecimalField(decimal_places=2, max_digits=10, allow_null=True)
+
+class LowestRoomRateStayTotalSerializer(serializers.Serializer):
+    rooms = RoomStayTotalSerializer(many=True)
+
+
+#read only fast paths for the large list and lowest room rate responses. They give the same representation as the
+#serializers above, but format the rows directly instead of running the DRF fields for every row.
+
+def decimal_formatter(decimal_places, max_digits=None):
+    exponent = Decimal(1).scaleb(-decimal_places)
+    def format_decimal(value):
+        if value is None:
+            return None
+        if not isinstance(value, Decimal):
+            value = Decimal(str(value).strip())
+        quantized = value.quantize(exponent)
+        if max_digits is not None and len(quantized.as_tuple().digits) > max_digits:
+            #the DecimalField quantizes with a precision of max_digits, which fails for larger values
+            raise InvalidOperation(f"{value} has more than {max_digits} digits")
+        return f"{quantized:f}"
+    return format_decimal
+
+format_rate = decimal_formatter(2, 10)
+format_total = decimal_formatter(2)
+
+def format_date(value):
+    return value.isoformat() if value else None
+
+def serialize_lowest_room_rates(lowest_room_rates):
+    #LowestRoomRateListSerializer(lowest_room_rates, many=True).data
+    return [{"date":format_date(lowest_room_rate["date"]),"lowest_rate":format_rate(lowest_room_rate["lowest_rate"])} for lowest_room_rate in lowest_room_rates]
+
+def serialize_lowest_room_rate_search(search):
+    #LowestRoomRateSearchSerializer(search).data
+    cheapest_room = search["cheapest_room"]
+    return {
+        "rooms":[
+            {
+                "room_id":room["room_id"],
+                "room_name":room["room_name"],
+                "total_rate":format_total(room["total_rate"]),
+                "lowest_room_rates":serialize_lowest_room_rates(room["lowest_room_rates"]),
+            }
+            for room in search["rooms"]
+        ],
+        "cheapest_room":None if cheapest_room is None else {
+            "room_id":cheapest_room["room_id"],
+            "room_name":cheapest_room["room_name"],
+            "total_rate":format_total(cheapest_room["total_rate"]),
+        },
+    }
+
+#the columns read for the fast room rate representation
+ROOM_RATE_COLUMNS = ('room_id', 'room_name', 'default_rate')
+
+def serialize_room_rates(rows):
+    #RoomRateSerializer(room_rates, many=True).data, from values_list(*ROOM_RATE_COLUMNS) rows
+    return [{"room_id":room_id,"room_name":room_name,"default_rate":format_rate(default_rate)} for room_id, room_name, default_rate in rows]
+
+#the columns read for every field of the fast overridden room rate representation, in the order of the serializer
+OVERRIDDEN_ROOM_RATE_COLUMNS = {
+    'id': ('id',),
+    'room_rate': ('room_rate_id', 'room_rate__room_name', 'room_rate__default_rate'),
+    'overridden_rate': ('overridden_rate',),
+    'stay_date': ('stay_date',),
+}
+
+def get_overridden_room_rate_columns(fields=None):
+    #the key columns of the pagination are always read
+    columns = ['room_rate_id', 'stay_date']
+    for field, field_columns in OVERRIDDEN_ROOM_RATE_COLUMNS.items():
+        if fields is None or field in fields:
+            columns += [column for column in field_columns if column not in columns]
+    return columns
 
+def serialize_overridden_room_rates(rows, fields=None):
+    #OverriddenRoomRateSerializer(overridden_room_rates, many=True).data limited to the given fields, from
+    #values_list(*get_overridden_room_rate_columns(fields), named=True) rows
+    representations = {
+        'id': lambda row: row.id,
+        'room_rate': lambda row: {"room_id":row.room_rate_id,"room_name":row.room_rate__room_name,"default_rate":format_rate(row.room_rate__default_rate)},
+        'overridden_rate': lambda row: format_rate(row.overridden_rate),
+        'stay_date': lambda row: format_date(row.stay_date),
+    }
+    representations = [(field, representation) for field, representation in representations.items() if fields is None or field in fields]
+    return [{field: representation(row) for field, representation in representations} for row in rows]
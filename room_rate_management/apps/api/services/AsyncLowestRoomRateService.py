@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime
+from asgiref.sync import sync_to_async
+from apps.api.services.BestDiscountService import best_discounts_query, collect_best_discounts, collect_dated_discounts, dated_discounts_query
+from apps.api.services.LowestRoomRateCalendarService import calendar_query, complete_calendar, is_in_calendar_horizon
+from apps.api.services.LowestRoomRateService import (
+    get_daily_discounts_by_room,
+    merge_overridden_rates,
+    overridden_room_rate_ranges_query,
+    overridden_room_rates_query,
+    price_lowest_room_rates,
+    rank_rooms,
+    summarize_search,
+    to_date,
+)
+
+
+#the async versions run the same queries as the sync services with the async ORM, the independent queries
+#are awaited together, and the CPU bound pricing runs in a worker thread so the event loop keeps serving requests
+
+async def alist(queryset):
+    return [row async for row in queryset]
+
+async def aget_overridden_rates_by_room(room_ids,start_date,end_date):
+    overridden_room_rates, overridden_room_rate_ranges = await asyncio.gather(
+        alist(overridden_room_rates_query(room_ids,start_date,end_date)),
+        alist(overridden_room_rate_ranges_query(room_ids,start_date,end_date)),
+    )
+    return merge_overridden_rates(room_ids,overridden_room_rates,overridden_room_rate_ranges,start_date,end_date)
+
+async def aget_discounts_by_room(room_ids,start_date,end_date):
+    best_discounts, dated_discounts = collect_best_discounts(room_ids,await alist(best_discounts_query(room_ids)))
+    if dated_discounts:
+        collect_dated_discounts(dated_discounts,await alist(dated_discounts_query(dated_discounts,start_date,end_date)))
+    return best_discounts, dated_discounts
+
+"""
+    Loads the overridden rates and the discounts of several rooms concurrently
+
+Parameters:
+    room_rates (list): The RoomRate objects.
+    start_date (datetime): The start date.
+    end_date (datetime): The end date.
+
+Returns:
+    tuple: The overridden rates, the best discounts and the daily dated discounts by room id.
+"""
+async def aload_room_rates(room_rates,start_date:datetime,end_date:datetime):
+    room_ids = [room_rate.room_id for room_rate in room_rates]
+    overridden_rates, (best_discounts, dated_discounts) = await asyncio.gather(
+        aget_overridden_rates_by_room(room_ids,start_date,end_date),
+        aget_discounts_by_room(room_ids,to_date(start_date),to_date(end_date)),
+    )
+    return overridden_rates, best_discounts, get_daily_discounts_by_room(dated_discounts,start_date,end_date)
+
+"""
+    Async version of get_calendar_lowest_room_rates
+
+Returns:
+    list: A dict with the date and the lowest rate for every day, or None if the range is not fully precomputed.
+"""
+async def aget_calendar_lowest_room_rates(room_rate,start_date,end_date):
+    start_date, end_date = to_date(start_date), to_date(end_date)
+    if not is_in_calendar_horizon(start_date,end_date):
+        return None
+    return complete_calendar(await alist(calendar_query(room_rate,start_date,end_date)),start_date,end_date)
+
+"""
+    Async version of get_lowest_room_rates_for_rooms
+
+Returns:
+    dict: The lowest room rates of every day in the range by room id.
+"""
+async def aget_lowest_room_rates_for_rooms(room_rates,start_date:datetime,end_date:datetime):
+    if not room_rates:
+        return {}
+    loaded_rates = await aload_room_rates(room_rates,start_date,end_date)
+    return await sync_to_async(price_lowest_room_rates,thread_sensitive=False)(room_rates,*loaded_rates,start_date,end_date)
+
+"""
+    Async version of search_lowest_room_rates
+
+Returns:
+    dict: The lowest room rates and the total rate of every room, and the room with the lowest total rate.
+"""
+async def asearch_lowest_room_rates(room_rates,start_date:datetime,end_date:datetime):
+    return summarize_search(room_rates,await aget_lowest_room_rates_for_rooms(room_rates,start_date,end_date))
+
+"""
+    Async version of rank_rooms_by_total_rate
+
+Returns:
+    list: The total, average, minimum and maximum nightly rate of the rooms, cheapest room first.
+"""
+async def arank_rooms_by_total_rate(room_rates,start_date:datetime,end_date:datetime,limit=None):
+    if not room_rates:
+        return []
+    loaded_rates = await aload_room_rates(room_rates,start_date,end_date)
+    return await sync_to_async(rank_rooms,thread_sensitive=False)(room_rates,*loaded_rates,start_date,end_date,limit)
@@ -0,0 +1,177 @@
+import heapq
+from datetime import date
+from decimal import ROUND_HALF_EVEN, Decimal
+from django.db.models import Max, Q
+from apps.api.models import ALL_WEEKDAYS, Discount, DiscountRoomRate, RoomRateBestDiscount
+from apps.api.services.DateIntervalService import iter_lowest_interval_values
+
+
+"""
+    Builds the condition matching the discounts which only apply to some stay dates
+
+Parameters:
+    prefix (str): The lookup path to the discount, e.g. "discount__" from DiscountRoomRate.
+
+Returns:
+    Q: The condition.
+"""
+def dated_discount_condition(prefix=''):
+    return (
+        Q(**{f"{prefix}valid_from__isnull":False})
+        | Q(**{f"{prefix}valid_to__isnull":False})
+        | ~Q(**{f"{prefix}weekdays":ALL_WEEKDAYS})
+    )
+
+
+"""
+    Recalculates the largest fixed and the largest percentage discount of the given rooms
+
+    Every room in room_ids gets a RoomRateBestDiscount row, rooms without any discount get zeros. Only the discounts
+    which apply to every stay date are summarized, rooms which also have dated discounts are flagged so that the
+    lowest room rates only look the dated discounts up for them.
+
+Parameters:
+    room_ids (iterable): The ids of the rooms whose discounts changed.
+"""
+def refresh_best_discounts(room_ids):
+    room_ids = set(room_ids)
+    if not room_ids:
+        return
+
+    best_discounts = {room_id: RoomRateBestDiscount(room_rate_id=room_id) for room_id in room_ids}
+    max_discounts = (
+        DiscountRoomRate.objects.filter(room_rate_id__in=room_ids)
+        .exclude(dated_discount_condition('discount__'))
+        .values('room_rate_id','discount__discount_type')
+        .annotate(max_discount_value=Max('discount__discount_value'))
+    )
+    for max_discount in max_discounts:
+        best_discount = best_discounts[max_discount['room_rate_id']]
+        if max_discount['discount__discount_type'] == Discount.FIXED:
+            best_discount.max_fixed_discount = max_discount['max_discount_value']
+        else:
+            best_discount.max_percentage_discount = max_discount['max_discount_value']
+
+    dated_room_ids = DiscountRoomRate.objects.filter(dated_discount_condition('discount__'),room_rate_id__in=room_ids).values_list('room_rate_id',flat=True).distinct()
+    for room_id in dated_room_ids:
+        best_discounts[room_id].has_dated_discounts = True
+
+    RoomRateBestDiscount.objects.bulk_create(
+        best_discounts.values(),
+        update_conflicts=True,
+        unique_fields=['room_rate'],
+        update_fields=['max_fixed_discount','max_percentage_discount','has_dated_discounts'],
+    )
+
+"""
+    Returns the best discounts of several rooms and the dated discounts which apply in the date range
+
+    The dated discounts are only looked up for the rooms which have any, so rooms with only undated discounts
+    cost one query.
+
+Parameters:
+    room_ids (iterable): The ids of the rooms.
+    start_date (date): The start date.
+    end_date (date): The end date.
+
+Returns:
+    tuple: The largest fixed and the largest percentage discount by room id, and the dated discounts of every room with
+        dated discounts as a list of (valid_from, valid_to, weekdays, discount_type, discount_value) tuples by room id.
+"""
+def get_discounts_by_room(room_ids,start_date,end_date):
+    room_ids = list(room_ids)
+    best_discounts, dated_discounts = collect_best_discounts(room_ids,best_discounts_query(room_ids))
+    if dated_discounts:
+        collect_dated_discounts(dated_discounts,dated_discounts_query(dated_discounts,start_date,end_date))
+    return best_discounts, dated_discounts
+
+#the queries and the collecting of their rows are kept apart so that the async views can run the same queries
+
+def best_discounts_query(room_ids):
+    return RoomRateBestDiscount.objects.filter(room_rate_id__in=room_ids).values_list('room_rate_id','max_fixed_discount','max_percentage_discount','has_dated_discounts')
+
+def dated_discounts_query(room_ids,start_date,end_date):
+    return (
+        DiscountRoomRate.objects.filter(dated_discount_condition('discount__'),room_rate_id__in=room_ids)
+        .filter(Q(discount__valid_from__isnull=True) | Q(discount__valid_from__lte=end_date))
+        .filter(Q(discount__valid_to__isnull=True) | Q(discount__valid_to__gte=start_date))
+        .values_list('room_rate_id','discount__valid_from','discount__valid_to','discount__weekdays','discount__discount_type','discount__discount_value')
+    )
+
+def collect_best_discounts(room_ids,best_discount_rows):
+    best_discounts = {room_id: (Decimal(0), Decimal(0)) for room_id in room_ids}
+    dated_discounts = {}
+    for room_id, max_fixed_discount, max_percentage_discount, has_dated_discounts in best_discount_rows:
+        best_discounts[room_id] = (max_fixed_discount, max_percentage_discount)
+        if has_dated_discounts:
+            dated_discounts[room_id] = []
+    return best_discounts, dated_discounts
+
+def collect_dated_discounts(dated_discounts,dated_discount_rows):
+    for room_id, *dated_discount in dated_discount_rows:
+        dated_discounts[room_id].append(tuple(dated_discount))
+
+"""
+    Finds the largest fixed and the largest percentage dated discount of every day in the date range
+
+    The discounts of each type are swept like the date range overrides, with the values negated so that the
+    lowest value is the largest discount. This takes O((days + discounts) log discounts) instead of checking
+    every discount on every day.
+
+Parameters:
+    dated_discounts (list): (valid_from, valid_to, weekdays, discount_type, discount_value) tuples.
+    start_date (date): The start date.
+    end_date (date): The end date.
+
+Yields:
+    tuple: The date, the largest fixed and the largest percentage discount, for the days with any dated discount.
+"""
+def iter_dated_discounts(dated_discounts,start_date,end_date):
+    intervals = {Discount.FIXED: [], Discount.PERCENTAGE: []}
+    for valid_from, valid_to, weekdays, discount_type, discount_value in dated_discounts:
+        intervals[discount_type].append((valid_from or date.min,valid_to or date.max,weekdays,-discount_value))
+
+    days = heapq.merge(
+        ((day, 0, -value) for day, value in iter_lowest_interval_values(intervals[Discount.FIXED],start_date,end_date)),
+        ((day, 1, -value) for day, value in iter_lowest_interval_values(intervals[Discount.PERCENTAGE],start_date,end_date)),
+    )
+    current_day, discounts = None, None
+    for day, discount_index, value in days:
+        if day != current_day:
+            if current_day is not None:
+                yield current_day, *discounts
+            current_day, discounts = day, [Decimal(0), Decimal(0)]
+        discounts[discount_index] = value
+    if current_day is not None:
+        yield current_day, *discounts
+
+"""
+    Calculates the maximum discount for a rate from the best discounts of a room
+
+Parameters:
+    rate (Decimal): The rate of the day.
+    max_fixed_discount (Decimal): The largest fixed discount of the room.
+    max_percentage_discount (Decimal): The largest percentage discount of the room.
+
+Returns:
+    Decimal: The maximum discount value, zero when no discount is positive.
+"""
+def get_max_discount(rate,max_fixed_discount,max_percentage_discount):
+    return max(Decimal("0.00"),max_fixed_discount,(rate * max_percentage_discount)/100)
+
+"""
+    Applies the maximum discount to a rate and rounds the result to cents
+
+    The rate can not go below zero. Rounding is half to even, like the serializers and the database round decimals.
+
+Parameters:
+    rate (Decimal): The rate of the day.
+    max_fixed_discount (Decimal): The largest fixed discount of the room.
+    max_percentage_discount (Decimal): The largest percentage discount of the room.
+
+Returns:
+    Decimal: The discounted rate.
+"""
+def get_discounted_rate(rate,max_fixed_discount,max_percentage_discount):
+    max_discount = get_max_discount(rate,max_fixed_discount,max_percentage_discount)
+    return Decimal(max((rate - max_discount),0)).quantize(Decimal('0.01'),rounding=ROUND_HALF_EVEN)
@@ -0,0 +1,44 @@
+import heapq
+from datetime import timedelta
+
+
+"""
+    Finds the lowest value of the date intervals which cover each day of the date range
+
+    The intervals are swept in start date order with one heap per weekday, so every interval is pushed once
+    for each weekday of its mask and popped once when it ended. This takes O((days + intervals) log intervals)
+    instead of checking every interval on every day.
+
+Parameters:
+    intervals (iterable): (start_date, end_date, weekdays, value) tuples, weekdays is a bit mask with bit 0 for Monday.
+    start_date (date): The start date.
+    end_date (date): The end date.
+
+Yields:
+    tuple: The date and the lowest value of the intervals covering it, for the days covered by any interval.
+"""
+def iter_lowest_interval_values(intervals,start_date,end_date):
+    intervals = sorted(
+        (interval for interval in intervals if interval[0] <= end_date and interval[1] >= start_date),
+        key=lambda interval: interval[0],
+    )
+    heaps = [[] for weekday in range(7)]
+    next_interval = 0
+
+    day = start_date
+    while day <= end_date:
+        #push the intervals which started by this day into the heaps of their weekdays
+        while next_interval < len(intervals) and intervals[next_interval][0] <= day:
+            interval_start, interval_end, weekdays, value = intervals[next_interval]
+            for weekday in range(7):
+                if weekdays & (1 << weekday):
+                    heapq.heappush(heaps[weekday],(value,interval_end,next_interval))
+            next_interval += 1
+
+        #drop the intervals which already ended, they can only be on top of the heap once they are the lowest
+        heap = heaps[day.weekday()]
+        while heap and heap[0][1] < day:
+            heapq.heappop(heap)
+        if heap:
+            yield day, heap[0][0]
+        day += timedelta(days=1)
@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models import Q
+from apps.api.cache import lowest_room_rate_cache
+from apps.api.models import Discount, DiscountRoomRate, RoomRate
+from apps.api.services.BestDiscountService import refresh_best_discounts
+from apps.api.services.LowestRoomRateCalendarService import refresh_lowest_room_rate_calendars
+
+
+"""
+    Assigns discounts to rooms in a constant number of queries
+
+    The rooms and the discounts are resolved with one IN query each, the existing mappings with one more, and the
+    new mappings are inserted with one bulk insert in a single transaction. Pairs which already exist or refer to
+    a missing room or discount are reported instead of aborting the assignment.
+
+Parameters:
+    pairs (list): (room_id, discount_id) tuples.
+
+Returns:
+    list: The room id, discount id and status (created, existing or missing) of every pair.
+"""
+def assign_discounts(pairs):
+    pairs = list(dict.fromkeys(pairs))
+    room_ids = set(RoomRate.objects.filter(room_id__in={room_id for room_id, discount_id in pairs}).values_list('room_id',flat=True))
+    discount_ids = set(Discount.objects.filter(discount_id__in={discount_id for room_id, discount_id in pairs}).values_list('discount_id',flat=True))
+
+    results = []
+    new_pairs = []
+    with transaction.atomic():
+        existing_pairs = set(
+            DiscountRoomRate.objects.filter(room_rate_id__in=room_ids,discount_id__in=discount_ids).values_list('room_rate_id','discount_id')
+        )
+        for room_id, discount_id in pairs:
+            result = {"room_id":room_id,"discount_id":discount_id}
+            if room_id not in room_ids:
+                result.update(status="missing",error_message="Room rate not found")
+            elif discount_id not in discount_ids:
+                result.update(status="missing",error_message="Discount not found")
+            elif (room_id, discount_id) in existing_pairs:
+                result.update(status="existing")
+            else:
+                result.update(status="created")
+                new_pairs.append((room_id, discount_id))
+            results.append(result)
+
+        #mappings created concurrently by another request are skipped by the unique (room_rate, discount) key
+        DiscountRoomRate.objects.bulk_create(
+            [DiscountRoomRate(room_rate_id=room_id,discount_id=discount_id) for room_id, discount_id in new_pairs],
+            ignore_conflicts=True,
+            batch_size=1000,
+        )
+        changed_room_ids = {room_id for room_id, discount_id in new_pairs}
+        refresh_best_discounts(changed_room_ids)
+        refresh_lowest_room_rate_calendars(changed_room_ids)
+
+    #bulk_create does not send the signals which invalidate the cache
+    lowest_room_rate_cache.invalidate_rooms(changed_room_ids)
+    return results
+
+"""
+    Removes discounts from rooms without deleting the discounts
+
+    The mappings are deleted with one query in a single transaction, pairs which are not mapped are ignored.
+
+Parameters:
+    pairs (list): (room_id, discount_id) tuples.
+
+Returns:
+    int: The number of removed mappings.
+"""
+def unassign_discounts(pairs):
+    discount_ids_by_room = {}
+    for room_id, discount_id in pairs:
+        discount_ids_by_room.setdefault(room_id, set()).add(discount_id)
+    if not discount_ids_by_room:
+        return 0
+
+    condition = Q()
+    for room_id, discount_ids in discount_ids_by_room.items():
+        condition |= Q(room_rate_id=room_id,discount_id__in=discount_ids)
+
+    with transaction.atomic():
+        deleted, _ = DiscountRoomRate.objects.filter(condition).delete()
+        refresh_best_discounts(discount_ids_by_room)
+        refresh_lowest_room_rate_calendars(discount_ids_by_room)
+    return deleted
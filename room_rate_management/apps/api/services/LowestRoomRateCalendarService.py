@@ -0,0 +1,100 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from apps.api.cache import lowest_room_rate_cache
+from apps.api.models import LowestRoomRateCalendar, RoomRate
+from apps.api.services.LowestRoomRateService import get_lowest_room_rates_for_rooms, to_date
+
+
+"""
+    Returns the first and the last day of the precomputed calendar
+
+Returns:
+    tuple: Today and the last day of the horizon.
+"""
+def get_calendar_horizon():
+    today = timezone.localdate()
+    return today, today + timedelta(days=settings.LOWEST_ROOM_RATE_CALENDAR_DAYS - 1)
+
+"""
+    Recalculates the precomputed lowest room rates of the given rooms
+
+    The date range is clamped to the calendar horizon. If no dates are given the whole horizon is recalculated.
+
+Parameters:
+    room_ids (iterable): The ids of the rooms to recalculate.
+    start_date (datetime): The first changed day, optional.
+    end_date (datetime): The last changed day, optional.
+    process_pool (ProcessPoolExecutor): The pool of pricing_process_pool for the rebuild, optional.
+"""
+def refresh_lowest_room_rate_calendars(room_ids,start_date=None,end_date=None,process_pool=None):
+    horizon_start, horizon_end = get_calendar_horizon()
+    start_date = max(to_date(start_date) or horizon_start, horizon_start)
+    end_date = min(to_date(end_date) or horizon_end, horizon_end)
+    if start_date > end_date:
+        return
+
+    room_ids = set(room_ids)
+    lowest_room_rates_by_room = get_lowest_room_rates_for_rooms(RoomRate.objects.filter(room_id__in=room_ids),start_date,end_date,process_pool)
+    calendar = [
+        LowestRoomRateCalendar(room_rate_id=room_id,stay_date=lowest_room_rate['date'],lowest_rate=lowest_room_rate['lowest_rate'])
+        for room_id, lowest_room_rates in lowest_room_rates_by_room.items()
+        for lowest_room_rate in lowest_room_rates
+    ]
+    LowestRoomRateCalendar.objects.bulk_create(
+        calendar,
+        update_conflicts=True,
+        unique_fields=['room_rate','stay_date'],
+        update_fields=['lowest_rate'],
+        batch_size=1000,
+    )
+    #responses may have been cached from the calendar before it was refreshed
+    lowest_room_rate_cache.invalidate_rooms(room_ids)
+
+"""
+    Recalculates the whole horizon of every room and removes the days which are in the past
+
+    Should be run once a day so that the horizon keeps rolling forward.
+
+Parameters:
+    process_pool (ProcessPoolExecutor): The pool of pricing_process_pool to price the rooms in, optional.
+"""
+def rebuild_lowest_room_rate_calendar(process_pool=None):
+    horizon_start, horizon_end = get_calendar_horizon()
+    with transaction.atomic():
+        LowestRoomRateCalendar.objects.filter(stay_date__lt=horizon_start).delete()
+        LowestRoomRateCalendar.objects.filter(stay_date__gt=horizon_end).delete()
+        refresh_lowest_room_rate_calendars(RoomRate.objects.values_list('room_id',flat=True),process_pool=process_pool)
+
+"""
+    Returns the precomputed lowest room rates of a room for the date range
+
+Parameters:
+    room_rate (RoomRate): The RoomRate object.
+    start_date (datetime): The start date.
+    end_date (datetime): The end date.
+
+Returns:
+    list: A dict with the date and the lowest rate for every day, or None if the range is not fully precomputed.
+"""
+def get_calendar_lowest_room_rates(room_rate:RoomRate,start_date,end_date):
+    start_date, end_date = to_date(start_date), to_date(end_date)
+    if not is_in_calendar_horizon(start_date,end_date):
+        return None
+    return complete_calendar(calendar_query(room_rate,start_date,end_date),start_date,end_date)
+
+#the query and the checking of its rows are kept apart so that the async views can run the same query
+
+def is_in_calendar_horizon(start_date,end_date):
+    horizon_start, horizon_end = get_calendar_horizon()
+    return horizon_start <= start_date and end_date <= horizon_end
+
+def calendar_query(room_rate,start_date,end_date):
+    return LowestRoomRateCalendar.objects.filter(room_rate=room_rate,stay_date__range=(start_date,end_date)).order_by('stay_date').values_list('stay_date','lowest_rate')
+
+def complete_calendar(calendar_rows,start_date,end_date):
+    lowest_room_rates = [{"date":stay_date,"lowest_rate":lowest_rate} for stay_date, lowest_rate in calendar_rows]
+    if len(lowest_room_rates) != (end_date - start_date).days + 1:
+        return None
+    return lowest_room_rates
@@ -0,0 +1,157 @@
+import csv
+import struct
+import sys
+from array import array
+from collections import deque
+from datetime import date, timedelta
+from itertools import islice
+from apps.api.models import RoomRate
+from apps.api.services.BestDiscountService import get_discounts_by_room
+from apps.api.services.LowestRoomRateService import daterange, get_daily_discounts_by_room, get_process_pool_workers, merge_overridden_rates, overridden_room_rate_ranges_query, overridden_room_rates_query, price_lowest_room_rates
+from apps.api.services.PricingKernelService import CENTS, from_cents, to_cents
+
+
+#columnar file layout, all numbers are little endian:
+#  header: COLUMNAR_MAGIC, the version, the ordinal of the first stay date and the number of days
+#  blocks: the number of rooms n, n room ids, then n * days lowest rates in cents, every room's days one after the other
+#  end:    a block of 0 rooms
+COLUMNAR_MAGIC = b"LRRC"
+COLUMNAR_VERSION = 1
+COLUMNAR_HEADER = struct.Struct('<4sBiI')
+COLUMNAR_BLOCK = struct.Struct('<I')
+
+"""
+    Prices the lowest room rates of every room for the date range, a batch of rooms at a time
+
+    The rooms and the overridden room rates are read from the database in chunks, and only the rates of a few
+    batches of rooms are held in memory at a time, so the memory used does not grow with the number of rooms.
+    When a process pool is passed, the batches are priced by its workers while the next ones are read, a few
+    batches per worker ahead, and are yielded in room order.
+
+Parameters:
+    start_date (date): The start date.
+    end_date (date): The end date.
+    rooms_per_batch (int): Number of rooms priced together.
+    chunk_size (int): Number of rows read from the database at a time.
+    process_pool (ProcessPoolExecutor): The pool of pricing_process_pool, optional.
+
+Yields:
+    tuple: The RoomRate objects of a batch and their lowest room rates by room id.
+"""
+def iter_lowest_room_rate_batches(start_date:date,end_date:date,rooms_per_batch=100,chunk_size=2000,process_pool=None):
+    batches = iter_lowest_room_rate_batch_rates(start_date,end_date,rooms_per_batch,chunk_size)
+    if process_pool is None:
+        for batch, rates in batches:
+            yield batch, price_lowest_room_rates(batch,*rates,start_date,end_date)
+        return
+
+    pending = deque()
+    for batch, rates in batches:
+        pending.append((batch,process_pool.submit(price_lowest_room_rates,batch,*rates,start_date,end_date)))
+        if len(pending) > 2 * get_process_pool_workers():
+            batch, future = pending.popleft()
+            yield batch, future.result()
+    while pending:
+        batch, future = pending.popleft()
+        yield batch, future.result()
+
+def iter_lowest_room_rate_batch_rates(start_date,end_date,rooms_per_batch,chunk_size):
+    room_rates = RoomRate.objects.order_by('room_id').iterator(chunk_size=chunk_size)
+    while batch := list(islice(room_rates,rooms_per_batch)):
+        room_ids = [room_rate.room_id for room_rate in batch]
+        overridden_rates = merge_overridden_rates(
+            room_ids,
+            overridden_room_rates_query(room_ids,start_date,end_date).iterator(chunk_size=chunk_size),
+            overridden_room_rate_ranges_query(room_ids,start_date,end_date).iterator(chunk_size=chunk_size),
+            start_date,
+            end_date,
+        )
+        best_discounts, dated_discounts = get_discounts_by_room(room_ids,start_date,end_date)
+        yield batch, (overridden_rates,best_discounts,get_daily_discounts_by_room(dated_discounts,start_date,end_date))
+
+"""
+    Writes the lowest room rates as CSV with a room_id, date and lowest_rate column
+
+    The rates are rounded to the cent like the API returns them.
+
+Parameters:
+    file (file): A text file opened with newline=''.
+    batches (iterable): The batches of iter_lowest_room_rate_batches.
+
+Returns:
+    int: The number of rows written.
+"""
+def write_lowest_room_rates_csv(file,batches):
+    writer = csv.writer(file)
+    writer.writerow(['room_id','date','lowest_rate'])
+    rows = 0
+    for room_rates, lowest_room_rates_by_room in batches:
+        for room_rate in room_rates:
+            lowest_room_rates = lowest_room_rates_by_room[room_rate.room_id]
+            writer.writerows(
+                (room_rate.room_id,lowest_room_rate["date"].isoformat(),f"{lowest_room_rate['lowest_rate'].quantize(CENTS):f}")
+                for lowest_room_rate in lowest_room_rates
+            )
+            rows += len(lowest_room_rates)
+    return rows
+
+"""
+    Writes the lowest room rates as a compact columnar binary file
+
+    Every room has a rate for every day of the range, so the dates are not stored, and a row takes 8 bytes.
+    The layout is described at COLUMNAR_MAGIC.
+
+Parameters:
+    file (file): A binary file.
+    batches (iterable): The batches of iter_lowest_room_rate_batches.
+    start_date (date): The start date.
+    end_date (date): The end date.
+
+Returns:
+    int: The number of rows written.
+"""
+def write_lowest_room_rates_columnar(file,batches,start_date:date,end_date:date):
+    days = (end_date - start_date).days + 1
+    file.write(COLUMNAR_HEADER.pack(COLUMNAR_MAGIC,COLUMNAR_VERSION,start_date.toordinal(),days))
+    rows = 0
+    for room_rates, lowest_room_rates_by_room in batches:
+        room_ids = array('q',(room_rate.room_id for room_rate in room_rates))
+        lowest_rates = array('q',(
+            to_cents(lowest_room_rate["lowest_rate"])
+            for room_rate in room_rates for lowest_room_rate in lowest_room_rates_by_room[room_rate.room_id]
+        ))
+        if sys.byteorder == 'big':
+            room_ids.byteswap()
+            lowest_rates.byteswap()
+        file.write(COLUMNAR_BLOCK.pack(len(room_ids)))
+        file.write(room_ids.tobytes())
+        file.write(lowest_rates.tobytes())
+        rows += len(lowest_rates)
+    file.write(COLUMNAR_BLOCK.pack(0))
+    return rows
+
+"""
+    Reads a columnar file written by write_lowest_room_rates_columnar one block at a time
+
+Parameters:
+    file (file): A binary file.
+
+Yields:
+    tuple: The room id, the date and the lowest rate of every row.
+"""
+def read_lowest_room_rates_columnar(file):
+    magic, version, start_ordinal, days = COLUMNAR_HEADER.unpack(file.read(COLUMNAR_HEADER.size))
+    if magic != COLUMNAR_MAGIC or version != COLUMNAR_VERSION:
+        raise ValueError("Not a lowest room rate columnar file")
+    dates = list(daterange(date.fromordinal(start_ordinal),date.fromordinal(start_ordinal) + timedelta(days=days - 1)))
+
+    while rooms := COLUMNAR_BLOCK.unpack(file.read(COLUMNAR_BLOCK.size))[0]:
+        room_ids, lowest_rates = array('q'), array('q')
+        room_ids.frombytes(file.read(rooms * room_ids.itemsize))
+        lowest_rates.frombytes(file.read(rooms * days * lowest_rates.itemsize))
+        if sys.byteorder == 'big':
+            room_ids.byteswap()
+            lowest_rates.byteswap()
+        for index, room_id in enumerate(room_ids):
+            for stay_date, lowest_rate in zip(dates,lowest_rates[index * days:(index + 1) * days]):
+                yield room_id, stay_date, from_cents(lowest_rate)
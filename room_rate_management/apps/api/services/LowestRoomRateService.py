@@ -1,52 +1,393 @@
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import date, datetime, timedelta
-from django.db.models import Min
-from apps.api.models import DiscountRoomRate, OverriddenRoomRate, RoomRate
+from itertools import repeat
+import django
+from django.conf import settings
+from apps.api.models import OverriddenRoomRate, OverriddenRoomRateRange, RoomRate
+from apps.api.services.BestDiscountService import get_discounted_rate, get_discounts_by_room, iter_dated_discounts
+from apps.api.services.DateIntervalService import iter_lowest_interval_values
+from apps.api.services import PricingKernelService
 
 
 def daterange(start_date, end_date):
     for n in range(int((end_date - start_date).days) + 1):
         yield start_date + timedelta(n)
 
+def to_date(value):
+    #stay dates are stored as dates, but the views parse the query params into datetimes
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+def use_pricing_kernel(room_count, start_date, end_date):
+    #the array kernel only pays off for large rooms x days matrices, and numpy is optional
+    threshold = settings.LOWEST_ROOM_RATE_KERNEL_THRESHOLD
+    days = (to_date(end_date) - to_date(start_date)).days + 1
+    return threshold is not None and PricingKernelService.is_available() and room_count * days >= threshold
+
+def get_process_pool_workers():
+    return settings.LOWEST_ROOM_RATE_PROCESS_POOL_WORKERS or os.cpu_count() or 1
+
+def use_process_pool(process_pool, room_count, start_date, end_date):
+    #sending the rates to the workers costs more than pricing small ranges in-process
+    threshold = settings.LOWEST_ROOM_RATE_PROCESS_POOL_THRESHOLD
+    days = (to_date(end_date) - to_date(start_date)).days + 1
+    return process_pool is not None and threshold is not None and room_count > 1 and room_count * days >= threshold
+
+"""
+    Starts a pool of pricing worker processes for a batch job
+
+    The pool is only used by the batch jobs which pass it to the pricing, like the calendar rebuild and the export,
+    never by the requests. It is started once for the whole job and reused, and shut down when the job is done.
+    The workers do not use the database, they only set Django up to unpickle the RoomRate objects.
+
+Yields:
+    ProcessPoolExecutor: The pool, None if only one worker is configured or available.
+"""
+@contextmanager
+def pricing_process_pool():
+    workers = get_process_pool_workers()
+    if workers < 2:
+        yield None
+        return
+    with ProcessPoolExecutor(workers,initializer=django.setup) as process_pool:
+        yield process_pool
+
+"""
+    Prices several rooms in a pool of worker processes, one shard of rooms per worker
+
+    The rates and discounts are loaded once by the caller, every worker only gets the ones of its own rooms.
+
+Parameters:
+    process_pool (ProcessPoolExecutor): The pool of pricing_process_pool.
+    room_rates (list): The RoomRate objects.
+    overridden_rates (dict): The lowest overridden rate by stay date, by room id.
+    best_discounts (dict): The largest fixed discount and the largest percentage discount, by room id.
+    daily_discounts (dict): The largest fixed and percentage dated discount by stay date, by room id.
+    start_date (datetime): The start date.
+    end_date (datetime): The end date.
+
+Returns:
+    dict: The lowest room rates of every day in the range by room id.
+"""
+def price_in_process_pool(process_pool,room_rates,overridden_rates,best_discounts,daily_discounts,start_date,end_date):
+    shard_size = -(-len(room_rates) // min(get_process_pool_workers(),len(room_rates)))
+    shards = [room_rates[index:index + shard_size] for index in range(0,len(room_rates),shard_size)]
+    lowest_room_rates = {}
+    for shard_lowest_room_rates in process_pool.map(
+        price_lowest_room_rates_in_process,
+        shards,
+        ({room_rate.room_id: overridden_rates[room_rate.room_id] for room_rate in shard} for shard in shards),
+        ({room_rate.room_id: best_discounts[room_rate.room_id] for room_rate in shard} for shard in shards),
+        ({room_rate.room_id: daily_discounts[room_rate.room_id] for room_rate in shard if room_rate.room_id in daily_discounts} for shard in shards),
+        repeat(start_date),
+        repeat(end_date),
+    ):
+        lowest_room_rates.update(shard_lowest_room_rates)
+    return lowest_room_rates
+
+"""
+    Loads the overridden room rates of several rooms in the date range, keyed by room id and stay date
+
+    Both the single night overrides and the date range overrides are loaded, when several of them cover
+    the same night the lowest one wins.
+
+Parameters:
+    room_ids (iterable): The ids of the rooms.
+    start_date (datetime): The start date.
+    end_date (datetime): The end date.
+
+Returns:
+    dict: The lowest overridden rate for every stay date which has an override, by room id.
+"""
+def get_overridden_rates_by_room(room_ids,start_date:datetime,end_date:datetime):
+    room_ids = list(room_ids)
+    return merge_overridden_rates(
+        room_ids,
+        overridden_room_rates_query(room_ids,start_date,end_date),
+        overridden_room_rate_ranges_query(room_ids,start_date,end_date),
+        start_date,
+        end_date,
+    )
+
+#the queries and the merging of their rows are kept apart so that the async views can run the same queries
+
+def overridden_room_rates_query(room_ids,start_date,end_date):
+    return OverriddenRoomRate.objects.filter(room_rate_id__in=room_ids,stay_date__range=(to_date(start_date),to_date(end_date))).values_list('room_rate_id','stay_date','overridden_rate')
+
+def overridden_room_rate_ranges_query(room_ids,start_date,end_date):
+    return (
+        OverriddenRoomRateRange.objects.filter(room_rate_id__in=room_ids,start_date__lte=to_date(end_date),end_date__gte=to_date(start_date))
+        .values_list('room_rate_id','start_date','end_date','weekdays','overridden_rate')
+    )
+
+def merge_overridden_rates(room_ids,overridden_room_rates,overridden_room_rate_ranges,start_date,end_date):
+    overridden_rates = {room_id: {} for room_id in room_ids}
+    for room_id, stay_date, overridden_rate in overridden_room_rates:
+        #if multiple overriddens are there for a room for the same day, take the lowest one
+        room_overridden_rates = overridden_rates[room_id]
+        if stay_date not in room_overridden_rates or overridden_rate < room_overridden_rates[stay_date]:
+            room_overridden_rates[stay_date] = overridden_rate
+
+    #resolve the date range overrides of every room by an interval sweep over the date range
+    ranges = {}
+    for room_id, *overridden_room_rate_range in overridden_room_rate_ranges:
+        ranges.setdefault(room_id,[]).append(overridden_room_rate_range)
+    for room_id, room_ranges in ranges.items():
+        room_overridden_rates = overridden_rates[room_id]
+        for stay_date, overridden_rate in iter_lowest_interval_values(room_ranges,to_date(start_date),to_date(end_date)):
+            if stay_date not in room_overridden_rates or overridden_rate < room_overridden_rates[stay_date]:
+                room_overridden_rates[stay_date] = overridden_rate
+    return overridden_rates
+
+"""
+    Resolves the dated discounts of several rooms to the largest fixed and percentage discount of every day
+
+Parameters:
+    dated_discounts (dict): The dated discounts by room id, see get_discounts_by_room.
+    start_date (datetime): The start date.
+    end_date (datetime): The end date.
+
+Returns:
+    dict: The largest fixed and the largest percentage discount by stay date, by room id.
+"""
+def get_daily_discounts_by_room(dated_discounts,start_date,end_date):
+    return {
+        room_id: {date: (max_fixed_discount, max_percentage_discount) for date, max_fixed_discount, max_percentage_discount in iter_dated_discounts(room_dated_discounts,to_date(start_date),to_date(end_date))}
+        for room_id, room_dated_discounts in dated_discounts.items()
+    }
+
+"""
+    Calculates the lowest room rate of every day in the date range from already loaded rates and discounts
+
+Parameters:
+    default_rate (Decimal): The default rate of the room.
+    overridden_rates (dict): The lowest overridden rate by stay date.
+    max_fixed_discount (Decimal): The largest fixed discount of the room.
+    max_percentage_discount (Decimal): The largest percentage discount of the room.
+    start_date (datetime): The start date.
+    end_date (datetime): The end date.
+    daily_discounts (dict): The largest fixed and percentage dated discount by stay date, optional.
+
+Yields:
+    tuple: The date and the lowest rate of the day.
+"""
+def iter_lowest_room_rates(default_rate,overridden_rates,max_fixed_discount,max_percentage_discount,start_date,end_date,daily_discounts=None):
+
+    #iterate through every day in the date range and calculate the lowest room rate in that day
+    for date in daterange(to_date(start_date),to_date(end_date)):
+
+        #If any overriddens are there for that day then use the overridden rate else use the default rate.
+        lowest_rate = overridden_rates.get(date,default_rate)
+
+        # the maximum discount is either the largest fixed discount or the largest percentage discount of the room,
+        # subtract it from the lowest rate to arrive at the lowest rate for the day
+        if daily_discounts and date in daily_discounts:
+            dated_fixed_discount, dated_percentage_discount = daily_discounts[date]
+            yield date, get_discounted_rate(lowest_rate,max(max_fixed_discount,dated_fixed_discount),max(max_percentage_discount,dated_percentage_discount))
+        else:
+            yield date, get_discounted_rate(lowest_rate,max_fixed_discount,max_percentage_discount)
+
+"""
+    Calculates the lowest room rate of every day in the date range from already loaded rates and discounts
+
+Returns:
+    list: A dict with the date and the lowest rate for every day in the range.
+"""
+def calculate_lowest_room_rates(default_rate,overridden_rates,max_fixed_discount,max_percentage_discount,start_date,end_date,daily_discounts=None):
+    return [
+        {"date":date,"lowest_rate":lowest_rate}
+        for date, lowest_rate in iter_lowest_room_rates(default_rate,overridden_rates,max_fixed_discount,max_percentage_discount,start_date,end_date,daily_discounts)
+    ]
+
 """
     Calculates lowest room rate for a given room for the date range
 
+    The overridden rates and the best discounts are loaded once for the whole range, so the number of
+    queries does not depend on the length of the date range.
+
 Parameters:
     room_rate (RoomRate): The RoomRate object.
     start_date (datetime): The start date.
     end_date (datetime): The end date.
 
-Yields:
-    datetime: The next date in the range.
+Returns:
+    list: A dict with the date and the lowest rate for every day in the range.
 """
 def get_lowest_room_rates(room_rate:RoomRate,start_date:datetime,end_date:datetime):
 
-    #filter all the overriden room rates and discounts for the given room in the date range
-    overridden_room_rates = OverriddenRoomRate.objects.filter(room_rate=room_rate).filter(stay_date__range=(start_date,end_date))
-    discounts = DiscountRoomRate.objects.filter(room_rate=room_rate)
-    lowest_room_rates = []
+    #load all the overriden room rates and the best discounts for the given room in the date range
+    overridden_rates = get_overridden_rates_by_room([room_rate.room_id],start_date,end_date)[room_rate.room_id]
+    best_discounts, dated_discounts = get_discounts_by_room([room_rate.room_id],to_date(start_date),to_date(end_date))
+    daily_discounts = get_daily_discounts_by_room(dated_discounts,start_date,end_date).get(room_rate.room_id)
+    return calculate_lowest_room_rates(room_rate.default_rate,overridden_rates,*best_discounts[room_rate.room_id],start_date,end_date,daily_discounts)
 
-    #iterate through every day in the date range and calculate the lowest room rate in that day
-    for date in daterange(start_date,end_date):
+"""
+    Calculates lowest room rate for several rooms for the date range
 
-        #Filter the overridden room rate for that day. If any overriddens then use the overridden rate else use the default rate.
-        overridden_room_rate_for_date = overridden_room_rates.filter(stay_date=date)
-        if len(overridden_room_rate_for_date) == 0:
-            lowest_rate = room_rate.default_rate
-        else:
-            #if multiple overriddens are there for a ram for the same day, take the lowest one
-            lowest_rate = overridden_room_rate_for_date.order_by('overridden_rate').first().overridden_rate
-        
-        # apply the all the applicable discounts on the lowest rate and get the maximum discount value
-        max_discount = 0
-        for discount_query in discounts:
-            final_discount_value = 0
-            if discount_query.discount.discount_type == 'fixed':
-                final_discount_value = discount_query.discount.discount_value
-            else:
-                final_discount_value = (lowest_rate * discount_query.discount.discount_value)/100
-            max_discount = max(max_discount,final_discount_value)
-
-        #subtract the maximum discount value form lowest rate to arrive at the lowest rate for the day
-        lowest_rate = max((lowest_rate - max_discount),0)
-        lowest_room_rates.append({"date":date.date(),"lowest_rate":lowest_rate})
-    return lowest_room_rates
+    The overridden rates and the best discounts of all the rooms are loaded in bulk, so the number of
+    queries depends neither on the length of the date range nor on the number of rooms.
+
+Parameters:
+    room_rates (iterable): The RoomRate objects.
+    start_date (datetime): The start date.
+    end_date (datetime): The end date.
+    process_pool (ProcessPoolExecutor): The pool of pricing_process_pool for large batch jobs, optional.
+
+Returns:
+    dict: The lowest room rates of every day in the range by room id.
+"""
+def get_lowest_room_rates_for_rooms(room_rates,start_date:datetime,end_date:datetime,process_pool=None):
+    room_rates = list(room_rates)
+    room_ids = [room_rate.room_id for room_rate in room_rates]
+    if not room_ids:
+        return {}
+
+    overridden_rates = get_overridden_rates_by_room(room_ids,start_date,end_date)
+    best_discounts, dated_discounts = get_discounts_by_room(room_ids,to_date(start_date),to_date(end_date))
+    return price_lowest_room_rates(room_rates,overridden_rates,best_discounts,get_daily_discounts_by_room(dated_discounts,start_date,end_date),start_date,end_date,process_pool)
+
+"""
+    Calculates lowest room rate for several rooms for the date range from already loaded rates and discounts
+
+    When a process pool is passed, large rooms x days ranges are sharded by room over its workers.
+
+Returns:
+    dict: The lowest room rates of every day in the range by room id.
+"""
+def price_lowest_room_rates(room_rates,overridden_rates,best_discounts,daily_discounts,start_date,end_date,process_pool=None):
+    if use_process_pool(process_pool,len(room_rates),start_date,end_date):
+        return price_in_process_pool(process_pool,room_rates,overridden_rates,best_discounts,daily_discounts,start_date,end_date)
+    return price_lowest_room_rates_in_process(room_rates,overridden_rates,best_discounts,daily_discounts,start_date,end_date)
+
+def price_lowest_room_rates_in_process(room_rates,overridden_rates,best_discounts,daily_discounts,start_date,end_date):
+    if use_pricing_kernel(len(room_rates),start_date,end_date):
+        dates = list(daterange(to_date(start_date),to_date(end_date)))
+        lowest_rates = PricingKernelService.price_rooms(room_rates,overridden_rates,best_discounts,to_date(start_date),to_date(end_date),daily_discounts)
+        return {
+            room_rate.room_id: [
+                {"date":date,"lowest_rate":PricingKernelService.from_cents(lowest_rate)}
+                for date, lowest_rate in zip(dates,room_lowest_rates.tolist())
+            ]
+            for room_rate, room_lowest_rates in zip(room_rates,lowest_rates)
+        }
+    return {
+        room_rate.room_id: calculate_lowest_room_rates(room_rate.default_rate,overridden_rates[room_rate.room_id],*best_discounts[room_rate.room_id],start_date,end_date,daily_discounts.get(room_rate.room_id))
+        for room_rate in room_rates
+    }
+
+"""
+    Searches the lowest room rates of several rooms for the date range and finds the cheapest room
+
+Parameters:
+    room_rates (iterable): The RoomRate objects.
+    start_date (datetime): The start date.
+    end_date (datetime): The end date.
+
+Returns:
+    dict: The lowest room rates and the total rate of every room, and the room with the lowest total rate.
+"""
+def search_lowest_room_rates(room_rates,start_date:datetime,end_date:datetime):
+    room_rates = list(room_rates)
+    return summarize_search(room_rates,get_lowest_room_rates_for_rooms(room_rates,start_date,end_date))
+
+def summarize_search(room_rates,lowest_room_rates_by_room):
+    rooms = []
+    for room_rate in room_rates:
+        lowest_room_rates = lowest_room_rates_by_room[room_rate.room_id]
+        rooms.append({
+            "room_id":room_rate.room_id,
+            "room_name":room_rate.room_name,
+            "total_rate":sum(lowest_room_rate["lowest_rate"] for lowest_room_rate in lowest_room_rates),
+            "lowest_room_rates":lowest_room_rates,
+        })
+
+    cheapest_room = min(rooms,key=lambda room: room["total_rate"],default=None)
+    if cheapest_room is not None:
+        cheapest_room = {key: cheapest_room[key] for key in ("room_id","room_name","total_rate")}
+    return {"rooms":rooms,"cheapest_room":cheapest_room}
+
+"""
+    Calculates the total stay price of several rooms for the date range and ranks the rooms by it
+
+    The daily rates are summed up while they are calculated, so no per-day rows are kept, and only
+    the cheapest rooms are selected instead of sorting all of them.
+
+Parameters:
+    room_rates (iterable): The RoomRate objects.
+    start_date (datetime): The first night of the stay.
+    end_date (datetime): The last night of the stay.
+    limit (int): The number of cheapest rooms to return, all rooms if None.
+
+Returns:
+    list: The total, average, minimum and maximum nightly rate of the rooms, cheapest room first.
+"""
+def rank_rooms_by_total_rate(room_rates,start_date:datetime,end_date:datetime,limit=None):
+    room_rates = list(room_rates)
+    room_ids = [room_rate.room_id for room_rate in room_rates]
+    if not room_ids:
+        return []
+
+    overridden_rates = get_overridden_rates_by_room(room_ids,start_date,end_date)
+    best_discounts, dated_discounts = get_discounts_by_room(room_ids,to_date(start_date),to_date(end_date))
+    return rank_rooms(room_rates,overridden_rates,best_discounts,get_daily_discounts_by_room(dated_discounts,start_date,end_date),start_date,end_date,limit)
+
+"""
+    Ranks several rooms by their total stay price from already loaded rates and discounts
+
+Returns:
+    list: The total, average, minimum and maximum nightly rate of the rooms, cheapest room first.
+"""
+def rank_rooms(room_rates,overridden_rates,best_discounts,daily_discounts,start_date,end_date,limit=None):
+    if use_pricing_kernel(len(room_rates),start_date,end_date):
+        rooms = summarize_rooms_with_pricing_kernel(room_rates,overridden_rates,best_discounts,start_date,end_date,daily_discounts)
+    else:
+        rooms = summarize_rooms(room_rates,overridden_rates,best_discounts,start_date,end_date,daily_discounts)
+
+    #ties are broken by room id so the ranking is stable
+    ranking_key = lambda room: (room["total_rate"],room["room_id"])
+    if limit is None or limit >= len(rooms):
+        return sorted(rooms,key=ranking_key)
+    return heapq.nsmallest(limit,rooms,key=ranking_key)
+
+def summarize_rooms(room_rates,overridden_rates,best_discounts,start_date,end_date,daily_discounts):
+    rooms = []
+    for room_rate in room_rates:
+        total_rate = 0
+        nights = 0
+        min_rate = max_rate = None
+        for date, lowest_rate in iter_lowest_room_rates(room_rate.default_rate,overridden_rates[room_rate.room_id],*best_discounts[room_rate.room_id],start_date,end_date,daily_discounts.get(room_rate.room_id)):
+            total_rate += lowest_rate
+            nights += 1
+            min_rate = lowest_rate if min_rate is None else min(min_rate,lowest_rate)
+            max_rate = lowest_rate if max_rate is None else max(max_rate,lowest_rate)
+        rooms.append({
+            "room_id":room_rate.room_id,
+            "room_name":room_rate.room_name,
+            "nights":nights,
+            "total_rate":total_rate,
+            "average_rate":total_rate / nights if nights else None,
+            "min_rate":min_rate,
+            "max_rate":max_rate,
+        })
+    return rooms
+
+def summarize_rooms_with_pricing_kernel(room_rates,overridden_rates,best_discounts,start_date,end_date,daily_discounts):
+    lowest_rates = PricingKernelService.price_rooms(room_rates,overridden_rates,best_discounts,to_date(start_date),to_date(end_date),daily_discounts)
+    nights = lowest_rates.shape[1]
+    totals, min_rates, max_rates = lowest_rates.sum(axis=1).tolist(), lowest_rates.min(axis=1).tolist(), lowest_rates.max(axis=1).tolist()
+    return [
+        {
+            "room_id":room_rate.room_id,
+            "room_name":room_rate.room_name,
+            "nights":nights,
+            "total_rate":PricingKernelService.from_cents(total),
+            "average_rate":PricingKernelService.from_cents(total) / nights,
+            "min_rate":PricingKernelService.from_cents(min_rate),
+            "max_rate":PricingKernelService.from_cents(max_rate),
+        }
+        for room_rate, total, min_rate, max_rate in zip(room_rates,totals,min_rates,max_rates)
+    ]
@@ -0,0 +1,204 @@
+import heapq
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+from django.conf import settings
+from apps.api.models import OverriddenRoomRate, OverriddenRoomRateRange, RoomRate
+from apps.api.renderers import FastJSONRenderer
+from apps.api.serializers import CheapestRoomSerializer, format_date, format_rate
+from apps.api.services.BestDiscountService import get_discounted_rate, get_discounts_by_room, iter_dated_discounts
+from apps.api.services.DateIntervalService import iter_lowest_interval_values
+from apps.api.services.LowestRoomRateService import daterange, overridden_room_rate_ranges_query, to_date
+
+
+#number of rooms whose discounts and date range overrides the streamed search loads together
+SEARCH_STREAM_ROOMS_PER_BATCH = 100
+
+"""
+    Merges the single night overrides of a room in stay date order with the interval sweep of its date range overrides
+
+Parameters:
+    overridden_room_rates (iterable): The stay date and the overridden rate of the single night overrides, in stay date order.
+    ranges (list): The start date, end date, weekdays and overridden rate of the date range overrides.
+    start_date (date): The start date.
+    end_date (date): The end date.
+
+Yields:
+    tuple: The stay date and an overridden rate, the lowest rate of a stay date comes first.
+"""
+def merge_overridden_rates_in_order(overridden_room_rates,ranges,start_date,end_date):
+    return heapq.merge(overridden_room_rates,iter_lowest_interval_values(ranges,start_date,end_date))
+
+"""
+    Streams the overridden room rates of a room in stay date order
+
+    The single night overrides are read from the database in chunks and merged with the interval sweep
+    of the date range overrides, so only one chunk of rows is held in memory at a time.
+
+Parameters:
+    room_rate (RoomRate): The RoomRate object.
+    start_date (date): The start date.
+    end_date (date): The end date.
+
+Yields:
+    tuple: The stay date and an overridden rate, the lowest rate of a stay date comes first.
+"""
+def iter_overridden_rates(room_rate:RoomRate,start_date,end_date):
+    overridden_room_rates = (
+        OverriddenRoomRate.objects.filter(room_rate=room_rate,stay_date__range=(start_date,end_date))
+        .order_by('stay_date','overridden_rate')
+        .values_list('stay_date','overridden_rate')
+        .iterator(chunk_size=settings.LOWEST_ROOM_RATE_STREAM_CHUNK_SIZE)
+    )
+    ranges = OverriddenRoomRateRange.objects.filter(room_rate=room_rate,start_date__lte=end_date,end_date__gte=start_date).values_list('start_date','end_date','weekdays','overridden_rate')
+    return merge_overridden_rates_in_order(overridden_room_rates,list(ranges),start_date,end_date)
+
+"""
+    Calculates lowest room rate for a given room for the date range one day at a time
+
+    Gives the same rates as get_lowest_room_rates, but the memory used does not grow with the length of the date range.
+
+Parameters:
+    room_rate (RoomRate): The RoomRate object.
+    start_date (datetime): The start date.
+    end_date (datetime): The end date.
+
+Yields:
+    tuple: The date and the lowest rate of the day.
+"""
+def stream_lowest_room_rates(room_rate:RoomRate,start_date:datetime,end_date:datetime):
+    start_date, end_date = to_date(start_date), to_date(end_date)
+    best_discounts, dated_discounts = get_discounts_by_room([room_rate.room_id],start_date,end_date)
+    return iter_streamed_lowest_room_rates(
+        room_rate.default_rate,
+        iter_overridden_rates(room_rate,start_date,end_date),
+        *best_discounts[room_rate.room_id],
+        dated_discounts.get(room_rate.room_id,[]),
+        start_date,
+        end_date,
+    )
+
+"""
+    Calculates the lowest room rate of every day of a room from its overridden rates in stay date order
+
+Parameters:
+    default_rate (Decimal): The default rate of the room.
+    overridden_rates (iterator): The stay date and the overridden rate, the lowest rate of a stay date first.
+    max_fixed_discount (Decimal): The largest fixed discount of the room.
+    max_percentage_discount (Decimal): The largest percentage discount of the room.
+    dated_discounts (list): The dated discounts of the room, see get_discounts_by_room.
+    start_date (date): The start date.
+    end_date (date): The end date.
+
+Yields:
+    tuple: The date and the lowest rate of the day.
+"""
+def iter_streamed_lowest_room_rates(default_rate,overridden_rates,max_fixed_discount,max_percentage_discount,dated_discounts,start_date,end_date):
+    next_overridden_rate = next(overridden_rates,None)
+    #the dated discounts are swept along with the days, like the overridden rates
+    daily_discounts = iter_dated_discounts(dated_discounts,start_date,end_date)
+    next_daily_discount = next(daily_discounts,None)
+
+    for date in daterange(start_date,end_date):
+        lowest_rate = default_rate
+        if next_overridden_rate is not None and next_overridden_rate[0] == date:
+            #the lowest overridden rate of the day comes first, skip the others
+            lowest_rate = next_overridden_rate[1]
+            while next_overridden_rate is not None and next_overridden_rate[0] == date:
+                next_overridden_rate = next(overridden_rates,None)
+
+        if next_daily_discount is not None and next_daily_discount[0] == date:
+            _, dated_fixed_discount, dated_percentage_discount = next_daily_discount
+            next_daily_discount = next(daily_discounts,None)
+            yield date, get_discounted_rate(lowest_rate,max(max_fixed_discount,dated_fixed_discount),max(max_percentage_discount,dated_percentage_discount))
+        else:
+            yield date, get_discounted_rate(lowest_rate,max_fixed_discount,max_percentage_discount)
+
+"""
+    Calculates lowest room rate for several rooms for the date range one day at a time, one room after the other
+
+    The single night overrides of all the rooms are read with one query in (room, stay date) order, in chunks.
+    The discounts and the date range overrides are loaded for a batch of rooms at a time, so the number of
+    queries does not grow with every room, and the memory used grows with neither the rooms nor the date range.
+
+Parameters:
+    room_rates (iterable): The RoomRate objects.
+    start_date (datetime): The start date.
+    end_date (datetime): The end date.
+
+Yields:
+    tuple: The RoomRate object and the lowest room rates of its days as an iterator of date and lowest rate, in room id order.
+"""
+def stream_lowest_room_rates_for_rooms(room_rates,start_date:datetime,end_date:datetime):
+    start_date, end_date = to_date(start_date), to_date(end_date)
+    room_rates = sorted(room_rates,key=lambda room_rate: room_rate.room_id)
+    if not room_rates:
+        return
+
+    overridden_room_rates = (
+        OverriddenRoomRate.objects.filter(room_rate_id__in=[room_rate.room_id for room_rate in room_rates],stay_date__range=(start_date,end_date))
+        .order_by('room_rate_id','stay_date','overridden_rate')
+        .values_list('room_rate_id','stay_date','overridden_rate')
+        .iterator(chunk_size=settings.LOWEST_ROOM_RATE_STREAM_CHUNK_SIZE)
+    )
+    overridden_rates_by_room = groupby(overridden_room_rates,key=itemgetter(0))
+    next_room_overridden_rates = next(overridden_rates_by_room,None)
+
+    for index in range(0,len(room_rates),SEARCH_STREAM_ROOMS_PER_BATCH):
+        batch = room_rates[index:index + SEARCH_STREAM_ROOMS_PER_BATCH]
+        room_ids = [room_rate.room_id for room_rate in batch]
+        best_discounts, dated_discounts = get_discounts_by_room(room_ids,start_date,end_date)
+        ranges = {}
+        for room_id, *overridden_room_rate_range in overridden_room_rate_ranges_query(room_ids,start_date,end_date):
+            ranges.setdefault(room_id,[]).append(overridden_room_rate_range)
+
+        for room_rate in batch:
+            room_overridden_room_rates = ()
+            if next_room_overridden_rates is not None and next_room_overridden_rates[0] == room_rate.room_id:
+                room_overridden_room_rates = ((stay_date,overridden_rate) for room_id, stay_date, overridden_rate in next_room_overridden_rates[1])
+                next_room_overridden_rates = None
+            yield room_rate, iter_streamed_lowest_room_rates(
+                room_rate.default_rate,
+                merge_overridden_rates_in_order(room_overridden_room_rates,ranges.get(room_rate.room_id,[]),start_date,end_date),
+                *best_discounts[room_rate.room_id],
+                dated_discounts.get(room_rate.room_id,[]),
+                start_date,
+                end_date,
+            )
+            if next_room_overridden_rates is None:
+                #the rows of the room are used up once it is priced, the next group starts the next room with overrides
+                next_room_overridden_rates = next(overridden_rates_by_room,None)
+
+"""
+    Renders the lowest room rates of a room as newline delimited JSON, one line per day
+
+Yields:
+    bytes: One JSON line.
+"""
+def render_lowest_room_rates_ndjson(room_rate:RoomRate,start_date:datetime,end_date:datetime):
+    renderer = FastJSONRenderer()
+    for date, lowest_rate in stream_lowest_room_rates(room_rate,start_date,end_date):
+        yield renderer.render({"date":format_date(date),"lowest_rate":format_rate(lowest_rate)}) + b"\n"
+
+"""
+    Renders the lowest room rates of several rooms as newline delimited JSON
+
+    Every day of every room is one line with the room id. The rooms are priced one after the other in room id order,
+    and the last line holds the cheapest room of the search.
+
+Yields:
+    bytes: One JSON line.
+"""
+def render_search_lowest_room_rates_ndjson(room_rates,start_date:datetime,end_date:datetime):
+    renderer = FastJSONRenderer()
+    cheapest_room = None
+    for room_rate, lowest_room_rates in stream_lowest_room_rates_for_rooms(room_rates,start_date,end_date):
+        total_rate = 0
+        for date, lowest_rate in lowest_room_rates:
+            total_rate += lowest_rate
+            line = {"room_id":room_rate.room_id,"date":format_date(date),"lowest_rate":format_rate(lowest_rate)}
+            yield renderer.render(line) + b"\n"
+        if cheapest_room is None or total_rate < cheapest_room["total_rate"]:
+            cheapest_room = {"room_id":room_rate.room_id,"room_name":room_rate.room_name,"total_rate":total_rate}
+
+    yield renderer.render({"cheapest_room":CheapestRoomSerializer(cheapest_room).data if cheapest_room is not None else None}) + b"\n"
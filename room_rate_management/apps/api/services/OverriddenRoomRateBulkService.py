@@ -0,0 +1,143 @@
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from apps.api.cache import lowest_room_rate_cache
+from apps.api.models import OverriddenRoomRate, RoomRate
+from apps.api.services.LowestRoomRateCalendarService import refresh_lowest_room_rate_calendars
+from apps.api.services.LowestRoomRateService import daterange
+
+
+class TooManyOverriddenRoomRates(Exception):
+    pass
+
+
+#the rows are validated with the model fields instead of a serializer per row
+stay_date_field = OverriddenRoomRate._meta.get_field('stay_date')
+overridden_rate_field = OverriddenRoomRate._meta.get_field('overridden_rate')
+
+def clean_date(value):
+    #the model field only parses strings, other JSON values like numbers and lists raise a TypeError
+    if not isinstance(value,str):
+        raise ValidationError("Date has wrong format. Use one of these formats instead: YYYY-MM-DD.")
+    return stay_date_field.clean(value,None)
+
+def clean_rate(value):
+    #numbers are converted through their string representation like the DRF DecimalField does
+    try:
+        value = Decimal(str(value))
+    except InvalidOperation:
+        raise ValidationError("A valid number is required.")
+    return overridden_rate_field.clean(value,None)
+
+def to_room_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def validate_row(item,fields,room_ids):
+    errors = {}
+    values = {}
+    if not isinstance(item,dict):
+        return None, {"non_field_errors":["Expected an object."]}
+
+    room_id = to_room_id(item.get('room_rate'))
+    if item.get('room_rate') is None:
+        errors['room_rate'] = ["This field is required."]
+    elif room_id not in room_ids:
+        errors['room_rate'] = [f'Invalid pk "{room_id}" - object does not exist.']
+
+    for name, field in fields.items():
+        if item.get(name) is None:
+            errors[name] = ["This field is required."]
+            continue
+        try:
+            values[name] = field(item[name])
+        except ValidationError as error:
+            errors[name] = error.messages
+    values['room_rate'] = room_id
+    return values, errors
+
+"""
+    Creates or updates many overridden room rates in one transaction
+
+    Single nights are given as (room_rate, stay_date, overridden_rate) and date ranges as
+    (room_rate, start_date, end_date, overridden_rate) rules which are expanded to one row per night.
+    The rooms are resolved with one query and the rows are written with one upsert on the
+    (room_rate, stay_date) unique key. A night given both by a rule and by a single night uses the single night,
+    and later items win over earlier ones.
+
+Parameters:
+    overrides (list): The single nights.
+    rules (list): The date range rules.
+
+Returns:
+    tuple: The status of every single night and the status of every rule.
+"""
+def upsert_overridden_room_rates(overrides,rules):
+    if len(overrides) > settings.OVERRIDDEN_ROOM_RATE_BULK_MAX_ROWS:
+        raise TooManyOverriddenRoomRates(f"At most {settings.OVERRIDDEN_ROOM_RATE_BULK_MAX_ROWS} nights can be written in one request")
+    requested_room_ids = {
+        to_room_id(item.get('room_rate')) for item in list(overrides) + list(rules) if isinstance(item,dict)
+    }
+    requested_room_ids.discard(None)
+    room_ids = set(RoomRate.objects.filter(room_id__in=requested_room_ids).values_list('room_id',flat=True))
+
+    #validate every item and expand the rules to nights, the sources of every night are kept for the report
+    nights = {}
+    night_count = len(overrides)
+    rule_results = []
+    for index, item in enumerate(rules):
+        values, errors = validate_row(item,{'start_date':clean_date,'end_date':clean_date,'overridden_rate':clean_rate},room_ids)
+        if not errors and values['start_date'] > values['end_date']:
+            errors['end_date'] = ["End date must not be before the start date."]
+        if errors:
+            rule_results.append({"index":index,"status":"rejected","errors":errors})
+            continue
+        rule_nights = (values['end_date'] - values['start_date']).days + 1
+        night_count += rule_nights
+        if night_count > settings.OVERRIDDEN_ROOM_RATE_BULK_MAX_ROWS:
+            raise TooManyOverriddenRoomRates(f"At most {settings.OVERRIDDEN_ROOM_RATE_BULK_MAX_ROWS} nights can be written in one request")
+        rule_results.append({"index":index,"status":"upserted","nights":rule_nights})
+        for stay_date in daterange(values['start_date'],values['end_date']):
+            nights[(values['room_rate'],stay_date)] = values['overridden_rate']
+
+    override_results = []
+    for index, item in enumerate(overrides):
+        values, errors = validate_row(item,{'stay_date':clean_date,'overridden_rate':clean_rate},room_ids)
+        if errors:
+            override_results.append({"index":index,"status":"rejected","errors":errors})
+            continue
+        override_results.append({"index":index,"status":None,"key":(values['room_rate'],values['stay_date'])})
+        nights[(values['room_rate'],values['stay_date'])] = values['overridden_rate']
+
+    if not nights:
+        return override_results, rule_results
+
+    #the written rooms and dates, used to find the existing rows and to refresh the calendar
+    written_room_ids = {room_id for room_id, stay_date in nights}
+    start_date = min(stay_date for room_id, stay_date in nights)
+    end_date = max(stay_date for room_id, stay_date in nights)
+
+    with transaction.atomic():
+        existing = set(
+            OverriddenRoomRate.objects.filter(room_rate_id__in=written_room_ids,stay_date__range=(start_date,end_date)).values_list('room_rate_id','stay_date')
+        )
+        OverriddenRoomRate.objects.bulk_create(
+            [OverriddenRoomRate(room_rate_id=room_id,stay_date=stay_date,overridden_rate=overridden_rate) for (room_id, stay_date), overridden_rate in nights.items()],
+            update_conflicts=True,
+            unique_fields=['room_rate','stay_date'],
+            update_fields=['overridden_rate'],
+            batch_size=1000,
+        )
+        refresh_lowest_room_rate_calendars(written_room_ids,start_date,end_date)
+
+    #bulk_create does not send the signals which invalidate the cache
+    lowest_room_rate_cache.invalidate_rooms(written_room_ids)
+
+    for result in override_results:
+        key = result.pop('key',None)
+        if key is not None:
+            result['status'] = "updated" if key in existing else "created"
+    return override_results, rule_results
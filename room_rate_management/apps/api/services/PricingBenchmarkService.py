@@ -0,0 +1,261 @@
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.renderers import JSONRenderer
+from apps.api.cache import lowest_room_rate_cache
+from apps.api.models import Discount, DiscountRoomRate, OverriddenRoomRate, RoomRate
+from apps.api.renderers import FastJSONRenderer
+from apps.api.serializers import (
+    ROOM_RATE_COLUMNS,
+    LowestRoomRateListSerializer,
+    OverriddenRoomRateSerializer,
+    RoomRateSerializer,
+    get_overridden_room_rate_columns,
+    serialize_lowest_room_rates,
+    serialize_overridden_room_rates,
+    serialize_room_rates,
+)
+from apps.api.services.BestDiscountService import refresh_best_discounts
+from apps.api.services.LowestRoomRateService import get_lowest_room_rates
+
+
+#the seeded stay dates are outside of the calendar horizon, so every request is priced and not read from the calendar
+BENCHMARK_START_DATE = date(2000, 1, 1)
+
+def random_amount(low, high):
+    return Decimal(random.randint(low * 100, high * 100)).scaleb(-2)
+
+"""
+    Seeds synthetic rooms, overridden room rates and discounts for a benchmark
+
+    The rows are written with bulk inserts, and the best discounts of the rooms are refreshed afterwards because
+    bulk inserts do not send signals.
+
+Parameters:
+    rooms (int): Number of rooms.
+    days (int): Number of days from BENCHMARK_START_DATE with overridden room rates.
+    override_ratio (float): Share of the nights with an overridden rate.
+    discounts (int): Number of discounts, every room gets up to three of them.
+    seed (int): Random seed, the same seed gives the same data.
+
+Returns:
+    list: The seeded RoomRate objects.
+"""
+def seed_pricing_data(rooms,days,override_ratio=0.3,discounts=20,seed=0):
+    random.seed(seed)
+    RoomRate.objects.bulk_create(
+        [RoomRate(room_name=f"benchmark room {index}",default_rate=random_amount(50,500)) for index in range(rooms)]
+    )
+    #not every database returns the ids of bulk inserted rows
+    room_rates = list(RoomRate.objects.filter(room_name__startswith="benchmark room ").order_by('-room_id')[:rooms])[::-1]
+
+    OverriddenRoomRate.objects.bulk_create(
+        (
+            OverriddenRoomRate(room_rate=room_rate,stay_date=BENCHMARK_START_DATE + timedelta(days=day),overridden_rate=random_amount(40,600))
+            for room_rate in room_rates for day in range(days) if random.random() < override_ratio
+        ),
+        batch_size=1000,
+    )
+
+    Discount.objects.bulk_create([
+        Discount(
+            discount_name=f"benchmark discount {index}",
+            discount_type=random.choice([Discount.FIXED,Discount.PERCENTAGE]),
+            discount_value=random_amount(1,40),
+        )
+        for index in range(discounts)
+    ])
+    discount_ids = list(Discount.objects.filter(discount_name__startswith="benchmark discount ").order_by('-discount_id').values_list('discount_id',flat=True)[:discounts])
+    if discount_ids:
+        DiscountRoomRate.objects.bulk_create(
+            [
+                DiscountRoomRate(room_rate=room_rate,discount_id=discount_id)
+                for room_rate in room_rates for discount_id in random.sample(discount_ids,min(3,len(discount_ids)))
+            ],
+            batch_size=1000,
+        )
+    refresh_best_discounts([room_rate.room_id for room_rate in room_rates])
+    return room_rates
+
+"""
+    Measures the latency, the number of queries and the peak Python memory of a function
+
+    The first call warms up the caches of Django and the database and is not measured. The queries and the memory
+    are measured on one extra call, because tracing the allocations slows the calls down too much to time them.
+
+Parameters:
+    function (callable): The function to measure.
+    repeat (int): Number of timed calls.
+
+Returns:
+    dict: The minimum, median and maximum latency in milliseconds, the number of queries and the peak memory in KiB.
+"""
+def measure(function,repeat=5):
+    function()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            function()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "latency_ms":{"min":round(min(timings),3),"median":round(statistics.median(timings),3),"max":round(max(timings),3)},
+        "queries":len(queries),
+        "peak_memory_kb":round(peak_memory / 1024,1),
+    }
+
+def request(client,url,params):
+    #the lowest room rate responses are cached, clear the cache so every call is priced
+    lowest_room_rate_cache.clear()
+    response = client.get(url,params)
+    if response.streaming:
+        b"".join(response.streaming_content)
+    if response.status_code != 200:
+        raise RuntimeError(f"{url} returned {response.status_code}")
+    return response
+
+"""
+    Runs the pricing benchmark scenarios over the seeded rooms
+
+Parameters:
+    room_rates (list): The seeded RoomRate objects.
+    room_counts (list): The numbers of rooms priced by the multi room scenarios.
+    day_counts (list): The lengths of the date ranges.
+    repeat (int): Number of timed calls per scenario.
+
+    The RoomRates and Discounts list scenarios do not depend on the date range, they are measured once with days set
+    to None and rooms set to the number of listed rows, the whole list and a page of every room count.
+
+Returns:
+    list: A dict with the scenario, the number of rooms and days and the measurements for every scenario.
+"""
+def run_pricing_benchmark(room_rates,room_counts,day_counts,repeat=5):
+    client = Client()
+    room_rate = room_rates[0]
+    results = []
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS,'testserver']):
+        for days in day_counts:
+            start_date = datetime.combine(BENCHMARK_START_DATE,datetime.min.time())
+            end_date = start_date + timedelta(days=days - 1)
+            params = {"start_date":start_date.strftime('%Y-%m-%d'),"end_date":end_date.strftime('%Y-%m-%d')}
+
+            single_room_scenarios = {
+                "get_lowest_room_rates": lambda: get_lowest_room_rates(room_rate,start_date,end_date),
+                "GET LowestRoomRates/<room_id>": lambda: request(client,f"/api/LowestRoomRates/{room_rate.room_id}",params),
+                "GET LowestRoomRates/<room_id> stream": lambda: request(client,f"/api/LowestRoomRates/{room_rate.room_id}",{**params,"stream":"true"}),
+                "GET OverriddenRoomRates/<room_id>": lambda: request(client,f"/api/OverriddenRoomRates/{room_rate.room_id}",{"from":params["start_date"],"to":params["end_date"]}),
+            }
+            for name, function in single_room_scenarios.items():
+                results.append({"scenario":name,"rooms":1,"days":days,**measure(function,repeat)})
+
+            for rooms in room_counts:
+                search_params = {**params,"room_ids":",".join(str(room_rate.room_id) for room_rate in room_rates[:rooms])}
+                multi_room_scenarios = {
+                    "GET LowestRoomRates": lambda: request(client,"/api/LowestRoomRates/",search_params),
+                    "GET LowestRoomRates mode=total": lambda: request(client,"/api/LowestRoomRates/",{**search_params,"mode":"total"}),
+                }
+                for name, function in multi_room_scenarios.items():
+                    results.append({"scenario":name,"rooms":rooms,"days":days,**measure(function,repeat)})
+
+        for name, url, model in (("GET RoomRates","/api/RoomRates/",RoomRate),("GET Discounts","/api/Discounts/",Discount)):
+            list_scenarios = {name:(model.objects.count(),lambda url=url: request(client,url,{}))}
+            for rooms in room_counts:
+                list_scenarios[f"{name} page_size={rooms}"] = (rooms,lambda url=url,rooms=rooms: request(client,url,{"page_size":rooms}))
+            for scenario, (rows, function) in list_scenarios.items():
+                results.append({"scenario":scenario,"rooms":rows,"days":None,**measure(function,repeat)})
+    return results
+
+"""
+    Compares benchmark results with the results of an earlier run
+
+Parameters:
+    results (list): The results of this run.
+    baseline (list): The results of the earlier run.
+
+Returns:
+    list: The scenario, rooms, days, and the median latency, queries and peak memory of both runs, for the scenarios in both.
+"""
+def compare_pricing_benchmarks(results,baseline):
+    baseline = {(result["scenario"],result["rooms"],result["days"]): result for result in baseline}
+    comparison = []
+    for result in results:
+        previous = baseline.get((result["scenario"],result["rooms"],result["days"]))
+        if previous is None:
+            continue
+        comparison.append({
+            "scenario":result["scenario"],
+            "rooms":result["rooms"],
+            "days":result["days"],
+            "median_ms":(previous["latency_ms"]["median"],result["latency_ms"]["median"]),
+            "queries":(previous["queries"],result["queries"]),
+            "peak_memory_kb":(previous["peak_memory_kb"],result["peak_memory_kb"]),
+        })
+    return comparison
+
+"""
+    Compares the per row cost of the DRF serializers and the fast serialization paths of the read endpoints
+
+    Both paths read the rows from the database, serialize and render them, and must give the same bytes.
+
+Parameters:
+    rows (int): Number of rows of every scenario.
+    repeat (int): Number of timed calls per scenario.
+
+Returns:
+    list: A dict with the scenario, the number of rows and the measurements of both paths for every scenario.
+"""
+def run_serializer_benchmark(rows,repeat=5):
+    room_rates = seed_pricing_data(rows,0,discounts=0)
+    room_rate = room_rates[0]
+    OverriddenRoomRate.objects.bulk_create(
+        [OverriddenRoomRate(room_rate=room_rate,stay_date=BENCHMARK_START_DATE + timedelta(days=day),overridden_rate=random_amount(40,600)) for day in range(rows)],
+        batch_size=1000,
+    )
+    start_date = datetime.combine(BENCHMARK_START_DATE,datetime.min.time())
+    lowest_room_rates = get_lowest_room_rates(room_rate,start_date,start_date + timedelta(days=rows - 1))
+    room_rates = RoomRate.objects.filter(room_id__in=[room_rate.room_id for room_rate in room_rates]).order_by('room_id')
+    overridden_room_rates = OverriddenRoomRate.objects.filter(room_rate=room_rate)
+
+    scenarios = {
+        "LowestRoomRates": (
+            lambda: JSONRenderer().render(LowestRoomRateListSerializer(lowest_room_rates,many=True).data),
+            lambda: FastJSONRenderer().render(serialize_lowest_room_rates(lowest_room_rates)),
+        ),
+        "RoomRates": (
+            lambda: JSONRenderer().render(RoomRateSerializer(room_rates.all(),many=True).data),
+            lambda: FastJSONRenderer().render(serialize_room_rates(room_rates.values_list(*ROOM_RATE_COLUMNS,named=True))),
+        ),
+        "OverriddenRoomRates": (
+            lambda: JSONRenderer().render(OverriddenRoomRateSerializer(overridden_room_rates.select_related('room_rate'),many=True).data),
+            lambda: FastJSONRenderer().render(serialize_overridden_room_rates(overridden_room_rates.values_list(*get_overridden_room_rate_columns(),named=True))),
+        ),
+    }
+    results = []
+    for name, (serializer, fast_path) in scenarios.items():
+        if serializer() != fast_path():
+            raise RuntimeError(f"The fast path of {name} does not give the bytes of the serializer")
+        for path, function in (("serializer",serializer),("fast path",fast_path)):
+            measurements = measure(function,repeat)
+            results.append({
+                "scenario":name,
+                "path":path,
+                "rows":rows,
+                "per_row_us":round(measurements["latency_ms"]["median"] * 1000 / rows,3),
+                **measurements,
+            })
+    return results
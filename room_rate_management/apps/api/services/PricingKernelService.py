@@ -0,0 +1,105 @@
+from decimal import Decimal
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional dependency
+    np = None
+
+
+#percentages above 100% discount the whole rate, capping them keeps the integer products far from overflowing
+MAX_PERCENTAGE_HUNDREDTHS = 10000
+CENTS = Decimal('0.01')
+
+def is_available():
+    return np is not None
+
+def to_cents(value):
+    return int(Decimal(value).quantize(CENTS).scaleb(2))
+
+def from_cents(value):
+    return Decimal(int(value)).scaleb(-2)
+
+"""
+    Prices a rooms x days matrix of rates with array operations
+
+    All the amounts are integers in cents, and the percentages are in hundredths of a percent. rate_cents * percentage
+    is then the exact discount in millionths, so the result matches the Decimal calculation to the cent. It is rounded
+    half to even like the serializers and the database round the Decimal results.
+
+Parameters:
+    default_rates (list): The default rate of every room in cents.
+    overrides (tuple): Arrays of room indexes, day indexes and overridden rates in cents.
+    max_fixed_discounts (list): The largest fixed discount of every room in cents.
+    max_percentage_discounts (list): The largest percentage discount of every room in hundredths of a percent.
+    days (int): The number of days in the date range.
+    dated_discounts (tuple): Arrays of room indexes, day indexes, fixed discounts in cents and percentage discounts
+        in hundredths of a percent of the days with dated discounts, optional.
+
+Returns:
+    numpy.ndarray: The lowest rate of every room and day in cents.
+"""
+def price_rate_matrix(default_rates,overrides,max_fixed_discounts,max_percentage_discounts,days,dated_discounts=None):
+    rates = np.repeat(np.asarray(default_rates,dtype=np.int64)[:,None],days,axis=1)
+    room_indexes, day_indexes, overridden_rates = overrides
+    rates[np.asarray(room_indexes,dtype=np.intp),np.asarray(day_indexes,dtype=np.intp)] = np.asarray(overridden_rates,dtype=np.int64)
+
+    percentages = np.asarray(max_percentage_discounts,dtype=np.int64)[:,None]
+    fixed_discounts = np.asarray(max_fixed_discounts,dtype=np.int64)[:,None]
+    if dated_discounts is not None and len(dated_discounts[0]):
+        #the days with dated discounts take the larger of the room's and the dated discount
+        room_indexes, day_indexes, dated_fixed_discounts, dated_percentages = (np.asarray(values,dtype=np.int64) for values in dated_discounts)
+        percentages = np.repeat(percentages,days,axis=1)
+        fixed_discounts = np.repeat(fixed_discounts,days,axis=1)
+        percentages[room_indexes,day_indexes] = np.maximum(percentages[room_indexes,day_indexes],dated_percentages)
+        fixed_discounts[room_indexes,day_indexes] = np.maximum(fixed_discounts[room_indexes,day_indexes],dated_fixed_discounts)
+    percentages = np.minimum(percentages,MAX_PERCENTAGE_HUNDREDTHS)
+    fixed_discounts = fixed_discounts * 10000
+    #like get_max_discount, a discount is never negative
+    discounts = np.maximum(np.maximum(fixed_discounts,rates * percentages),0)
+    lowest_rates = np.maximum(rates * 10000 - discounts,0)
+
+    #round the millionths half to even to cents
+    cents, remainder = np.divmod(lowest_rates,10000)
+    round_up = (remainder > 5000) | ((remainder == 5000) & (cents % 2 == 1))
+    return cents + round_up
+
+"""
+    Builds the kernel inputs from the loaded rates and discounts of the rooms
+
+Parameters:
+    room_rates (list): The RoomRate objects.
+    overridden_rates (dict): The lowest overridden rate by stay date, by room id.
+    best_discounts (dict): The largest fixed discount and the largest percentage discount, by room id.
+    start_date (date): The start date.
+    end_date (date): The end date.
+    daily_discounts (dict): The largest fixed and percentage dated discount by stay date, by room id, optional.
+
+Returns:
+    numpy.ndarray: The lowest rate of every room and day in cents.
+"""
+def price_rooms(room_rates,overridden_rates,best_discounts,start_date,end_date,daily_discounts=None):
+    days = (end_date - start_date).days + 1
+
+    room_indexes, day_indexes, overridden_cents = [], [], []
+    for room_index, room_rate in enumerate(room_rates):
+        for stay_date, overridden_rate in overridden_rates[room_rate.room_id].items():
+            room_indexes.append(room_index)
+            day_indexes.append((stay_date - start_date).days)
+            overridden_cents.append(to_cents(overridden_rate))
+
+    dated_discounts = ([], [], [], [])
+    for room_index, room_rate in enumerate(room_rates):
+        for stay_date, (max_fixed_discount, max_percentage_discount) in (daily_discounts or {}).get(room_rate.room_id,{}).items():
+            dated_discounts[0].append(room_index)
+            dated_discounts[1].append((stay_date - start_date).days)
+            dated_discounts[2].append(to_cents(max_fixed_discount))
+            dated_discounts[3].append(to_cents(max_percentage_discount))
+
+    return price_rate_matrix(
+        [to_cents(room_rate.default_rate) for room_rate in room_rates],
+        (room_indexes,day_indexes,overridden_cents),
+        [to_cents(best_discounts[room_rate.room_id][0]) for room_rate in room_rates],
+        [to_cents(best_discounts[room_rate.room_id][1]) for room_rate in room_rates],
+        max(days,0),
+        dated_discounts,
+    )
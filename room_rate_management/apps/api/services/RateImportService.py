@@ -0,0 +1,297 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.core.exceptions import ValidationError
+from django.core.validators import DecimalValidator
+from django.db import router, transaction
+from django.utils.dateparse import parse_date
+from apps.api.cache import lowest_room_rate_cache
+from apps.api.models import ALL_WEEKDAYS, Discount, OverriddenRoomRate, RoomRate
+from apps.api.services.LowestRoomRateCalendarService import refresh_lowest_room_rate_calendars
+from apps.api.services.OverriddenRoomRateBulkService import to_room_id
+
+
+#the rows are validated with small cleaners built from the model fields instead of a serializer per row,
+#they give the messages of the DRF fields
+
+REQUIRED = object()
+
+def text_cleaner(model,name):
+    max_length = model._meta.get_field(name).max_length
+    def clean(value):
+        value = str(value).strip()
+        if not value:
+            raise ValidationError("This field may not be blank.")
+        if len(value) > max_length:
+            raise ValidationError(f"Ensure this field has no more than {max_length} characters.")
+        return value
+    return clean
+
+def amount_cleaner(model,name):
+    field = model._meta.get_field(name)
+    validator = DecimalValidator(field.max_digits,field.decimal_places)
+    def clean(value):
+        #numbers are converted through their string representation like the DRF DecimalField does
+        try:
+            value = Decimal(str(value))
+        except InvalidOperation:
+            raise ValidationError("A valid number is required.")
+        if not value.is_finite():
+            raise ValidationError("A valid number is required.")
+        validator(value)
+        return value
+    return clean
+
+def choice_cleaner(model,name):
+    choices = {choice for choice, label in model._meta.get_field(name).choices}
+    def clean(value):
+        if value not in choices:
+            raise ValidationError(f'"{value}" is not a valid choice.')
+        return value
+    return clean
+
+def clean_date(value):
+    #parsed with parse_date like the DateField of the serializers, so the import takes the dates the endpoints take
+    try:
+        parsed = parse_date(value)
+    except (TypeError, ValueError):
+        parsed = None
+    if parsed is None:
+        raise ValidationError("Date has wrong format. Use one of these formats instead: YYYY-MM-DD.")
+    return parsed
+
+def clean_weekdays(value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError("A valid integer is required.")
+    if not 1 <= value <= ALL_WEEKDAYS:
+        raise ValidationError(f"Ensure this value is between 1 and {ALL_WEEKDAYS}.")
+    return value
+
+def room_id_cleaner(room_ids):
+    def clean(value):
+        room_id = to_room_id(value)
+        if room_id is None:
+            raise ValidationError(f"Incorrect type. Expected pk value, received {type(value).__name__}.")
+        if room_id not in room_ids:
+            raise ValidationError(f'Invalid pk "{room_id}" - object does not exist.')
+        return room_id
+    return clean
+
+def validate_validity(valid_from,valid_to):
+    if valid_from is not None and valid_to is not None and valid_from > valid_to:
+        return {"valid_to":["Valid to must not be before valid from."]}
+    return {}
+
+#the columns of every import kind: the model field, its cleaner and its default, REQUIRED if it has none
+
+ROOM_RATE_COLUMNS = [
+    ('room_name',text_cleaner(RoomRate,'room_name'),REQUIRED),
+    ('default_rate',amount_cleaner(RoomRate,'default_rate'),REQUIRED),
+]
+
+OVERRIDDEN_ROOM_RATE_COLUMNS = [
+    ('room_rate',None,REQUIRED),
+    ('stay_date',clean_date,REQUIRED),
+    ('overridden_rate',amount_cleaner(OverriddenRoomRate,'overridden_rate'),REQUIRED),
+]
+
+DISCOUNT_COLUMNS = [
+    ('discount_name',text_cleaner(Discount,'discount_name'),REQUIRED),
+    ('discount_type',choice_cleaner(Discount,'discount_type'),Discount.FIXED),
+    ('discount_value',amount_cleaner(Discount,'discount_value'),REQUIRED),
+    ('valid_from',clean_date,None),
+    ('valid_to',clean_date,None),
+    ('weekdays',clean_weekdays,ALL_WEEKDAYS),
+]
+
+IMPORT_MODELS = {
+    'room_rates':RoomRate,
+    'overridden_room_rates':OverriddenRoomRate,
+    'discounts':Discount,
+}
+
+"""
+    Validates a chunk of rows against the columns of an import kind
+
+Parameters:
+    items (list): The rows.
+    columns (list): The name, the cleaner and the default of every column.
+    validate (callable): Called with the cleaned values of a row, returns the errors across the columns, optional.
+
+Returns:
+    tuple: The cleaned values of every valid row in column order, and the index and the errors of every rejected row.
+"""
+def validate_rows(items,columns,validate=None):
+    rows, rejected = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item,dict):
+            rejected.append((index,{"non_field_errors":["Expected an object."]}))
+            continue
+        row, errors = [], {}
+        for name, clean, default in columns:
+            value = item.get(name)
+            if value is None:
+                if default is REQUIRED:
+                    errors[name] = ["This field is required."]
+                row.append(default)
+                continue
+            try:
+                row.append(clean(value))
+            except ValidationError as error:
+                errors[name] = error.messages
+        if not errors and validate is not None:
+            errors = validate(*row)
+        if errors:
+            rejected.append((index,errors))
+        else:
+            rows.append(row)
+    return rows, rejected
+
+def validate_room_rates(items):
+    return validate_rows(items,ROOM_RATE_COLUMNS)
+
+def validate_discounts(items):
+    return validate_rows(items,DISCOUNT_COLUMNS,lambda discount_name, discount_type, discount_value, valid_from, valid_to, weekdays: validate_validity(valid_from,valid_to))
+
+"""
+    Validates a chunk of overridden room rate rows
+
+    The rooms of the chunk which are not known yet are resolved with one query. Only the last row of a room and stay
+    date is kept, like later items win in the bulk overridden room rate upsert.
+
+Parameters:
+    items (list): The rows.
+    room_ids (set): The ids of the rooms known to exist, the rooms found by this chunk are added to it.
+
+Returns:
+    tuple: The room id, stay date and overridden rate of every night, and the index and the errors of every rejected row.
+"""
+def validate_overridden_room_rates(items,room_ids):
+    requested_room_ids = {to_room_id(item.get('room_rate')) for item in items if isinstance(item,dict)} - room_ids
+    requested_room_ids.discard(None)
+    if requested_room_ids:
+        room_ids.update(RoomRate.objects.filter(room_id__in=requested_room_ids).values_list('room_id',flat=True))
+
+    columns = [(name, room_id_cleaner(room_ids) if name == 'room_rate' else clean, default) for name, clean, default in OVERRIDDEN_ROOM_RATE_COLUMNS]
+    rows, rejected = validate_rows(items,columns)
+    nights = {(room_id,stay_date): overridden_rate for room_id, stay_date, overridden_rate in rows}
+    return [[room_id,stay_date,overridden_rate] for (room_id, stay_date), overridden_rate in nights.items()], rejected
+
+#the validation and the columns written by every import kind
+IMPORTERS = {
+    'room_rates':(validate_room_rates,ROOM_RATE_COLUMNS),
+    'discounts':(validate_discounts,DISCOUNT_COLUMNS),
+}
+
+"""
+    Inserts rows with bulk_create, optionally updating the rows which conflict on a unique key
+
+Parameters:
+    model (Model): The model of the table.
+    names (list): The model fields of the values.
+    rows (list): The values of every row.
+    unique_fields (list): The fields of the unique key, optional.
+    update_fields (list): The fields updated on a conflict, optional.
+"""
+def insert_rows(model,names,rows,unique_fields=None,update_fields=None):
+    if not rows:
+        return
+    #the foreign keys are given as ids
+    attnames = [model._meta.get_field(name).attname for name in names]
+    model.objects.bulk_create(
+        [model(**dict(zip(attnames,row))) for row in rows],
+        update_conflicts=bool(update_fields),
+        unique_fields=unique_fields,
+        update_fields=update_fields,
+        batch_size=1000,
+    )
+
+"""
+    Reads the rows of a CSV file with a header line, empty cells are missing values
+
+Yields:
+    tuple: The line number and the row.
+"""
+def iter_csv_rows(file):
+    reader = csv.DictReader(file)
+    for row in reader:
+        yield reader.line_num, {name: value for name, value in row.items() if value != ''}
+
+"""
+    Reads the rows of a file with one JSON object per line, blank lines are skipped
+
+Yields:
+    tuple: The line number and the row, None if the line is not valid JSON.
+"""
+def iter_jsonl_rows(file):
+    for line_number, line in enumerate(file,start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            yield line_number, None
+
+"""
+    Imports room rates, overridden room rates or discounts in chunks
+
+    Every chunk is validated at once and written with one statement in its own transaction, the overridden room
+    rates are upserted on the (room_rate, stay_date) unique key. Rejected rows do not stop the import. No signals are
+    sent, so the calendars and the cached lowest room rates of the rooms with new overridden rates are refreshed once
+    at the end. Imported rooms have no calendar until the next rebuild, until then they are priced on request.
+
+Parameters:
+    kind (str): room_rates, overridden_room_rates or discounts.
+    rows (iterable): The line number and the row of every row, see iter_csv_rows and iter_jsonl_rows.
+    chunk_size (int): Number of rows validated and written together.
+    on_reject (callable): Called with the line number and the errors of every rejected row, optional.
+    refresh (bool): Whether to refresh the calendars of the rooms with new overridden rates.
+
+Returns:
+    dict: The number of read, imported and rejected rows.
+"""
+def import_rates(kind,rows,chunk_size=5000,on_reject=None,refresh=True):
+    if kind not in IMPORT_MODELS:
+        raise ValueError(f"Unknown import kind {kind}")
+    model = IMPORT_MODELS[kind]
+    database = router.db_for_write(model)
+
+    rows = iter(rows)
+    room_ids = set()
+    written_room_ids = set()
+    start_date = end_date = None
+    report = {"rows":0,"imported":0,"rejected":0}
+
+    while chunk := list(islice(rows,chunk_size)):
+        items = [item for line_number, item in chunk]
+        with transaction.atomic(using=database):
+            if model is OverriddenRoomRate:
+                nights, rejected = validate_overridden_room_rates(items,room_ids)
+                insert_rows(model,[name for name, clean, default in OVERRIDDEN_ROOM_RATE_COLUMNS],nights,unique_fields=['room_rate','stay_date'],update_fields=['overridden_rate'])
+            else:
+                validate, columns = IMPORTERS[kind]
+                values, rejected = validate(items)
+                insert_rows(model,[name for name, clean, default in columns],values)
+
+        if model is OverriddenRoomRate and nights:
+            written_room_ids.update(room_id for room_id, stay_date, overridden_rate in nights)
+            chunk_start_date = min(stay_date for room_id, stay_date, overridden_rate in nights)
+            chunk_end_date = max(stay_date for room_id, stay_date, overridden_rate in nights)
+            start_date = chunk_start_date if start_date is None else min(start_date,chunk_start_date)
+            end_date = chunk_end_date if end_date is None else max(end_date,chunk_end_date)
+
+        report["rows"] += len(chunk)
+        report["imported"] += len(chunk) - len(rejected)
+        report["rejected"] += len(rejected)
+        if on_reject is not None:
+            for index, errors in rejected:
+                on_reject(chunk[index][0],errors)
+
+    if written_room_ids:
+        if refresh:
+            refresh_lowest_room_rate_calendars(written_room_ids,start_date,end_date)
+        lowest_room_rate_cache.invalidate_rooms(written_room_ids)
+    return report
@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.api.cache import lowest_room_rate_cache
+from apps.api.models import Discount, DiscountRoomRate, OverriddenRoomRate, OverriddenRoomRateRange, RoomRate
+
+
+#drop the cached lowest room rates of every room whose rates or discounts changed. The signals are sent inside the
+#transaction of the write, a request reading before the commit could cache the old rates again, so the rooms are
+#only invalidated once the write is committed.
+
+def invalidate_rooms_on_commit(room_ids):
+    room_ids = list(room_ids)
+    transaction.on_commit(lambda: lowest_room_rate_cache.invalidate_rooms(room_ids))
+
+@receiver([post_save, post_delete], sender=RoomRate)
+def invalidate_room_rate(sender, instance, **kwargs):
+    invalidate_rooms_on_commit([instance.room_id])
+
+@receiver([post_save, post_delete], sender=OverriddenRoomRate)
+@receiver([post_save, post_delete], sender=OverriddenRoomRateRange)
+@receiver([post_save, post_delete], sender=DiscountRoomRate)
+def invalidate_room_rate_relation(sender, instance, **kwargs):
+    invalidate_rooms_on_commit([instance.room_rate_id])
+
+#deleting a discount deletes its mappings, which invalidate their rooms on their own
+@receiver(post_save, sender=Discount)
+def invalidate_discount(sender, instance, **kwargs):
+    invalidate_rooms_on_commit(DiscountRoomRate.objects.filter(discount=instance).values_list('room_rate_id', flat=True))
@@ -1,3 +1,1099 @@
-from django.test import TestCase
+import base64
+import json
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from apps.api.cache import LowestRoomRateCache, SharedLowestRoomRateCache, lowest_room_rate_cache
+from apps.api.renderers import FastJSONRenderer
+from apps.api.models import Discount, DiscountRoomRate, LowestRoomRateCalendar, OverriddenRoomRate, OverriddenRoomRateRange, RoomRate, RoomRateBestDiscount
+from apps.api.services import PricingKernelService
+from apps.api.services.BestDiscountService import get_discounted_rate, get_max_discount, refresh_best_discounts
+from apps.api.services.DateIntervalService import iter_lowest_interval_values
+from apps.api.services.LowestRoomRateExportService import iter_lowest_room_rate_batches, read_lowest_room_rates_columnar
+from apps.api.serializers import LowestRoomRateListSerializer, LowestRoomRateSearchSerializer, OverriddenRoomRateSerializer, RoomRateSerializer
+from apps.api.services.PricingBenchmarkService import compare_pricing_benchmarks, run_pricing_benchmark, run_serializer_benchmark, seed_pricing_data
+from apps.api.services.LowestRoomRateService import get_lowest_room_rates, get_lowest_room_rates_for_rooms, pricing_process_pool, rank_rooms_by_total_rate, search_lowest_room_rates
+
+
+class LowestRoomRateServiceTest(TestCase):
+
+    def setUp(self):
+        self.room_rate = RoomRate.objects.create(room_name="deluxe room", default_rate=Decimal("200.00"))
+        fixed = Discount.objects.create(discount_name="flat", discount_type=Discount.FIXED, discount_value=Decimal("30.00"))
+        percentage = Discount.objects.create(discount_name="summer", discount_type=Discount.PERCENTAGE, discount_value=Decimal("10.00"))
+        DiscountRoomRate.objects.create(room_rate=self.room_rate, discount=fixed)
+        DiscountRoomRate.objects.create(room_rate=self.room_rate, discount=percentage)
+        refresh_best_discounts([self.room_rate.room_id])
+        OverriddenRoomRate.objects.create(room_rate=self.room_rate, stay_date=date(2024, 7, 11), overridden_rate=Decimal("400.00"))
+        OverriddenRoomRate.objects.create(room_rate=self.room_rate, stay_date=date(2024, 7, 12), overridden_rate=Decimal("20.00"))
+
+    def test_lowest_room_rates(self):
+        lowest_room_rates = get_lowest_room_rates(self.room_rate, datetime(2024, 7, 10), datetime(2024, 7, 12))
+        self.assertEqual(lowest_room_rates, [
+            {"date": date(2024, 7, 10), "lowest_rate": Decimal("170.00")},
+            {"date": date(2024, 7, 11), "lowest_rate": Decimal("360.00")},
+            {"date": date(2024, 7, 12), "lowest_rate": 0},
+        ])
+
+    def test_query_count_does_not_depend_on_date_range(self):
+        start_date = datetime(2024, 1, 1)
+        with self.assertNumQueries(3):
+            get_lowest_room_rates(self.room_rate, start_date, start_date + timedelta(days=1))
+        with self.assertNumQueries(3):
+            get_lowest_room_rates(self.room_rate, start_date, start_date + timedelta(days=365))
+
+
+class BestDiscountTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.room_rate = RoomRate.objects.create(room_name="deluxe room", default_rate=Decimal("200.00"))
+        self.fixed = Discount.objects.create(discount_name="flat", discount_type=Discount.FIXED, discount_value=Decimal("30.00"))
+        self.percentage = Discount.objects.create(discount_name="summer", discount_type=Discount.PERCENTAGE, discount_value=Decimal("10.00"))
+
+    def get_best_discount(self):
+        best_discount = RoomRateBestDiscount.objects.get(room_rate=self.room_rate)
+        return best_discount.max_fixed_discount, best_discount.max_percentage_discount
+
+    def test_best_discount_follows_discount_changes(self):
+        response = self.client.post(
+            "/api/RoomRateDiscounts/",
+            [{"room_id": self.room_rate.room_id, "discounts": [self.fixed.discount_id, self.percentage.discount_id]}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get_best_discount(), (Decimal("30.00"), Decimal("10.00")))
+
+        response = self.client.put(reverse("discount-detail", args=[self.percentage.discount_id]), {"discount_value": 25}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_best_discount(), (Decimal("30.00"), Decimal("25.00")))
+
+        response = self.client.put(reverse("discount-detail", args=[self.fixed.discount_id]), {"discount_type": Discount.PERCENTAGE}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_best_discount(), (Decimal("0.00"), Decimal("30.00")))
+
+        response = self.client.delete(reverse("discount-detail", args=[self.fixed.discount_id]))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_best_discount(), (Decimal("0.00"), Decimal("25.00")))
+
+    def test_rates_without_a_positive_discount_are_not_raised(self):
+        self.assertEqual(get_max_discount(Decimal("200.00"), Decimal("0.00"), Decimal("0.00")), Decimal("0.00"))
+        self.assertEqual(get_max_discount(Decimal("200.00"), Decimal("-30.00"), Decimal("-10.00")), Decimal("0.00"))
+        self.assertEqual(get_discounted_rate(Decimal("200.00"), Decimal("-30.00"), Decimal("-10.00")), Decimal("200.00"))
+        lowest_rates = PricingKernelService.price_rate_matrix([20000], ([], [], []), [-3000], [-1000], 1)
+        self.assertEqual(lowest_rates.tolist(), [[20000]])
+
+    def test_admin_changes_refresh_the_derived_data(self):
+        mapping = DiscountRoomRate(room_rate=self.room_rate, discount=self.fixed)
+        admin.site.get_model_admin(DiscountRoomRate).save_model(None, mapping, None, False)
+        self.assertEqual(self.get_best_discount(), (Decimal("30.00"), Decimal("0.00")))
+
+        self.fixed.discount_value = Decimal("50.00")
+        admin.site.get_model_admin(Discount).save_model(None, self.fixed, None, True)
+        self.assertEqual(self.get_best_discount(), (Decimal("50.00"), Decimal("0.00")))
+        calendar = LowestRoomRateCalendar.objects.get(room_rate=self.room_rate, stay_date=timezone.localdate())
+        self.assertEqual(calendar.lowest_rate, Decimal("150.00"))
+
+        admin.site.get_model_admin(Discount).delete_model(None, self.fixed)
+        self.assertEqual(self.get_best_discount(), (Decimal("0.00"), Decimal("0.00")))
+        self.assertFalse(admin.site.get_model_admin(LowestRoomRateCalendar).has_change_permission(None))
+
+
+class LowestRoomRateCalendarTest(TestCase):
+
+    def setUp(self):
+        lowest_room_rate_cache.clear()
+        self.client = APIClient()
+        response = self.client.post(reverse("room-list"), {"room_name": "deluxe room", "default_rate": "200.00"}, format="json")
+        self.room_id = response.data["room_id"]
+        self.today = timezone.localdate()
+
+    def get_lowest_rate(self, stay_date):
+        return LowestRoomRateCalendar.objects.get(room_rate_id=self.room_id, stay_date=stay_date).lowest_rate
+
+    def get_lowest_room_rates(self, start_date, end_date):
+        return self.client.get(
+            reverse("lowest-room-rate", args=[self.room_id]),
+            {"start_date": start_date.isoformat(), "end_date": end_date.isoformat()},
+        )
+
+    def test_calendar_is_built_for_new_rooms(self):
+        self.assertEqual(LowestRoomRateCalendar.objects.filter(room_rate_id=self.room_id).count(), settings.LOWEST_ROOM_RATE_CALENDAR_DAYS)
+
+    def test_writes_refresh_the_calendar(self):
+        stay_date = self.today + timedelta(days=3)
+        self.client.post("/api/OverriddenRoomRates/", {"room_rate": self.room_id, "stay_date": stay_date.isoformat(), "overridden_rate": "150.00"}, format="json")
+        self.assertEqual(self.get_lowest_rate(stay_date), Decimal("150.00"))
+
+        discount = Discount.objects.create(discount_name="summer", discount_type=Discount.PERCENTAGE, discount_value=Decimal("10.00"))
+        self.client.post("/api/RoomRateDiscounts/", [{"room_id": self.room_id, "discounts": [discount.discount_id]}], format="json")
+        self.assertEqual(self.get_lowest_rate(stay_date), Decimal("135.00"))
+        self.assertEqual(self.get_lowest_rate(self.today), Decimal("180.00"))
+
+        self.client.put(reverse("room-detail", args=[self.room_id]), {"default_rate": "100.00"}, format="json")
+        self.assertEqual(self.get_lowest_rate(self.today), Decimal("90.00"))
+
+        self.client.delete(f"/api/OverriddenRoomRates/{self.room_id}?stay_date={stay_date.isoformat()}")
+        self.assertEqual(self.get_lowest_rate(stay_date), Decimal("90.00"))
+
+        self.client.delete(reverse("discount-detail", args=[discount.discount_id]))
+        self.assertEqual(self.get_lowest_rate(stay_date), Decimal("100.00"))
+
+    def test_moving_an_override_refreshes_both_nights(self):
+        old_date, new_date = self.today + timedelta(days=3), self.today + timedelta(days=5)
+        self.client.post("/api/OverriddenRoomRates/", {"room_rate": self.room_id, "stay_date": old_date.isoformat(), "overridden_rate": "50.00"}, format="json")
+        response = self.client.put(f"/api/OverriddenRoomRates/{self.room_id}?stay_date={old_date.isoformat()}", {"stay_date": new_date.isoformat()}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_lowest_rate(old_date), Decimal("200.00"))
+        self.assertEqual(self.get_lowest_rate(new_date), Decimal("50.00"))
+
+    def test_lowest_room_rates_are_read_from_the_calendar(self):
+        LowestRoomRateCalendar.objects.filter(room_rate_id=self.room_id, stay_date=self.today).update(lowest_rate=Decimal("1.00"))
+        with self.assertNumQueries(2):
+            response = self.get_lowest_room_rates(self.today, self.today + timedelta(days=365))
+        self.assertEqual(len(response.data), 366)
+        self.assertEqual(response.data[0], {"date": self.today.isoformat(), "lowest_rate": "1.00"})
+
+    def test_lowest_room_rates_outside_of_the_calendar_are_calculated(self):
+        start_date = self.today - timedelta(days=1)
+        response = self.get_lowest_room_rates(start_date, self.today)
+        self.assertEqual(response.data, [
+            {"date": start_date.isoformat(), "lowest_rate": "200.00"},
+            {"date": self.today.isoformat(), "lowest_rate": "200.00"},
+        ])
+
+
+class LowestRoomRateSearchTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.deluxe = RoomRate.objects.create(room_name="deluxe room", default_rate=Decimal("200.00"))
+        self.standard = RoomRate.objects.create(room_name="standard room", default_rate=Decimal("120.00"))
+        self.suite = RoomRate.objects.create(room_name="suite", default_rate=Decimal("500.00"))
+        discount = Discount.objects.create(discount_name="flat", discount_type=Discount.FIXED, discount_value=Decimal("100.00"))
+        DiscountRoomRate.objects.create(room_rate=self.deluxe, discount=discount)
+        refresh_best_discounts([self.deluxe.room_id])
+        OverriddenRoomRate.objects.create(room_rate=self.standard, stay_date=date(2024, 7, 11), overridden_rate=Decimal("300.00"))
+
+    def search(self, **params):
+        return self.client.get(reverse("lowest-room-rate-search"), {"start_date": "2024-07-10", "end_date": "2024-07-11", **params})
+
+    def test_search_all_rooms(self):
+        with self.assertNumQueries(4):
+            response = self.search()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([room["total_rate"] for room in response.data["rooms"]], ["200.00", "420.00", "1000.00"])
+        self.assertEqual(response.data["rooms"][1]["lowest_room_rates"], [
+            {"date": "2024-07-10", "lowest_rate": "120.00"},
+            {"date": "2024-07-11", "lowest_rate": "300.00"},
+        ])
+        self.assertEqual(response.data["cheapest_room"], {"room_id": self.deluxe.room_id, "room_name": "deluxe room", "total_rate": "200.00"})
+
+    def test_search_room_ids(self):
+        response = self.search(room_ids=f"{self.standard.room_id},{self.suite.room_id}")
+        self.assertEqual([room["room_id"] for room in response.data["rooms"]], [self.standard.room_id, self.suite.room_id])
+        self.assertEqual(response.data["cheapest_room"]["room_id"], self.standard.room_id)
+
+    def test_search_unknown_room(self):
+        self.assertEqual(self.search(room_ids="999").status_code, 404)
+        self.assertEqual(self.search(room_ids="a,b").status_code, 400)
+
+    def test_search_stay_totals(self):
+        with self.assertNumQueries(4):
+            response = self.search(mode="total")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["rooms"][1], {
+            "room_id": self.standard.room_id,
+            "room_name": "standard room",
+            "nights": 2,
+            "total_rate": "420.00",
+            "average_rate": "210.00",
+            "min_rate": "120.00",
+            "max_rate": "300.00",
+        })
+        self.assertEqual([room["room_id"] for room in response.data["rooms"]], [self.deluxe.room_id, self.standard.room_id, self.suite.room_id])
+
+        response = self.search(mode="total", limit=2)
+        self.assertEqual([room["room_id"] for room in response.data["rooms"]], [self.deluxe.room_id, self.standard.room_id])
+        self.assertEqual(self.search(mode="total", limit=0).status_code, 400)
+        self.assertEqual(self.search(mode="weekly").status_code, 400)
+
+
+class LowestRoomRateCacheTest(TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.cache = LowestRoomRateCache(max_size=2, timeout=10, timer=lambda: self.now)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set(1, date(2024, 7, 10), date(2024, 7, 12), "first")
+        self.cache.set(2, date(2024, 7, 10), date(2024, 7, 12), "second")
+        self.assertEqual(self.cache.get(1, date(2024, 7, 10), date(2024, 7, 12)), "first")
+        self.cache.set(3, date(2024, 7, 10), date(2024, 7, 12), "third")
+        self.assertIsNone(self.cache.get(2, date(2024, 7, 10), date(2024, 7, 12)))
+        self.assertEqual(self.cache.stats(), {"size": 2, "max_size": 2, "hits": 1, "misses": 1, "evictions": 1})
+
+    def test_entries_expire(self):
+        self.cache.set(1, date(2024, 7, 10), date(2024, 7, 12), "first")
+        self.now = 10
+        self.assertIsNone(self.cache.get(1, date(2024, 7, 10), date(2024, 7, 12)))
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_invalidate_rooms(self):
+        self.cache.set(1, date(2024, 7, 10), date(2024, 7, 12), "first")
+        self.cache.set(2, date(2024, 7, 10), date(2024, 7, 12), "second")
+        self.cache.invalidate_rooms([1])
+        self.assertIsNone(self.cache.get(1, date(2024, 7, 10), date(2024, 7, 12)))
+        self.assertEqual(self.cache.get(2, date(2024, 7, 10), date(2024, 7, 12)), "second")
+
+
+class SharedLowestRoomRateCacheTest(TestCase):
+
+    def assert_versioned_invalidation(self, cache):
+        cache.set(1, date(2024, 7, 10), date(2024, 7, 12), ["first"])
+        cache.set(2, date(2024, 7, 10), date(2024, 7, 12), ["second"])
+        self.assertEqual(cache.get(1, date(2024, 7, 10), date(2024, 7, 12)), ["first"])
+
+        cache.invalidate_rooms([1])
+        self.assertIsNone(cache.get(1, date(2024, 7, 10), date(2024, 7, 12)))
+        self.assertEqual(cache.get(2, date(2024, 7, 10), date(2024, 7, 12)), ["second"])
+        self.assertEqual(cache.stats()["hits"], 2)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_locmem_backend(self):
+        self.assert_versioned_invalidation(SharedLowestRoomRateCache(LocMemCache("lowest-room-rate-test", {})))
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.assert_versioned_invalidation(SharedLowestRoomRateCache(FileBasedCache(cache_dir, {})))
+
+    def test_clear_keeps_the_other_keys_of_the_backend(self):
+        backend = LocMemCache("lowest-room-rate-clear-test", {})
+        cache = SharedLowestRoomRateCache(backend)
+        backend.set("session", "kept")
+        cache.set(1, date(2024, 7, 10), date(2024, 7, 12), ["first"])
+        cache.clear()
+        self.assertIsNone(cache.get(1, date(2024, 7, 10), date(2024, 7, 12)))
+        self.assertEqual(backend.get("session"), "kept")
+        cache.set(1, date(2024, 7, 10), date(2024, 7, 12), ["second"])
+        self.assertEqual(cache.get(1, date(2024, 7, 10), date(2024, 7, 12)), ["second"])
+
+    def test_evicted_version_does_not_resurface_old_entries(self):
+        backend = LocMemCache("lowest-room-rate-eviction-test", {})
+        cache = SharedLowestRoomRateCache(backend)
+        cache.set(1, date(2024, 7, 10), date(2024, 7, 12), ["first"])
+        backend.delete(cache._version_key(1))
+        cache.invalidate_rooms([1])
+        self.assertIsNone(cache.get(1, date(2024, 7, 10), date(2024, 7, 12)))
+
+
+class LowestRoomRateAPICacheTest(TestCase):
+
+    def setUp(self):
+        lowest_room_rate_cache.clear()
+        self.client = APIClient()
+        self.room_rate = RoomRate.objects.create(room_name="deluxe room", default_rate=Decimal("200.00"))
+        self.params = {"start_date": "2024-07-10", "end_date": "2024-07-11"}
+
+    def get_lowest_room_rates(self):
+        return self.client.get(reverse("lowest-room-rate", args=[self.room_rate.room_id]), self.params)
+
+    def test_responses_are_cached_until_the_rates_change(self):
+        self.get_lowest_room_rates()
+        with self.assertNumQueries(0):
+            response = self.get_lowest_room_rates()
+        self.assertEqual(response.data[1], {"date": "2024-07-11", "lowest_rate": "200.00"})
+
+        #the cached rates are only dropped once the write is committed
+        with self.captureOnCommitCallbacks() as callbacks:
+            OverriddenRoomRate.objects.create(room_rate=self.room_rate, stay_date=date(2024, 7, 11), overridden_rate=Decimal("150.00"))
+        self.assertIsNotNone(lowest_room_rate_cache.get(self.room_rate.room_id, date(2024, 7, 10), date(2024, 7, 11)))
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.get_lowest_room_rates().data[1], {"date": "2024-07-11", "lowest_rate": "150.00"})
+
+        discount = Discount.objects.create(discount_name="flat", discount_type=Discount.FIXED, discount_value=Decimal("10.00"))
+        self.client.post("/api/RoomRateDiscounts/", [{"room_id": self.room_rate.room_id, "discounts": [discount.discount_id]}], format="json")
+        self.assertEqual(self.get_lowest_room_rates().data[1], {"date": "2024-07-11", "lowest_rate": "140.00"})
+
+        self.client.put(reverse("discount-detail", args=[discount.discount_id]), {"discount_value": 20}, format="json")
+        self.assertEqual(self.get_lowest_room_rates().data[1], {"date": "2024-07-11", "lowest_rate": "130.00"})
+
+        response = self.client.get(reverse("lowest-room-rate-cache"))
+        self.assertEqual(response.data["hits"], 2)
+
+
+class OverriddenRoomRateBulkTest(TestCase):
+
+    def setUp(self):
+        lowest_room_rate_cache.clear()
+        self.client = APIClient()
+        self.room_rate = RoomRate.objects.create(room_name="deluxe room", default_rate=Decimal("200.00"))
+        self.today = timezone.localdate()
+        OverriddenRoomRate.objects.create(room_rate=self.room_rate, stay_date=self.today, overridden_rate=Decimal("150.00"))
+
+    def test_bulk_upsert(self):
+        rule_end_date = self.today + timedelta(days=89)
+        with self.assertNumQueries(10):
+            response = self.client.post(reverse("overridden-room-rate-bulk"), {
+                "overrides": [
+                    {"room_rate": self.room_rate.room_id, "stay_date": self.today.isoformat(), "overridden_rate": 90.5},
+                    {"room_rate": self.room_rate.room_id, "stay_date": "2024-13-01", "overridden_rate": "abc"},
+                    {"room_rate": 999, "stay_date": self.today.isoformat(), "overridden_rate": 90},
+                ],
+                "rules": [
+                    {"room_rate": self.room_rate.room_id, "start_date": self.today.isoformat(), "end_date": rule_end_date.isoformat(), "overridden_rate": "120.00"},
+                    {"room_rate": self.room_rate.room_id, "start_date": rule_end_date.isoformat(), "end_date": self.today.isoformat(), "overridden_rate": "120.00"},
+                ],
+            }, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["overrides"][0], {"index": 0, "status": "updated"})
+        self.assertEqual(response.data["overrides"][1]["status"], "rejected")
+        self.assertEqual(set(response.data["overrides"][1]["errors"]), {"stay_date", "overridden_rate"})
+        self.assertEqual(set(response.data["overrides"][2]["errors"]), {"room_rate"})
+        self.assertEqual(response.data["rules"][0], {"index": 0, "status": "upserted", "nights": 90})
+        self.assertEqual(response.data["rules"][1]["status"], "rejected")
+
+        self.assertEqual(OverriddenRoomRate.objects.filter(room_rate=self.room_rate).count(), 90)
+        self.assertEqual(OverriddenRoomRate.objects.get(room_rate=self.room_rate, stay_date=self.today).overridden_rate, Decimal("90.50"))
+        self.assertEqual(LowestRoomRateCalendar.objects.get(room_rate=self.room_rate, stay_date=rule_end_date).lowest_rate, Decimal("120.00"))
+
+    def test_bulk_upsert_rejects_dates_which_are_not_strings(self):
+        response = self.client.post(reverse("overridden-room-rate-bulk"), {
+            "overrides": [{"room_rate": self.room_rate.room_id, "stay_date": 20261020, "overridden_rate": "90.00"}],
+            "rules": [{"room_rate": self.room_rate.room_id, "start_date": ["2026-10-20"], "end_date": {}, "overridden_rate": "90.00"}],
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data["overrides"][0]["errors"]), {"stay_date"})
+        self.assertEqual(set(response.data["rules"][0]["errors"]), {"start_date", "end_date"})
+
+    def test_bulk_upsert_limit(self):
+        response = self.client.post(reverse("overridden-room-rate-bulk"), {
+            "rules": [{"room_rate": self.room_rate.room_id, "start_date": "2000-01-01", "end_date": "2999-12-31", "overridden_rate": "120.00"}],
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(OVERRIDDEN_ROOM_RATE_BULK_MAX_ROWS=2)
+    def test_bulk_upsert_limit_without_rules(self):
+        response = self.client.post(reverse("overridden-room-rate-bulk"), {
+            "overrides": [
+                {"room_rate": self.room_rate.room_id, "stay_date": f"2024-07-0{day}", "overridden_rate": "120.00"} for day in range(1, 6)
+            ],
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(OverriddenRoomRate.objects.filter(room_rate=self.room_rate).count(), 1)
+
+
+
+class OverriddenRoomRateRangeTest(TestCase):
+
+    def setUp(self):
+        lowest_room_rate_cache.clear()
+        self.client = APIClient()
+        self.room_rate = RoomRate.objects.create(room_name="deluxe room", default_rate=Decimal("200.00"))
+
+    def test_lowest_interval_values(self):
+        weekend = 0b1100000
+        intervals = [
+            (date(2024, 7, 1), date(2024, 7, 31), OverriddenRoomRateRange.ALL_WEEKDAYS, Decimal("150.00")),
+            (date(2024, 7, 5), date(2024, 7, 7), OverriddenRoomRateRange.ALL_WEEKDAYS, Decimal("180.00")),
+            (date(2024, 7, 3), date(2024, 7, 8), weekend, Decimal("120.00")),
+            (date(2024, 8, 1), date(2024, 8, 31), OverriddenRoomRateRange.ALL_WEEKDAYS, Decimal("1.00")),
+        ]
+        self.assertEqual(list(iter_lowest_interval_values(intervals, date(2024, 6, 30), date(2024, 7, 8))), [
+            (date(2024, 7, 1), Decimal("150.00")),
+            (date(2024, 7, 2), Decimal("150.00")),
+            (date(2024, 7, 3), Decimal("150.00")),
+            (date(2024, 7, 4), Decimal("150.00")),
+            (date(2024, 7, 5), Decimal("150.00")),
+            (date(2024, 7, 6), Decimal("120.00")),
+            (date(2024, 7, 7), Decimal("120.00")),
+            (date(2024, 7, 8), Decimal("150.00")),
+        ])
+
+    def test_ranges_are_priced_with_the_lowest_rate(self):
+        response = self.client.post(reverse("overridden-room-rate-range-list"), {
+            "room_rate": self.room_rate.room_id, "start_date": "2024-07-01", "end_date": "2024-07-31", "overridden_rate": "150.00",
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["weekdays"], OverriddenRoomRateRange.ALL_WEEKDAYS)
+        self.client.post(reverse("overridden-room-rate-range-list"), {
+            "room_rate": self.room_rate.room_id, "start_date": "2024-07-01", "end_date": "2024-07-31", "weekdays": 0b1100000, "overridden_rate": "120.00",
+        }, format="json")
+        OverriddenRoomRate.objects.create(room_rate=self.room_rate, stay_date=date(2024, 7, 8), overridden_rate=Decimal("100.00"))
+
+        lowest_room_rates = get_lowest_room_rates(self.room_rate, datetime(2024, 7, 5), datetime(2024, 8, 1))
+        self.assertEqual([lowest_room_rate["lowest_rate"] for lowest_room_rate in lowest_room_rates[:4]], [Decimal("150.00"), Decimal("120.00"), Decimal("120.00"), Decimal("100.00")])
+        self.assertEqual(lowest_room_rates[-1]["lowest_rate"], Decimal("200.00"))
+
+    def test_invalid_range(self):
+        response = self.client.post(reverse("overridden-room-rate-range-list"), {
+            "room_rate": self.room_rate.room_id, "start_date": "2024-07-31", "end_date": "2024-07-01", "overridden_rate": "150.00",
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {"end_date"})
+
+        response = self.client.post(reverse("overridden-room-rate-range-list"), {
+            "room_rate": self.room_rate.room_id, "start_date": "2024-07-01", "end_date": "2024-07-31", "weekdays": 0, "overridden_rate": "150.00",
+        }, format="json")
+        self.assertEqual(set(response.data), {"weekdays"})
+
+    def test_range_writes_refresh_the_calendar(self):
+        today = timezone.localdate()
+        response = self.client.post(reverse("overridden-room-rate-range-list"), {
+            "room_rate": self.room_rate.room_id, "start_date": today.isoformat(), "end_date": (today + timedelta(days=9)).isoformat(), "overridden_rate": "150.00",
+        }, format="json")
+        LowestRoomRateCalendar.objects.bulk_create([LowestRoomRateCalendar(room_rate=self.room_rate, stay_date=today + timedelta(days=20), lowest_rate=Decimal("200.00"))])
+        self.assertEqual(LowestRoomRateCalendar.objects.get(room_rate=self.room_rate, stay_date=today + timedelta(days=9)).lowest_rate, Decimal("150.00"))
+
+        range_id = response.data["id"]
+        self.client.put(reverse("overridden-room-rate-range-detail", args=[range_id]), {"end_date": (today + timedelta(days=20)).isoformat()}, format="json")
+        self.assertEqual(LowestRoomRateCalendar.objects.get(room_rate=self.room_rate, stay_date=today + timedelta(days=20)).lowest_rate, Decimal("150.00"))
+
+        self.client.delete(reverse("overridden-room-rate-range-detail", args=[range_id]))
+        self.assertEqual(LowestRoomRateCalendar.objects.get(room_rate=self.room_rate, stay_date=today).lowest_rate, Decimal("200.00"))
+
+
+class LowestRoomRateStreamTest(TestCase):
+
+    def setUp(self):
+        lowest_room_rate_cache.clear()
+        self.client = APIClient()
+        self.room_rate = RoomRate.objects.create(room_name="deluxe room", default_rate=Decimal("200.00"))
+        self.suite = RoomRate.objects.create(room_name="suite", default_rate=Decimal("500.00"))
+        discount = Discount.objects.create(discount_name="summer", discount_type=Discount.PERCENTAGE, discount_value=Decimal("12.50"))
+        DiscountRoomRate.objects.create(room_rate=self.room_rate, discount=discount)
+        refresh_best_discounts([self.room_rate.room_id])
+        OverriddenRoomRateRange.objects.create(room_rate=self.room_rate, start_date=date(2024, 7, 1), end_date=date(2024, 7, 20), weekdays=0b1100000, overridden_rate=Decimal("120.00"))
+        OverriddenRoomRate.objects.create(room_rate=self.room_rate, stay_date=date(2024, 7, 6), overridden_rate=Decimal("99.99"))
+        OverriddenRoomRate.objects.create(room_rate=self.room_rate, stay_date=date(2024, 7, 7), overridden_rate=Decimal("130.00"))
+        dated = Discount.objects.create(discount_name="midsummer", discount_type=Discount.PERCENTAGE, discount_value=Decimal("50.00"), valid_from=date(2024, 7, 5), valid_to=date(2024, 7, 10))
+        DiscountRoomRate.objects.create(room_rate=self.room_rate, discount=dated)
+        refresh_best_discounts([self.room_rate.room_id])
+        self.params = {"start_date": "2024-06-28", "end_date": "2024-07-22"}
+
+    def read_lines(self, response):
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_streamed_rates_match_the_list(self):
+        url = reverse("lowest-room-rate", args=[self.room_rate.room_id])
+        response = self.client.get(url, {**self.params, "stream": "true"})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(self.read_lines(response), json.loads(self.client.get(url, self.params).content))
+
+    def test_streamed_search_matches_the_search(self):
+        search = self.client.get(reverse("lowest-room-rate-search"), self.params).data
+        lines = self.read_lines(self.client.get(reverse("lowest-room-rate-search"), {**self.params, "stream": "true"}))
+        self.assertEqual(lines[-1], {"cheapest_room": dict(search["cheapest_room"])})
+        self.assertEqual(lines[:-1], [
+            {"room_id": room["room_id"], **lowest_room_rate}
+            for room in search["rooms"] for lowest_room_rate in room["lowest_room_rates"]
+        ])
+
+    def test_streamed_search_query_count_does_not_grow_with_the_rooms(self):
+        url = reverse("lowest-room-rate-search")
+        with CaptureQueriesContext(connection) as queries:
+            b"".join(self.client.get(url, {**self.params, "stream": "true"}).streaming_content)
+        for index in range(5):
+            room_rate = RoomRate.objects.create(room_name=f"room {index}", default_rate=Decimal("100.00"))
+            OverriddenRoomRate.objects.create(room_rate=room_rate, stay_date=date(2024, 7, 1), overridden_rate=Decimal("80.00"))
+            OverriddenRoomRateRange.objects.create(room_rate=room_rate, start_date=date(2024, 7, 2), end_date=date(2024, 7, 3), overridden_rate=Decimal("70.00"))
+        with self.assertNumQueries(len(queries)):
+            lines = self.read_lines(self.client.get(url, {**self.params, "stream": "true"}))
+        search = self.client.get(url, self.params).data
+        self.assertEqual(lines[:-1], [
+            {"room_id": room["room_id"], **lowest_room_rate}
+            for room in search["rooms"] for lowest_room_rate in room["lowest_room_rates"]
+        ])
+
+
+
+@unittest.skipUnless(PricingKernelService.is_available(), "numpy is not installed")
+class PricingKernelTest(TestCase):
+
+    def setUp(self):
+        self.room_rates = [
+            RoomRate.objects.create(room_name="deluxe room", default_rate=Decimal("200.00")),
+            RoomRate.objects.create(room_name="budget room", default_rate=Decimal("0.50")),
+            RoomRate.objects.create(room_name="suite", default_rate=Decimal("333.33")),
+        ]
+        discounts = [
+            Discount.objects.create(discount_name="summer", discount_type=Discount.PERCENTAGE, discount_value=Decimal("12.35")),
+            Discount.objects.create(discount_name="half cent", discount_type=Discount.PERCENTAGE, discount_value=Decimal("1.00")),
+            Discount.objects.create(discount_name="flat", discount_type=Discount.FIXED, discount_value=Decimal("250.00")),
+        ]
+        discounts += [
+            Discount.objects.create(discount_name="weekend", discount_type=Discount.FIXED, discount_value=Decimal("150.00"), valid_from=date(2024, 7, 15), valid_to=date(2024, 7, 25), weekdays=0b1100000),
+            Discount.objects.create(discount_name="autumn", discount_type=Discount.PERCENTAGE, discount_value=Decimal("33.33"), valid_from=date(2024, 8, 1)),
+        ]
+        for room_rate, discount in zip(self.room_rates * 2, discounts):
+            DiscountRoomRate.objects.create(room_rate=room_rate, discount=discount)
+        DiscountRoomRate.objects.create(room_rate=self.room_rates[2], discount=discounts[4])
+        refresh_best_discounts([room_rate.room_id for room_rate in self.room_rates])
+        for day in range(0, 60, 3):
+            OverriddenRoomRate.objects.create(room_rate=self.room_rates[0], stay_date=date(2024, 7, 1) + timedelta(days=day), overridden_rate=Decimal("99.99") + day)
+        OverriddenRoomRateRange.objects.create(room_rate=self.room_rates[2], start_date=date(2024, 7, 10), end_date=date(2024, 8, 10), weekdays=0b0011111, overridden_rate=Decimal("123.45"))
+
+    def price(self, threshold, function):
+        with override_settings(LOWEST_ROOM_RATE_KERNEL_THRESHOLD=threshold):
+            return function(self.room_rates, datetime(2024, 6, 25), datetime(2024, 9, 5))
+
+    def test_kernel_matches_the_decimal_loop(self):
+        self.assertEqual(self.price(0, get_lowest_room_rates_for_rooms), self.price(None, get_lowest_room_rates_for_rooms))
+        self.assertEqual(self.price(0, rank_rooms_by_total_rate), self.price(None, rank_rooms_by_total_rate))
+
+    @override_settings(LOWEST_ROOM_RATE_PROCESS_POOL_THRESHOLD=0, LOWEST_ROOM_RATE_PROCESS_POOL_WORKERS=2)
+    def test_process_pool_matches_in_process(self):
+        with pricing_process_pool() as process_pool:
+            sharded = get_lowest_room_rates_for_rooms(self.room_rates, datetime(2024, 6, 25), datetime(2024, 9, 5), process_pool)
+            batches = list(iter_lowest_room_rate_batches(date(2024, 6, 25), date(2024, 9, 5), rooms_per_batch=1, process_pool=process_pool))
+        self.assertEqual(sharded, self.price(None, get_lowest_room_rates_for_rooms))
+        self.assertEqual(batches, list(iter_lowest_room_rate_batches(date(2024, 6, 25), date(2024, 9, 5), rooms_per_batch=1)))
+
+    def test_rounding_is_half_to_even(self):
+        lowest_room_rates = self.price(0, get_lowest_room_rates_for_rooms)
+        self.assertEqual(lowest_room_rates[self.room_rates[1].room_id][0]["lowest_rate"], Decimal("0.50"))
+
+
+class DatedDiscountTest(TestCase):
+
+    def setUp(self):
+        lowest_room_rate_cache.clear()
+        self.client = APIClient()
+        self.room_rate = RoomRate.objects.create(room_name="deluxe room", default_rate=Decimal("200.00"))
+        discounts = [
+            Discount.objects.create(discount_name="flat", discount_type=Discount.FIXED, discount_value=Decimal("10.00")),
+            Discount.objects.create(discount_name="early july", discount_type=Discount.PERCENTAGE, discount_value=Decimal("20.00"), valid_from=date(2024, 7, 1), valid_to=date(2024, 7, 3)),
+            Discount.objects.create(discount_name="weekend", discount_type=Discount.FIXED, discount_value=Decimal("50.00"), weekdays=0b1100000),
+            Discount.objects.create(discount_name="christmas", discount_type=Discount.FIXED, discount_value=Decimal("150.00"), valid_from=date(2024, 12, 20)),
+        ]
+        for discount in discounts:
+            DiscountRoomRate.objects.create(room_rate=self.room_rate, discount=discount)
+        refresh_best_discounts([self.room_rate.room_id])
+
+    def test_discounts_apply_to_their_stay_dates(self):
+        best_discount = RoomRateBestDiscount.objects.get(room_rate=self.room_rate)
+        self.assertEqual((best_discount.max_fixed_discount, best_discount.max_percentage_discount, best_discount.has_dated_discounts), (Decimal("10.00"), Decimal("0.00"), True))
+        with self.assertNumQueries(4):
+            lowest_room_rates = get_lowest_room_rates(self.room_rate, datetime(2024, 6, 30), datetime(2024, 7, 7))
+        self.assertEqual([lowest_room_rate["lowest_rate"] for lowest_room_rate in lowest_room_rates], [
+            Decimal(rate) for rate in ("150.00", "160.00", "160.00", "160.00", "190.00", "190.00", "150.00", "150.00")
+        ])
+
+    def test_pricing_queries_use_the_covering_indexes(self):
+        output = StringIO()
+        call_command("explain_pricing_queries", room_id=self.room_rate.room_id, stdout=output)
+        output = output.getvalue()
+        if connection.vendor == "sqlite":
+            for index in ("overridden_rate_covering_idx", "range_rate_covering_idx", "calendar_rate_covering_idx"):
+                self.assertIn(f"USING COVERING INDEX {index}", output)
+
+    def test_rooms_without_dated_discounts_skip_the_lookup(self):
+        DiscountRoomRate.objects.filter(discount__discount_name__in=["early july", "weekend", "christmas"]).delete()
+        refresh_best_discounts([self.room_rate.room_id])
+        with self.assertNumQueries(3):
+            lowest_room_rates = get_lowest_room_rates(self.room_rate, datetime(2024, 6, 30), datetime(2024, 7, 7))
+        self.assertEqual({lowest_room_rate["lowest_rate"] for lowest_room_rate in lowest_room_rates}, {Decimal("190.00")})
+
+    def test_invalid_validity(self):
+        response = self.client.post(reverse("discount-list"), {
+            "discount_name": "backwards", "discount_type": Discount.FIXED, "discount_value": "10.00", "valid_from": "2024-07-31", "valid_to": "2024-07-01",
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {"valid_to"})
+
+
+class KeysetPaginationTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.room_rates = [RoomRate.objects.create(room_name=f"room {index}", default_rate=Decimal("100.00")) for index in range(5)]
+        for day in range(5):
+            OverriddenRoomRate.objects.create(room_rate=self.room_rates[0], stay_date=date(2024, 7, 5) - timedelta(days=day), overridden_rate=Decimal("90.00"))
+
+    def read_all_pages(self, url, page_size):
+        pages = []
+        params = {"page_size": page_size}
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data["results"])
+            if response.data["next_cursor"] is None:
+                return pages
+            params["cursor"] = response.data["next_cursor"]
+
+    def test_room_rate_pages(self):
+        pages = self.read_all_pages(reverse("room-list"), 2)
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual([room["room_id"] for page in pages for room in page], [room_rate.room_id for room_rate in self.room_rates])
+
+    def test_overridden_room_rate_pages(self):
+        pages = self.read_all_pages(f"/api/OverriddenRoomRates/{self.room_rates[0].room_id}", 2)
+        self.assertEqual([overridden["stay_date"] for page in pages for overridden in page], [f"2024-07-0{day}" for day in range(1, 6)])
+
+    def test_discount_pages(self):
+        for index in range(3):
+            Discount.objects.create(discount_name=f"discount {index}", discount_type=Discount.FIXED, discount_value=Decimal("10.00"))
+        pages = self.read_all_pages(reverse("discount-list"), 2)
+        self.assertEqual([len(page) for page in pages], [2, 1])
+
+    def test_unpaginated_list_and_invalid_pages(self):
+        self.assertEqual(len(self.client.get(reverse("room-list")).data), 5)
+        self.assertEqual(self.client.get(reverse("room-list"), {"cursor": "not a cursor"}).status_code, 400)
+
+    def test_tampered_cursors(self):
+        def encode(key):
+            return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+        overridden_url = f"/api/OverriddenRoomRates/{self.room_rates[0].room_id}"
+        for url, key in [
+            (reverse("room-list"), [None]),
+            (reverse("room-list"), [1.5]),
+            (reverse("room-list"), [True]),
+            (reverse("room-list"), [[1]]),
+            (reverse("room-list"), ["1"]),
+            (overridden_url, [self.room_rates[0].room_id, None]),
+            (overridden_url, [None, "2024-07-01"]),
+            (overridden_url, [self.room_rates[0].room_id, 20240701]),
+            (overridden_url, [self.room_rates[0].room_id, "2024-13-01"]),
+        ]:
+            with self.subTest(url=url, key=key):
+                self.assertEqual(self.client.get(url, {"cursor": encode(key)}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("room-list"), {"page_size": 0}).status_code, 400)
+        with override_settings(KEYSET_PAGINATION={"DEFAULT_PAGE_SIZE": 1, "MAX_PAGE_SIZE": 3}):
+            self.assertEqual(len(self.client.get(reverse("room-list"), {"page_size": 100}).data["results"]), 3)
+
+
+class OverriddenRoomRateFilterTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.room_rate = RoomRate.objects.create(room_name="deluxe room", default_rate=Decimal("100.00"))
+        for day in range(60):
+            OverriddenRoomRate.objects.create(room_rate=self.room_rate, stay_date=date(2024, 7, 1) + timedelta(days=day), overridden_rate=Decimal("90.00"))
+        self.url = f"/api/OverriddenRoomRates/{self.room_rate.room_id}"
+
+    def test_stay_date_range(self):
+        response = self.client.get(self.url, {"from": "2024-08-01", "to": "2024-08-31"})
+        self.assertEqual(len(response.data), 29)
+        self.assertEqual(min(overridden["stay_date"] for overridden in response.data), "2024-08-01")
+        self.assertEqual(self.client.get(self.url, {"from": "2024-08"}).status_code, 400)
+
+    def test_field_projection(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"from": "2024-07-01", "to": "2024-07-31", "only": "stay_date,overridden_rate"})
+        self.assertEqual(len(response.data), 31)
+        response = self.client.get(self.url, {"from": "2024-07-01", "to": "2024-07-01", "only": "stay_date,overridden_rate"})
+        self.assertEqual(response.data, [{"stay_date": "2024-07-01", "overridden_rate": "90.00"}])
+        response = self.client.get(self.url, {"only": "stay_date", "page_size": 2, "from": "2024-08-28"})
+        self.assertEqual(response.data["results"], [{"stay_date": "2024-08-28"}, {"stay_date": "2024-08-29"}])
+        self.assertEqual(self.client.get(self.url, {"only": "stay_date,room_name"}).status_code, 400)
+
+
+class ListQueryCountTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.room_rates = [RoomRate.objects.create(room_name=f"room {index}", default_rate=Decimal("100.00")) for index in range(3)]
+        for index in range(3):
+            Discount.objects.create(discount_name=f"discount {index}", discount_type=Discount.FIXED, discount_value=Decimal("10.00"))
+        for day in range(30):
+            OverriddenRoomRate.objects.create(room_rate=self.room_rates[0], stay_date=date(2024, 7, 1) + timedelta(days=day), overridden_rate=Decimal("90.00"))
+            OverriddenRoomRateRange.objects.create(room_rate=self.room_rates[0], start_date=date(2024, 7, 1) + timedelta(days=day), end_date=date(2024, 8, 1), overridden_rate=Decimal("90.00"))
+        self.overridden_url = f"/api/OverriddenRoomRates/{self.room_rates[0].room_id}"
+
+    def test_room_rate_list(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse("room-list"))
+        with self.assertNumQueries(1):
+            self.client.get(reverse("room-list"), {"page_size": 2})
+
+    def test_discount_list(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse("discount-list"))
+        with self.assertNumQueries(1):
+            self.client.get(reverse("discount-list"), {"page_size": 2})
+
+    def test_overridden_room_rate_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.overridden_url)
+        self.assertEqual(len(response.data), 30)
+        self.assertEqual(response.data[0]["room_rate"]["room_name"], "room 0")
+        with self.assertNumQueries(2):
+            self.client.get(self.overridden_url, {"page_size": 10})
+        with self.assertNumQueries(2):
+            self.client.get(self.overridden_url, {"only": "room_rate,stay_date"})
+
+    def test_compact_overridden_room_rate_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.overridden_url, {"compact": "true", "page_size": 2})
+        self.assertEqual(response.data["room_rate"], {"room_id": self.room_rates[0].room_id, "room_name": "room 0", "default_rate": "100.00"})
+        self.assertEqual([set(overridden) for overridden in response.data["overridden_room_rates"]], [{"id", "overridden_rate", "stay_date"}] * 2)
+        self.assertIsNotNone(response.data["next_cursor"])
+        response = self.client.get(self.overridden_url, {"compact": "true", "only": "stay_date"})
+        self.assertEqual(response.data["overridden_room_rates"][0], {"stay_date": "2024-07-01"})
+
+    def test_overridden_room_rate_range_list(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse("overridden-room-rate-range-list"), {"room_id": self.room_rates[0].room_id})
+
+
+@override_settings(LOWEST_ROOM_RATE_CALENDAR_DAYS=30)
+class DiscountRoomRateBulkTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("room-rate-discount-bulk")
+        self.room_rates = [RoomRate.objects.create(room_name=f"room {index}", default_rate=Decimal("100.00")) for index in range(6)]
+        self.discounts = [
+            Discount.objects.create(discount_name=f"discount {index}", discount_type=Discount.FIXED, discount_value=Decimal(10 * (index + 1)))
+            for index in range(6)
+        ]
+
+    def assign(self, room_rates, discounts):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, [
+                {"room_id": room_rate.room_id, "discounts": [discount.discount_id for discount in discounts]} for room_rate in room_rates
+            ], format="json")
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_query_count_does_not_grow_with_the_pairs(self):
+        _, small = self.assign(self.room_rates[:1], self.discounts[:1])
+        _, large = self.assign(self.room_rates[1:], self.discounts)
+        self.assertEqual(small, large)
+        self.assertEqual(DiscountRoomRate.objects.count(), 1 + 5 * 6)
+
+    def test_legacy_post_uses_the_bulk_assignment(self):
+        url = "/api/RoomRateDiscounts/"
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.post(url, [{"room_id": self.room_rates[0].room_id, "discounts": [self.discounts[0].discount_id]}], format="json")
+        self.assertEqual(response.status_code, 201)
+        with self.assertNumQueries(len(small)):
+            response = self.client.post(url, [
+                {"room_id": room_rate.room_id, "discounts": [discount.discount_id for discount in self.discounts]} for room_rate in self.room_rates[1:]
+            ], format="json")
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.post(url, [{"room_id": 999, "discounts": [self.discounts[0].discount_id]}], format="json")
+        self.assertEqual((response.status_code, response.data), (404, {"error_message": "Room rate not found"}))
+        response = self.client.post(url, [{"room_id": self.room_rates[0].room_id, "discounts": [self.discounts[0].discount_id]}], format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post(url, [{"room_id": "1", "discounts": [1]}], format="json").status_code, 400)
+
+    def test_report_and_pricing(self):
+        DiscountRoomRate.objects.create(room_rate=self.room_rates[0], discount=self.discounts[0])
+        response = self.client.post(self.url, [
+            {"room_id": self.room_rates[0].room_id, "discounts": [self.discounts[0].discount_id, self.discounts[1].discount_id, 999]},
+            {"room_id": 999, "discounts": [self.discounts[0].discount_id]},
+        ], format="json")
+        self.assertEqual([result["status"] for result in response.data], ["existing", "created", "missing", "missing"])
+        self.assertEqual(response.data[3]["error_message"], "Room rate not found")
+        self.assertEqual(self.room_rates[0].best_discount.max_fixed_discount, Decimal("20.00"))
+        self.assertEqual(self.client.post(self.url, [{"room_id": "1", "discounts": [1]}], format="json").status_code, 400)
+
+
+    def test_list_and_unassign(self):
+        self.assign(self.room_rates[:2], self.discounts[:3])
+        url = "/api/RoomRateDiscounts/"
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"room_id": self.room_rates[0].room_id})
+        self.assertEqual([mapping["discount"]["discount_name"] for mapping in response.data], ["discount 0", "discount 1", "discount 2"])
+        self.assertEqual(response.data[0]["room_rate"]["room_name"], "room 0")
+        response = self.client.get(url, {"discount_id": self.discounts[1].discount_id, "page_size": 1})
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNotNone(response.data["next_cursor"])
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+        response = self.client.delete(url, [{"room_id": self.room_rates[0].room_id, "discounts": [self.discounts[1].discount_id, self.discounts[2].discount_id, 999]}], format="json")
+        self.assertEqual(response.data, {"deleted": 2})
+        self.assertTrue(Discount.objects.filter(discount_id=self.discounts[2].discount_id).exists())
+        self.assertEqual(len(self.client.get(url, {"room_id": self.room_rates[0].room_id}).data), 1)
+        self.room_rates[0].best_discount.refresh_from_db()
+        self.assertEqual(self.room_rates[0].best_discount.max_fixed_discount, Decimal("10.00"))
+
+
+class PricingBenchmarkTest(TestCase):
+
+    def test_seeded_data(self):
+        room_rates = seed_pricing_data(rooms=3, days=10, override_ratio=1, discounts=4)
+        self.assertEqual(len(room_rates), 3)
+        self.assertEqual(OverriddenRoomRate.objects.filter(room_rate__in=room_rates).count(), 30)
+        self.assertEqual(DiscountRoomRate.objects.filter(room_rate__in=room_rates).count(), 9)
+        self.assertEqual(RoomRateBestDiscount.objects.filter(room_rate__in=room_rates).count(), 3)
+
+    def test_benchmark_results(self):
+        room_rates = seed_pricing_data(rooms=2, days=7)
+        results = run_pricing_benchmark(room_rates, room_counts=[1, 2], day_counts=[7], repeat=1)
+        self.assertEqual(len(results), 4 + 2 * 2 + 2 * (1 + 2))
+        by_scenario = {(result["scenario"], result["rooms"]): result for result in results}
+        self.assertEqual(by_scenario[("GET RoomRates page_size=1", 1)]["queries"], 1)
+        self.assertEqual(by_scenario[("GET Discounts", Discount.objects.count())]["days"], None)
+        self.assertEqual(by_scenario[("get_lowest_room_rates", 1)]["queries"], 3)
+        self.assertEqual(by_scenario[("GET LowestRoomRates", 1)]["queries"], by_scenario[("GET LowestRoomRates", 2)]["queries"])
+        comparison = compare_pricing_benchmarks(results, results)
+        self.assertEqual(len(comparison), len(results))
+
+    def test_command_saves_the_results(self):
+        with tempfile.NamedTemporaryFile(suffix=".json") as output:
+            call_command("benchmark_pricing", rooms=[2], days=[3], repeat=1, output=output.name, stdout=StringIO())
+            report = json.load(output)
+        self.assertEqual(report["options"]["rooms"], [2])
+        self.assertEqual({result["days"] for result in report["results"]}, {3, None})
+        #the seeded rows are rolled back
+        self.assertFalse(RoomRate.objects.exists())
+
+
+
+class LowestRoomRateExportTest(TestCase):
+
+    def setUp(self):
+        self.room_rates = seed_pricing_data(rooms=3, days=20, discounts=4)
+        Discount.objects.create(discount_name="weekend", discount_type=Discount.FIXED, discount_value=Decimal("300.00"), weekdays=0b1100000)
+        DiscountRoomRate.objects.create(room_rate=self.room_rates[1], discount=Discount.objects.get(discount_name="weekend"))
+        refresh_best_discounts([self.room_rates[1].room_id])
+        self.expected = [
+            (room_rate.room_id, lowest_room_rate["date"], lowest_room_rate["lowest_rate"].quantize(Decimal("0.01")))
+            for room_rate in self.room_rates
+            for lowest_room_rate in get_lowest_room_rates(room_rate, datetime(2000, 1, 1), datetime(2000, 1, 20))
+        ]
+
+    def test_csv_export(self):
+        output = StringIO()
+        call_command("export_lowest_rates", start_date="2000-01-01", days=20, rooms_per_batch=2, chunk_size=7, stdout=output, stderr=StringIO())
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], "room_id,date,lowest_rate")
+        self.assertEqual(lines[1:], [f"{room_id},{stay_date.isoformat()},{lowest_rate}" for room_id, stay_date, lowest_rate in self.expected])
+
+    def test_columnar_export(self):
+        with tempfile.NamedTemporaryFile(suffix=".lrrc") as output:
+            call_command("export_lowest_rates", format="columnar", output=output.name, start_date="2000-01-01", days=20, rooms_per_batch=2, stdout=StringIO())
+            self.assertEqual(list(read_lowest_room_rates_columnar(output)), self.expected)
+
+
+class RateImportTest(TestCase):
+
+    def import_file(self, kind, suffix, content, **options):
+        with tempfile.NamedTemporaryFile("w", suffix=suffix) as input_file, tempfile.NamedTemporaryFile("r", suffix=".jsonl") as rejects:
+            input_file.write(content)
+            input_file.flush()
+            output = StringIO()
+            call_command("import_rates", kind, input_file.name, rejects=rejects.name, chunk_size=2, stdout=output, stderr=StringIO(), **options)
+            return output.getvalue(), [json.loads(line) for line in rejects]
+
+    def test_room_rates_from_csv(self):
+        output, rejects = self.import_file("room_rates", ".csv", "room_name,default_rate\ndeluxe room,200.00\nsuite,abc\n,10\nbudget room,80.5\n")
+        self.assertIn("Imported 2 of 4 room rates, 2 rejected", output)
+        self.assertEqual(sorted(RoomRate.objects.values_list("room_name", "default_rate")), [("budget room", Decimal("80.50")), ("deluxe room", Decimal("200.00"))])
+        self.assertEqual(rejects, [
+            {"line": 3, "errors": {"default_rate": ["A valid number is required."]}},
+            {"line": 4, "errors": {"room_name": ["This field is required."]}},
+        ])
+
+    def test_overridden_room_rates_are_upserted(self):
+        lowest_room_rate_cache.clear()
+        room_rate = RoomRate.objects.create(room_name="deluxe room", default_rate=Decimal("200.00"))
+        today = timezone.localdate()
+        OverriddenRoomRate.objects.create(room_rate=room_rate, stay_date=today, overridden_rate=Decimal("150.00"))
+        lines = [
+            {"room_rate": room_rate.room_id, "stay_date": today.isoformat(), "overridden_rate": "120.00"},
+            {"room_rate": room_rate.room_id, "stay_date": (today + timedelta(days=1)).isoformat(), "overridden_rate": 130},
+            {"room_rate": room_rate.room_id + 1, "stay_date": today.isoformat(), "overridden_rate": "1.00"},
+            {"room_rate": room_rate.room_id, "stay_date": (today + timedelta(days=1)).isoformat(), "overridden_rate": "110.00"},
+        ]
+        output, rejects = self.import_file("overridden_room_rates", ".jsonl", "\n".join(json.dumps(line) for line in lines) + "\nnot json\n")
+        self.assertIn("Imported 3 of 5 overridden room rates, 2 rejected", output)
+        self.assertEqual(dict(OverriddenRoomRate.objects.values_list("stay_date", "overridden_rate")), {today: Decimal("120.00"), today + timedelta(days=1): Decimal("110.00")})
+        self.assertEqual([reject["line"] for reject in rejects], [3, 5])
+        #the calendar of the room is refreshed
+        self.assertEqual(LowestRoomRateCalendar.objects.get(room_rate=room_rate, stay_date=today).lowest_rate, Decimal("120.00"))
+
+    def test_dates_are_parsed_like_the_serializers(self):
+        room_rate = RoomRate.objects.create(room_name="deluxe room", default_rate=Decimal("200.00"))
+        stay_dates = ["2024-07-01", "2024-7-2", "20240703", "2024-13-01", "07/01/2024", 20240704, None]
+        content = "\n".join(
+            json.dumps({"room_rate": room_rate.room_id, "stay_date": stay_date, "overridden_rate": "120.00"}) for stay_date in stay_dates
+        )
+        stay_date_field = OverriddenRoomRateSerializer().fields["stay_date"]
+        accepted_lines = set()
+        for line, stay_date in enumerate(stay_dates, start=1):
+            try:
+                stay_date_field.run_validation(stay_date)
+            except serializers.ValidationError:
+                continue
+            accepted_lines.add(line)
+        output, rejects = self.import_file("overridden_room_rates", ".jsonl", content)
+        rejected_lines = {reject["line"] for reject in rejects}
+        self.assertEqual(rejected_lines, {4, 5, 6, 7})
+        self.assertEqual(accepted_lines, set(range(1, len(stay_dates) + 1)) - rejected_lines)
+
+    def test_discounts_take_the_model_defaults(self):
+        content = "\n".join(json.dumps(line) for line in [
+            {"discount_name": "flat", "discount_value": "10.00"},
+            {"discount_name": "summer", "discount_type": "percentage", "discount_value": "5", "valid_from": "2024-07-01", "valid_to": "2024-08-31", "weekdays": 96},
+            {"discount_name": "backwards", "discount_value": "5", "valid_from": "2024-08-01", "valid_to": "2024-07-01"},
+            {"discount_name": "unknown", "discount_type": "free", "discount_value": "5", "weekdays": 0},
+        ])
+        output, rejects = self.import_file("discounts", ".jsonl", content)
+        self.assertEqual(
+            list(Discount.objects.order_by("discount_id").values_list("discount_name", "discount_type", "discount_value", "valid_from", "weekdays")),
+            [("flat", Discount.FIXED, Decimal("10.00"), None, Discount.ALL_WEEKDAYS), ("summer", Discount.PERCENTAGE, Decimal("5.00"), date(2024, 7, 1), 96)],
+        )
+        self.assertEqual(rejects[0]["errors"], {"valid_to": ["Valid to must not be before valid from."]})
+        self.assertEqual(set(rejects[1]["errors"]), {"discount_type", "weekdays"})
+
+
+class RequestTimingMiddlewareTest(TestCase):
+
+    def setUp(self):
+        lowest_room_rate_cache.clear()
+        self.room_rate = RoomRate.objects.create(room_name="deluxe room", default_rate=Decimal("200.00"))
+        self.url = reverse("lowest-room-rate", args=[self.room_rate.room_id])
+        self.params = {"start_date": "2024-07-01", "end_date": "2024-07-07"}
+
+    @override_settings(DEBUG=False, REQUEST_TIMING={"ENABLED": True, "SERVER_TIMING_HEADER": True, "LOG": True})
+    def test_timings_are_sent_and_logged(self):
+        with self.assertLogs("apps.api.middleware", "INFO") as logs:
+            response = APIClient().get(self.url, self.params)
+        metrics = {metric.split(";")[0]: metric for metric in response["Server-Timing"].split(", ")}
+        self.assertEqual(set(metrics), {"sql", "view", "serializer", "render", "total"})
+        self.assertIn('desc="4 queries"', metrics["sql"])
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line["path"], line["status"], line["sql_count"]), (self.url, 200, 4))
+        self.assertGreaterEqual(line["total_ms"], line["view_ms"])
+
+    @override_settings(DEBUG=False, REQUEST_TIMING={"ENABLED": True, "SERVER_TIMING_HEADER": True, "LOG": False})
+    async def test_async_views_are_timed(self):
+        response = await self.async_client.get(f"/api/async/LowestRoomRates/{self.room_rate.room_id}", self.params)
+        metrics = {metric.split(";")[0]: metric for metric in response["Server-Timing"].split(", ")}
+        self.assertEqual(set(metrics), {"sql", "view", "total"})
+        self.assertIn('desc="4 queries"', metrics["sql"])
+
+    @override_settings(REQUEST_TIMING={"ENABLED": False, "SERVER_TIMING_HEADER": True, "LOG": True})
+    def test_switched_off(self):
+        response = APIClient().get(self.url, self.params)
+        self.assertNotIn("Server-Timing", response)
+
+
+class AsyncLowestRoomRateViewTest(TestCase):
+
+    def setUp(self):
+        lowest_room_rate_cache.clear()
+        self.room_rates = [
+            RoomRate.objects.create(room_name="deluxe room", default_rate=Decimal("200.00")),
+            RoomRate.objects.create(room_name="suite", default_rate=Decimal("500.00")),
+        ]
+        discount = Discount.objects.create(discount_name="summer", discount_type=Discount.PERCENTAGE, discount_value=Decimal("12.50"))
+        dated = Discount.objects.create(discount_name="weekend", discount_type=Discount.FIXED, discount_value=Decimal("60.00"), weekdays=0b1100000)
+        DiscountRoomRate.objects.create(room_rate=self.room_rates[0], discount=discount)
+        DiscountRoomRate.objects.create(room_rate=self.room_rates[1], discount=dated)
+        refresh_best_discounts([room_rate.room_id for room_rate in self.room_rates])
+        OverriddenRoomRate.objects.create(room_rate=self.room_rates[0], stay_date=date(2024, 7, 6), overridden_rate=Decimal("99.99"))
+        OverriddenRoomRateRange.objects.create(room_rate=self.room_rates[1], start_date=date(2024, 7, 1), end_date=date(2024, 7, 20), overridden_rate=Decimal("450.00"))
+        self.params = {"start_date": "2024-06-28", "end_date": "2024-07-22"}
+
+    def assertSameResponse(self, sync_url, async_url, params=None):
+        sync_response = self.client.get(sync_url, params)
+        lowest_room_rate_cache.clear()
+        async_response = self.client.get(async_url, params)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response["Content-Type"], sync_response["Content-Type"])
+        self.assertEqual(async_response.content, sync_response.content)
+
+    def test_async_views_answer_like_the_sync_views(self):
+        room_id = self.room_rates[0].room_id
+        self.assertSameResponse(f"/api/LowestRoomRates/{room_id}", f"/api/async/LowestRoomRates/{room_id}", self.params)
+        self.assertSameResponse("/api/LowestRoomRates/999", "/api/async/LowestRoomRates/999", self.params)
+        self.assertSameResponse("/api/LowestRoomRates/", "/api/async/LowestRoomRates/", self.params)
+        self.assertSameResponse("/api/LowestRoomRates/", "/api/async/LowestRoomRates/", {**self.params, "mode": "total", "limit": "1"})
+        self.assertSameResponse("/api/LowestRoomRates/", "/api/async/LowestRoomRates/", {**self.params, "limit": "1"})
+        self.assertSameResponse("/api/LowestRoomRates/", "/api/async/LowestRoomRates/", {**self.params, "mode": "total", "stream": "true"})
+        self.assertSameResponse("/api/LowestRoomRates/", "/api/async/LowestRoomRates/", {"start_date": "2024-07-01"})
+        self.assertSameResponse("/api/RoomRates/", "/api/async/RoomRates/")
+        self.assertSameResponse("/api/Discounts/", "/api/async/Discounts/", {"page_size": 1})
+
+    def test_async_views_reject_streaming(self):
+        room_id = self.room_rates[0].room_id
+        for url in (f"/api/async/LowestRoomRates/{room_id}", "/api/async/LowestRoomRates/"):
+            with self.subTest(url=url):
+                response = self.client.get(url, {**self.params, "stream": "true"})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error_message", json.loads(response.content))
+
+    async def test_async_client(self):
+        response = await self.async_client.get(f"/api/async/LowestRoomRates/{self.room_rates[1].room_id}", self.params)
+        self.assertEqual(response.status_code, 200)
+        lowest_room_rates = json.loads(response.content)
+        self.assertEqual(lowest_room_rates[8], {"date": "2024-07-06", "lowest_rate": "390.00"})
+
+
+class FastSerializerTest(TestCase):
+
+    def setUp(self):
+        lowest_room_rate_cache.clear()
+        self.client = APIClient()
+        self.room_rates = [
+            RoomRate.objects.create(room_name="d\u00e9luxe room \u2028 \U0001f3e8", default_rate=Decimal("199.99")),
+            RoomRate.objects.create(room_name='"suite"\n', default_rate=Decimal("0.10")),
+        ]
+        discount = Discount.objects.create(discount_name="third", discount_type=Discount.PERCENTAGE, discount_value=Decimal("33.33"))
+        DiscountRoomRate.objects.create(room_rate=self.room_rates[0], discount=discount)
+        refresh_best_discounts([self.room_rates[0].room_id])
+        OverriddenRoomRate.objects.create(room_rate=self.room_rates[0], stay_date=date(2024, 7, 2), overridden_rate=Decimal("12345.67"))
+        OverriddenRoomRate.objects.create(room_rate=self.room_rates[1], stay_date=date(2024, 7, 3), overridden_rate=Decimal("0.00"))
+        self.params = {"start_date": "2024-07-01", "end_date": "2024-07-05"}
+
+    def assertSameBytes(self, response, data):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, JSONRenderer().render(data))
+
+    def test_lowest_room_rates_match_the_serializers(self):
+        room_rate = self.room_rates[0]
+        lowest_room_rates = get_lowest_room_rates(room_rate, datetime(2024, 7, 1), datetime(2024, 7, 5))
+        self.assertSameBytes(self.client.get(f"/api/LowestRoomRates/{room_rate.room_id}", self.params), LowestRoomRateListSerializer(lowest_room_rates, many=True).data)
+        lowest_room_rate_cache.clear()
+        self.assertSameBytes(self.client.get(f"/api/async/LowestRoomRates/{room_rate.room_id}", self.params), LowestRoomRateListSerializer(lowest_room_rates, many=True).data)
+        search = search_lowest_room_rates(self.room_rates, datetime(2024, 7, 1), datetime(2024, 7, 5))
+        self.assertSameBytes(self.client.get("/api/LowestRoomRates/", self.params), LowestRoomRateSearchSerializer(search).data)
+
+    def test_lists_match_the_serializers(self):
+        self.assertSameBytes(self.client.get("/api/RoomRates/"), RoomRateSerializer(RoomRate.objects.all(), many=True).data)
+        self.assertSameBytes(self.client.get("/api/async/RoomRates/"), RoomRateSerializer(RoomRate.objects.all(), many=True).data)
+        room_rate = self.room_rates[0]
+        overridden_room_rates = OverriddenRoomRate.objects.filter(room_rate=room_rate)
+        self.assertSameBytes(self.client.get(f"/api/OverriddenRoomRates/{room_rate.room_id}"), OverriddenRoomRateSerializer(overridden_room_rates, many=True).data)
+        for only in ["stay_date", "room_rate,overridden_rate", "id,stay_date,overridden_rate"]:
+            fields = only.split(",")
+            data = [{field: value for field, value in overridden.items() if field in fields} for overridden in OverriddenRoomRateSerializer(overridden_room_rates, many=True).data]
+            self.assertSameBytes(self.client.get(f"/api/OverriddenRoomRates/{room_rate.room_id}", {"only": only}), data)
+
+    def test_renderer_falls_back_to_the_json_renderer(self):
+        data = {"lowest_rate": Decimal("1.50"), "room_name": "\u2029 \u00e9", "rates": [1.5, None, True]}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(data, "application/json; indent=2"), JSONRenderer().render(data, "application/json; indent=2"))
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+
+    def test_serializer_benchmark(self):
+        results = run_serializer_benchmark(rows=20, repeat=1)
+        self.assertEqual({(result["scenario"], result["path"]) for result in results}, {
+            (scenario, path) for scenario in ["LowestRoomRates", "RoomRates", "OverriddenRoomRates"] for path in ["serializer", "fast path"]
+        })
+        self.assertTrue(all(result["rows"] == 20 and result["per_row_us"] >= 0 for result in results))
@@ -0,0 +1,152 @@
+from datetime import datetime
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+
+from apps.api.cache import lowest_room_rate_cache
+from apps.api.models import Discount, RoomRate
+from apps.api.pagination import InvalidPage, KeysetPaginator
+from apps.api.renderers import FastJSONRenderer
+from apps.api.serializers import ROOM_RATE_COLUMNS, DiscountSerializer, LowestRoomRateStayTotalSerializer, serialize_lowest_room_rate_search, serialize_lowest_room_rates, serialize_room_rates
+from apps.api.services.AsyncLowestRoomRateService import aget_calendar_lowest_room_rates, aget_lowest_room_rates_for_rooms, arank_rooms_by_total_rate, asearch_lowest_room_rates
+
+# Async views for ASGI servers. They answer like their DRF counterparts, but read the database with the async ORM
+# instead of holding a thread per request. DRF's APIView is sync only, so these are plain Django views which
+# render with the renderer of the sync views to give the same bytes.
+
+def render(data, status_code=status.HTTP_200_OK, renderer_class=FastJSONRenderer):
+    return HttpResponse(renderer_class().render(data), content_type='application/json', status=status_code)
+
+def is_stream_requested(request):
+    return request.GET.get('stream', '').lower() in ('true', '1')
+
+def reject_stream(request):
+    #the async views answer with a buffered body, so a stream request is refused instead of silently buffered
+    if is_stream_requested(request):
+        return render({"error_message":"Streaming is not supported by the async views. Use /api/LowestRoomRates/."}, status.HTTP_400_BAD_REQUEST)
+    return None
+
+def parse_date_range(request):
+    start_date = request.GET.get('start_date', None)
+    end_date = request.GET.get('end_date', None)
+    if start_date is None or end_date is None:
+        return None, None, render({"error_message":"Date range not provided"}, status.HTTP_400_BAD_REQUEST)
+    try:
+        return datetime.strptime(start_date, '%Y-%m-%d'), datetime.strptime(end_date, '%Y-%m-%d'), None
+    except ValueError:
+        return None, None, render({'error': 'Invalid date format. Use YYYY-MM-DD.'}, status.HTTP_400_BAD_REQUEST)
+
+class AsyncLowestRoomRateAPI(View):
+
+    async def get(self, request, room_id=None):
+        start_date, end_date, error = parse_date_range(request)
+        if error is not None:
+            return error
+        error = reject_stream(request)
+        if error is not None:
+            return error
+
+        #the cache takes a lock and the shared backends go over the network, so it is used from a worker thread
+        lowest_room_rates = await sync_to_async(lowest_room_rate_cache.get,thread_sensitive=False)(room_id,start_date.date(),end_date.date())
+        if lowest_room_rates is not None:
+            return render(lowest_room_rates)
+
+        try:
+            room_rate = await RoomRate.objects.aget(room_id = room_id)
+        except RoomRate.DoesNotExist:
+            return render({"error_message":"Room rate not found"}, status.HTTP_404_NOT_FOUND)
+
+        #answer from the precomputed calendar and only calculate the rates when the range is outside of it
+        lowest_room_rates = await aget_calendar_lowest_room_rates(room_rate,start_date,end_date)
+        if lowest_room_rates is None:
+            lowest_room_rates = (await aget_lowest_room_rates_for_rooms([room_rate],start_date,end_date))[room_rate.room_id]
+        data = serialize_lowest_room_rates(lowest_room_rates)
+        await sync_to_async(lowest_room_rate_cache.set,thread_sensitive=False)(room_id,start_date.date(),end_date.date(),data)
+        return render(data)
+
+class AsyncLowestRoomRateSearchAPI(View):
+
+    async def get(self, request):
+        start_date, end_date, error = parse_date_range(request)
+        if error is not None:
+            return error
+
+        mode=request.GET.get('mode', 'daily')
+        if mode not in ('daily','total'):
+            return render({"error_message":"Invalid mode. Use daily or total."}, status.HTTP_400_BAD_REQUEST)
+
+        limit=request.GET.get('limit', None)
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                limit = 0
+            if limit < 1:
+                return render({"error_message":"Invalid limit. Use a positive integer."}, status.HTTP_400_BAD_REQUEST)
+            if mode != 'total':
+                return render({"error_message":"The limit is only supported with mode=total."}, status.HTTP_400_BAD_REQUEST)
+        if is_stream_requested(request) and mode == 'total':
+            return render({"error_message":"Streaming is only supported with mode=daily."}, status.HTTP_400_BAD_REQUEST)
+        error = reject_stream(request)
+        if error is not None:
+            return error
+
+        room_ids=request.GET.get('room_ids', None)
+        if room_ids is None:
+            room_rates = [room_rate async for room_rate in RoomRate.objects.order_by('room_id')]
+        else:
+            try:
+                room_ids = [int(room_id) for room_id in room_ids.split(',')]
+            except ValueError:
+                return render({"error_message":"Invalid room ids. Use comma separated integers."}, status.HTTP_400_BAD_REQUEST)
+
+            room_rates = [room_rate async for room_rate in RoomRate.objects.filter(room_id__in=room_ids).order_by('room_id')]
+            missing_room_ids = set(room_ids) - {room_rate.room_id for room_rate in room_rates}
+            if missing_room_ids:
+                return render({"error_message":f"Room rate not found: {', '.join(str(room_id) for room_id in sorted(missing_room_ids))}"}, status.HTTP_404_NOT_FOUND)
+
+        if mode == 'total':
+            return render(LowestRoomRateStayTotalSerializer({"rooms":await arank_rooms_by_total_rate(room_rates,start_date,end_date,limit)}).data)
+        return render(serialize_lowest_room_rate_search(await asearch_lowest_room_rates(room_rates,start_date,end_date)))
+
+class AsyncListAPI(View):
+    model = None
+    key_fields = None
+    serializer_class = None
+    renderer_class = JSONRenderer
+
+    def get_queryset(self):
+        return self.model.objects.all()
+
+    def serialize(self, rows):
+        return self.serializer_class(rows, many=True).data
+
+    async def get(self, request):
+        rows = self.get_queryset()
+        paginator = KeysetPaginator(self.model, self.key_fields)
+        if paginator.is_requested(request):
+            try:
+                rows, next_cursor = await paginator.apaginate(request, rows)
+            except InvalidPage as error:
+                return render({"error_message":str(error)}, status.HTTP_400_BAD_REQUEST, self.renderer_class)
+            return render({"results":self.serialize(rows),"next_cursor":next_cursor}, renderer_class=self.renderer_class)
+
+        return render(self.serialize([row async for row in rows]), renderer_class=self.renderer_class)
+
+class AsyncRoomRateListAPI(AsyncListAPI):
+    model = RoomRate
+    key_fields = ['room_id']
+    renderer_class = FastJSONRenderer
+
+    def get_queryset(self):
+        return RoomRate.objects.values_list(*ROOM_RATE_COLUMNS, named=True)
+
+    def serialize(self, rows):
+        return serialize_room_rates(rows)
+
+class AsyncDiscountListAPI(AsyncListAPI):
+    model = Discount
+    key_fields = ['discount_id']
+    serializer_class = DiscountSerializer
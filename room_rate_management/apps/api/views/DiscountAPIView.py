@@ -1,9 +1,13 @@
+from django.db import transaction
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from apps.api.models import Discount
+from apps.api.models import Discount, DiscountRoomRate
+from apps.api.pagination import InvalidPage, KeysetPaginator, pagination_parameters
 from apps.api.serializers import DiscountSerializer
+from apps.api.services.BestDiscountService import refresh_best_discounts
+from apps.api.services.LowestRoomRateCalendarService import refresh_lowest_room_rate_calendars
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -12,6 +16,7 @@ from drf_yasg import openapi
 class DiscountListAPI(APIView):
     @swagger_auto_schema(
         operation_description="Get all discounts",
+        manual_parameters=pagination_parameters,
         responses={
             200: openapi.Response(
                 description="Successful operation",
@@ -23,7 +28,10 @@ class DiscountListAPI(APIView):
                             'discount_id': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
                             'dicount_name':openapi.Schema(type=openapi.TYPE_STRING, example="summer discount"),
                             'discount_type':openapi.Schema(type=openapi.TYPE_STRING, example="fixed, percentage"),
-                            'discount_value': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=20)
+                            'discount_value': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=20),
+                            'valid_from': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE, example="2024-06-01"),
+                            'valid_to': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE, example="2024-08-31"),
+                            'weekdays': openapi.Schema(type=openapi.TYPE_INTEGER, example=127, description="Bit mask of the stay weekdays, bit 0 is Monday")
                         },
                     ),
                 ),
@@ -33,6 +41,15 @@ class DiscountListAPI(APIView):
     )
     def get(self, request): 
         discounts = Discount.objects.all()
+        paginator = KeysetPaginator(Discount, ['discount_id'])
+        if paginator.is_requested(request):
+            try:
+                discounts, next_cursor = paginator.paginate(request, discounts)
+            except InvalidPage as error:
+                return Response({"error_message":str(error)}, status=status.HTTP_400_BAD_REQUEST)
+            serializer = DiscountSerializer(discounts, many = True)
+            return Response({"results":serializer.data,"next_cursor":next_cursor}, status = status.HTTP_200_OK)
+
         serializer = DiscountSerializer(discounts, many = True)
         return Response(serializer.data, status = status.HTTP_200_OK)
     
@@ -43,7 +60,10 @@ class DiscountListAPI(APIView):
             properties={
                 'discount_name':openapi.Schema(type=openapi.TYPE_STRING, example="summer discount"),
                 'discount_type':openapi.Schema(type=openapi.TYPE_STRING, example="fixed, percentage"),
-                'discount_value': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=20)
+                'discount_value': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=20),
+                'valid_from': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE, example="2024-06-01"),
+                'valid_to': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE, example="2024-08-31"),
+                'weekdays': openapi.Schema(type=openapi.TYPE_INTEGER, example=127, description="Bit mask of the stay weekdays, bit 0 is Monday")
             },
         ),
         responses={
@@ -55,7 +75,10 @@ class DiscountListAPI(APIView):
                         'discount_id': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
                         'dicount_name':openapi.Schema(type=openapi.TYPE_STRING, example="summer discount"),
                         'discount_type':openapi.Schema(type=openapi.TYPE_STRING, example="fixed, percentage"),
-                        'discount_value': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=20)
+                        'discount_value': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=20),
+                        'valid_from': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE, example="2024-06-01"),
+                        'valid_to': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE, example="2024-08-31"),
+                        'weekdays': openapi.Schema(type=openapi.TYPE_INTEGER, example=127, description="Bit mask of the stay weekdays, bit 0 is Monday")
                     },
                 ),
             ),
@@ -82,7 +105,10 @@ class DiscountDetailAPI(APIView):
                         'discount_id': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
                         'dicount_name':openapi.Schema(type=openapi.TYPE_STRING, example="summer discount"),
                         'discount_type':openapi.Schema(type=openapi.TYPE_STRING, example="fixed, percentage"),
-                        'discount_value': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=20)
+                        'discount_value': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=20),
+                        'valid_from': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE, example="2024-06-01"),
+                        'valid_to': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE, example="2024-08-31"),
+                        'weekdays': openapi.Schema(type=openapi.TYPE_INTEGER, example=127, description="Bit mask of the stay weekdays, bit 0 is Monday")
                     }
                 ),
             ),
@@ -109,7 +135,10 @@ class DiscountDetailAPI(APIView):
             properties={
                 'dicount_name':openapi.Schema(type=openapi.TYPE_STRING, example="summer discount"),
                 'discount_type':openapi.Schema(type=openapi.TYPE_STRING, example="fixed, percentage"),
-                'discount_value': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=20)
+                'discount_value': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=20),
+                'valid_from': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE, example="2024-06-01"),
+                'valid_to': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE, example="2024-08-31"),
+                'weekdays': openapi.Schema(type=openapi.TYPE_INTEGER, example=127, description="Bit mask of the stay weekdays, bit 0 is Monday")
             },
         ),
         responses={
@@ -121,7 +150,10 @@ class DiscountDetailAPI(APIView):
                         'discount_id': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
                         'dicount_name':openapi.Schema(type=openapi.TYPE_STRING, example="summer discount"),
                         'discount_type':openapi.Schema(type=openapi.TYPE_STRING, example="fixed, percentage"),
-                        'discount_value': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=20)
+                        'discount_value': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=20),
+                        'valid_from': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE, example="2024-06-01"),
+                        'valid_to': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE, example="2024-08-31"),
+                        'weekdays': openapi.Schema(type=openapi.TYPE_INTEGER, example=127, description="Bit mask of the stay weekdays, bit 0 is Monday")
                     },
                 ),
             ),
@@ -140,7 +172,12 @@ class DiscountDetailAPI(APIView):
             return Response({"error_message":"Discount not found"}, status=status.HTTP_404_NOT_FOUND)
         serializer = DiscountSerializer(discount, data=request.data, partial= True)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                #the discount value or type may have changed, so refresh the best discounts and the calendars of the mapped rooms
+                room_ids = list(DiscountRoomRate.objects.filter(discount=discount).values_list('room_rate_id',flat=True))
+                refresh_best_discounts(room_ids)
+                refresh_lowest_room_rate_calendars(room_ids)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -161,7 +198,12 @@ class DiscountDetailAPI(APIView):
             discount = Discount.objects.get(discount_id=discount_id)
         except Discount.DoesNotExist:
             return Response({"error_message":"Discount not found"}, status=status.HTTP_404_NOT_FOUND)
-        discount.delete()
+        with transaction.atomic():
+            #collect the mapped rooms before the mappings are deleted along with the discount
+            room_ids = list(DiscountRoomRate.objects.filter(discount=discount).values_list('room_rate_id',flat=True))
+            discount.delete()
+            refresh_best_discounts(room_ids)
+            refresh_lowest_room_rate_calendars(room_ids)
         return Response(status=status.HTTP_204_NO_CONTENT)
     
 
@@ -2,30 +2,137 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from apps.api.models import Discount, DiscountRoomRate, RoomRate
-from apps.api.serializers import RoomRateSerializer
+from apps.api.models import DiscountRoomRate
+from apps.api.pagination import InvalidPage, KeysetPaginator, pagination_parameters
+from apps.api.serializers import DiscountRoomRateDetailSerializer
+from apps.api.services.DiscountRoomRateService import assign_discounts, unassign_discounts
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 # Create your views here.
 
+discount_pairs_schema = openapi.Schema(
+    type=openapi.TYPE_ARRAY,
+    items=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'room_id': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
+            'discounts':openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items = openapi.Schema(type=openapi.TYPE_NUMBER, example=1)
+            )
+        },
+    ),
+)
+
+"""
+    Flattens a list of room ids and their discount ids into (room_id, discount_id) pairs
+
+Parameters:
+    items (list): The request data, [{"room_id": 1, "discounts": [1, 2]}].
+
+Returns:
+    list: The (room_id, discount_id) pairs, or None if the request data is invalid.
+"""
+def get_discount_pairs(items):
+    if not isinstance(items, list):
+        return None
+
+    pairs = []
+    for item in items:
+        room_id = item.get('room_id') if isinstance(item, dict) else None
+        discount_ids = item.get('discounts') if isinstance(item, dict) else None
+        if not isinstance(room_id, int) or not isinstance(discount_ids, list) or not all(isinstance(discount_id, int) for discount_id in discount_ids):
+            return None
+        pairs.extend((room_id, discount_id) for discount_id in discount_ids)
+    return pairs
+
 class DiscountRoomRateAPI(APIView):
+
+    @swagger_auto_schema(
+        operation_description="Get the discounts assigned to a room, or the rooms a discount is assigned to",
+        manual_parameters=[
+            openapi.Parameter(
+                name="room_id",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_INTEGER,
+                description="Room id",
+                required=False,
+                example=1,
+            ),
+            openapi.Parameter(
+                name="discount_id",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_INTEGER,
+                description="Discount id",
+                required=False,
+                example=1,
+            ),
+        ] + pagination_parameters,
+        responses={
+            200: openapi.Response(
+                description="Successful operation",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'id': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
+                            'room_rate': openapi.Schema(
+                                type=openapi.TYPE_OBJECT,
+                                properties={
+                                    'room_id': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
+                                    'room_name':openapi.Schema(type=openapi.TYPE_STRING, example="deluxe room"),
+                                    'default_rate': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=100.00)
+                                },
+                            ),
+                            'discount': openapi.Schema(
+                                type=openapi.TYPE_OBJECT,
+                                properties={
+                                    'discount_id': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
+                                    'discount_name':openapi.Schema(type=openapi.TYPE_STRING, example="summer discount"),
+                                    'discount_type':openapi.Schema(type=openapi.TYPE_STRING, example="fixed, percentage"),
+                                    'discount_value': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=20)
+                                },
+                            ),
+                        },
+                    ),
+                ),
+            ),
+            400: "Invalid input",
+            500: "Internal server error",
+        }
+    )
+    def get(self, request):
+        room_id = request.query_params.get('room_id', None)
+        discount_id = request.query_params.get('discount_id', None)
+        if room_id is None and discount_id is None:
+            return Response({"error_message":"A room id or a discount id is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if (room_id is not None and not room_id.isdigit()) or (discount_id is not None and not discount_id.isdigit()):
+            return Response({"error_message":"Invalid room id or discount id"}, status=status.HTTP_400_BAD_REQUEST)
+
+        #the room and the discount are joined in so the payload is read in one query
+        discount_room_rates = DiscountRoomRate.objects.select_related('room_rate','discount').order_by('id')
+        if room_id is not None:
+            discount_room_rates = discount_room_rates.filter(room_rate_id=room_id)
+        if discount_id is not None:
+            discount_room_rates = discount_room_rates.filter(discount_id=discount_id)
+
+        paginator = KeysetPaginator(DiscountRoomRate, ['id'])
+        if paginator.is_requested(request):
+            try:
+                discount_room_rates, next_cursor = paginator.paginate(request, discount_room_rates)
+            except InvalidPage as error:
+                return Response({"error_message":str(error)}, status=status.HTTP_400_BAD_REQUEST)
+            serializer = DiscountRoomRateDetailSerializer(discount_room_rates, many=True)
+            return Response({"results":serializer.data,"next_cursor":next_cursor}, status=status.HTTP_200_OK)
+
+        serializer = DiscountRoomRateDetailSerializer(discount_room_rates, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
     
     @swagger_auto_schema(
         operation_description="Assign discounts to room rates",
-        request_body=openapi.Schema(
-            type=openapi.TYPE_ARRAY,
-            items=openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'room_id': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
-                    'discounts':openapi.Schema(
-                        type=openapi.TYPE_ARRAY,
-                        items = openapi.Schema(type=openapi.TYPE_NUMBER, example=1)
-                    )
-                },
-            ),
-        ),
+        request_body=discount_pairs_schema,
         responses={
             201: "Discounts are successfully assigned to RoomRates",
             400: "Invalid input",
@@ -34,26 +141,70 @@ class DiscountRoomRateAPI(APIView):
         }
     )
     def post(self, request):
-        for item in request.data:
-            room_id = item.get('room_id')
-            discount_ids = item.get('discounts')
-
-            try:
-                room_rate = RoomRate.objects.get(room_id=room_id)
-            except RoomRate.DoesNotExist:
-                return Response({'error': f'Room "{room_rate.room_name}" does not exist'}, status=status.HTTP_404_NOT_FOUND)
-            
-            for discount_id in discount_ids:
-                try:
-                    discount = Discount.objects.get(discount_id=discount_id)
-                except Discount.DoesNotExist:
-                    return Response({'error': f'Discount "{discount.discount_name}" does not exist'}, status=status.HTTP_404_NOT_FOUND)
-
-                room_rate_discount, created = DiscountRoomRate.objects.get_or_create(room_rate=room_rate, discount=discount)
-                if not created:
-                    return Response({'error': f'The mapping of Room "{room_rate.room_name}" and Discount "{discount.discount_name}" already exists'}, status=status.HTTP_400_BAD_REQUEST)
+        pairs = get_discount_pairs(request.data)
+        if pairs is None:
+            return Response({"error_message":"Every item needs an integer room_id and a list of integer discounts"}, status=status.HTTP_400_BAD_REQUEST)
 
+        #the valid pairs are assigned, the first missing or existing pair is reported like before
+        for result in assign_discounts(pairs):
+            if result["status"] == "missing":
+                return Response({"error_message":result["error_message"]}, status=status.HTTP_404_NOT_FOUND)
+            if result["status"] == "existing":
+                return Response({"error_message":f"The mapping of room {result['room_id']} and discount {result['discount_id']} already exists"}, status=status.HTTP_400_BAD_REQUEST)
         return Response({'message': 'Discounts are successfully assigned to RoomRates'}, status=status.HTTP_201_CREATED)
-    
 
-        
\ No newline at end of file
+    @swagger_auto_schema(
+        operation_description="Remove discounts from room rates without deleting the discounts. Pairs which are not assigned are ignored.",
+        request_body=discount_pairs_schema,
+        responses={
+            200: openapi.Response(
+                description="Successful operation",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'deleted': openapi.Schema(type=openapi.TYPE_INTEGER, example=2)
+                    },
+                ),
+            ),
+            400: "Invalid input",
+            500: "Internal server error",
+        }
+    )
+    def delete(self, request):
+        pairs = get_discount_pairs(request.data)
+        if pairs is None:
+            return Response({"error_message":"Every item needs an integer room_id and a list of integer discounts"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"deleted":unassign_discounts(pairs)}, status=status.HTTP_200_OK)
+
+
+class DiscountRoomRateBulkAPI(APIView):
+
+    @swagger_auto_schema(
+        operation_description="Assign many discounts to many room rates in one transaction. "
+            "Existing mappings and missing rooms or discounts are reported per pair instead of failing the request.",
+        request_body=discount_pairs_schema,
+        responses={
+            200: openapi.Response(
+                description="Successful operation, with the status of every room and discount pair",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'room_id': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
+                            'discount_id': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
+                            'status': openapi.Schema(type=openapi.TYPE_STRING, example="created, existing, missing"),
+                            'error_message': openapi.Schema(type=openapi.TYPE_STRING, example="Discount not found")
+                        },
+                    ),
+                ),
+            ),
+            400: "Invalid input",
+            500: "Internal server error",
+        }
+    )
+    def post(self, request):
+        pairs = get_discount_pairs(request.data)
+        if pairs is None:
+            return Response({"error_message":"Every item needs an integer room_id and a list of integer discounts"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(assign_discounts(pairs), status=status.HTTP_200_OK)
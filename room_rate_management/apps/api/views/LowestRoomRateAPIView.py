@@ -1,17 +1,29 @@
 from datetime import datetime
+from django.http import StreamingHttpResponse
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.api.cache import lowest_room_rate_cache
+from apps.api.middleware import record_timing
 from apps.api.models import Discount, DiscountRoomRate, OverriddenRoomRate, RoomRate
-from apps.api.serializers import LowestRoomRateListSerializer, RoomRateSerializer
-from apps.api.services.LowestRoomRateService import get_lowest_room_rates
+from apps.api.renderers import FastJSONRenderer
+from apps.api.serializers import LowestRoomRateStayTotalSerializer, RoomRateSerializer, serialize_lowest_room_rate_search, serialize_lowest_room_rates
+from apps.api.services.LowestRoomRateCalendarService import get_calendar_lowest_room_rates
+from apps.api.services.LowestRoomRateStreamService import render_lowest_room_rates_ndjson, render_search_lowest_room_rates_ndjson
+from apps.api.services.LowestRoomRateService import get_lowest_room_rates, rank_rooms_by_total_rate, search_lowest_room_rates
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 # Create your views here.
 
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+def is_stream_requested(request):
+    return request.query_params.get('stream', '').lower() in ('true', '1')
+
 class LowestRoomRateAPI(APIView):
+    renderer_classes = [FastJSONRenderer]
     
     @swagger_auto_schema(
         operation_description="Get the lowest room rates in a specific date range",
@@ -31,6 +43,14 @@ class LowestRoomRateAPI(APIView):
                 description="Stay date",
                 required=True,
                 example="2024-07-12",
+            ),
+            openapi.Parameter(
+                name="stream",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_BOOLEAN,
+                description="Stream the rates as newline delimited JSON (application/x-ndjson), one line per day",
+                required=False,
+                example=True,
             )
         ],
         responses={
@@ -66,15 +86,211 @@ class LowestRoomRateAPI(APIView):
             end_date = datetime.strptime(end_date, '%Y-%m-%d')
         except ValueError:
             return Response({'error': 'Invalid date format. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if is_stream_requested(request):
+            try:
+                room_rate = RoomRate.objects.get(room_id = room_id)
+            except RoomRate.DoesNotExist:
+                return Response({"error_message":"Room rate not found"}, status=status.HTTP_404_NOT_FOUND)
+            return StreamingHttpResponse(render_lowest_room_rates_ndjson(room_rate,start_date,end_date),content_type=NDJSON_CONTENT_TYPE)
+
+        lowest_room_rates = lowest_room_rate_cache.get(room_id,start_date.date(),end_date.date())
+        if lowest_room_rates is not None:
+            return Response(lowest_room_rates,status=status.HTTP_200_OK)
         
         try:
             room_rate = RoomRate.objects.get(room_id = room_id)
         except RoomRate.DoesNotExist:
             return Response({"error_message":"Room rate not found"}, status=status.HTTP_404_NOT_FOUND)
         
-        lowest_room_rates = get_lowest_room_rates(room_rate,start_date,end_date)   
-        serializer = LowestRoomRateListSerializer(lowest_room_rates,many=True)
-        return Response(serializer.data,status=status.HTTP_200_OK)
+        #answer from the precomputed calendar and only calculate the rates when the range is outside of it
+        lowest_room_rates = get_calendar_lowest_room_rates(room_rate,start_date,end_date)
+        if lowest_room_rates is None:
+            lowest_room_rates = get_lowest_room_rates(room_rate,start_date,end_date)
+        with record_timing('serializer'):
+            data = serialize_lowest_room_rates(lowest_room_rates)
+        lowest_room_rate_cache.set(room_id,start_date.date(),end_date.date(),data)
+        return Response(data,status=status.HTTP_200_OK)
+
+class LowestRoomRateCacheStatsAPI(APIView):
+
+    @swagger_auto_schema(
+        operation_description="Get the hit, miss and eviction counters of the lowest room rate cache of this process",
+        responses={
+            200: openapi.Response(
+                description="Successful operation",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'size': openapi.Schema(type=openapi.TYPE_INTEGER, example=10),
+                        'max_size': openapi.Schema(type=openapi.TYPE_INTEGER, example=1024),
+                        'hits': openapi.Schema(type=openapi.TYPE_INTEGER, example=120),
+                        'misses': openapi.Schema(type=openapi.TYPE_INTEGER, example=15),
+                        'evictions': openapi.Schema(type=openapi.TYPE_INTEGER, example=0)
+                    }
+                ),
+            ),
+            500: "Internal server error",
+        }
+    )
+    def get(self, request):
+        return Response(lowest_room_rate_cache.stats(),status=status.HTTP_200_OK)
+
+class LowestRoomRateSearchAPI(APIView):
+    renderer_classes = [FastJSONRenderer]
+
+    @swagger_auto_schema(
+        operation_description="Get the lowest room rates of several rooms in a specific date range and the cheapest room. "
+            "With mode=total the rooms are ranked by the total stay price instead.",
+        manual_parameters=[
+            openapi.Parameter(
+                name="room_ids",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="Comma separated room ids, all rooms if not provided",
+                required=False,
+                example="1,2,3",
+            ),
+            openapi.Parameter(
+                name="start_date",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="Stay date",
+                required=True,
+                example="2024-07-10",
+            ),
+            openapi.Parameter(
+                name="end_date",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="Stay date",
+                required=True,
+                example="2024-07-12",
+            ),
+            openapi.Parameter(
+                name="mode",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="daily (default) for the per-day rates, total for the stay totals ranked by price",
+                required=False,
+                example="total",
+            ),
+            openapi.Parameter(
+                name="limit",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_INTEGER,
+                description="Number of cheapest rooms to return in total mode",
+                required=False,
+                example=5,
+            ),
+            openapi.Parameter(
+                name="stream",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_BOOLEAN,
+                description="Stream the daily rates as newline delimited JSON (application/x-ndjson), one line per room and day "
+                    "followed by a line with the cheapest room, only in daily mode",
+                required=False,
+                example=True,
+            )
+        ],
+        responses={
+            200: openapi.Response(
+                description="Successful operation",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'rooms': openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Schema(
+                                type=openapi.TYPE_OBJECT,
+                                properties={
+                                    'room_id': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
+                                    'room_name':openapi.Schema(type=openapi.TYPE_STRING, example="deluxe room"),
+                                    'total_rate': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=361.5),
+                                    'lowest_room_rates': openapi.Schema(
+                                        type=openapi.TYPE_ARRAY,
+                                        items=openapi.Schema(
+                                            type=openapi.TYPE_OBJECT,
+                                            properties={
+                                                'date': openapi.Schema(type=openapi.FORMAT_DATE, format=openapi.FORMAT_DATE, example='2024-07-10'),
+                                                'lowest_rate': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=120.5)
+                                            }
+                                        )
+                                    )
+                                }
+                            )
+                        ),
+                        'cheapest_room': openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                'room_id': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
+                                'room_name':openapi.Schema(type=openapi.TYPE_STRING, example="deluxe room"),
+                                'total_rate': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=361.5)
+                            }
+                        )
+                    }
+                ),
+            ),
+            400: "Invalid input",
+            404: "Room rate not found",
+            500: "Internal server error",
+        }
+    )
+    def get(self, request):
+        start_date=request.query_params.get('start_date', None)
+        end_date=request.query_params.get('end_date', None)
+        if start_date is None or end_date is None:
+            return Response({"error_message":"Date range not provided"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d')
+            end_date = datetime.strptime(end_date, '%Y-%m-%d')
+        except ValueError:
+            return Response({'error': 'Invalid date format. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        mode=request.query_params.get('mode', 'daily')
+        if mode not in ('daily','total'):
+            return Response({"error_message":"Invalid mode. Use daily or total."}, status=status.HTTP_400_BAD_REQUEST)
+
+        limit=request.query_params.get('limit', None)
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                limit = 0
+            if limit < 1:
+                return Response({"error_message":"Invalid limit. Use a positive integer."}, status=status.HTTP_400_BAD_REQUEST)
+            if mode != 'total':
+                return Response({"error_message":"The limit is only supported with mode=total."}, status=status.HTTP_400_BAD_REQUEST)
+        if is_stream_requested(request) and mode == 'total':
+            return Response({"error_message":"Streaming is only supported with mode=daily."}, status=status.HTTP_400_BAD_REQUEST)
+
+        room_ids=request.query_params.get('room_ids', None)
+        if room_ids is None:
+            room_rates = list(RoomRate.objects.order_by('room_id'))
+        else:
+            try:
+                room_ids = [int(room_id) for room_id in room_ids.split(',')]
+            except ValueError:
+                return Response({"error_message":"Invalid room ids. Use comma separated integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+            room_rates = list(RoomRate.objects.filter(room_id__in=room_ids).order_by('room_id'))
+            missing_room_ids = set(room_ids) - {room_rate.room_id for room_rate in room_rates}
+            if missing_room_ids:
+                return Response({"error_message":f"Room rate not found: {', '.join(str(room_id) for room_id in sorted(missing_room_ids))}"}, status=status.HTTP_404_NOT_FOUND)
+
+        if is_stream_requested(request):
+            return StreamingHttpResponse(render_search_lowest_room_rates_ndjson(room_rates,start_date,end_date),content_type=NDJSON_CONTENT_TYPE)
+
+        if mode == 'total':
+            rooms = {"rooms":rank_rooms_by_total_rate(room_rates,start_date,end_date,limit)}
+            with record_timing('serializer'):
+                data = LowestRoomRateStayTotalSerializer(rooms).data
+        else:
+            search = search_lowest_room_rates(room_rates,start_date,end_date)
+            with record_timing('serializer'):
+                data = serialize_lowest_room_rate_search(search)
+        return Response(data,status=status.HTTP_200_OK)
 
 
             
@@ -3,13 +3,20 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.api.middleware import record_timing
 from apps.api.models import OverriddenRoomRate, RoomRate
-from apps.api.serializers import OverriddenRoomRateSerializer, OverriddenRoomRateUpdateSerializer
+from apps.api.pagination import InvalidPage, KeysetPaginator, pagination_parameters
+from apps.api.renderers import FastJSONRenderer
+from apps.api.serializers import OverriddenRoomRateSerializer, OverriddenRoomRateUpdateSerializer, RoomRateSerializer, get_overridden_room_rate_columns, serialize_overridden_room_rates
+from apps.api.services.LowestRoomRateCalendarService import refresh_lowest_room_rate_calendars
+from apps.api.services.OverriddenRoomRateBulkService import TooManyOverriddenRoomRates, upsert_overridden_room_rates
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 # Create your views here.
 
+OVERRIDDEN_ROOM_RATE_FIELDS = ('id', 'room_rate', 'overridden_rate', 'stay_date')
+
 class OverriddenRoomRatePostAPI(APIView):
     @swagger_auto_schema(
         operation_description="Create a new overridden room rate",
@@ -47,14 +54,130 @@ class OverriddenRoomRatePostAPI(APIView):
     def post(self, request):
         serializer = OverriddenRoomRateUpdateSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            overridden_room_rate = serializer.save()
+            refresh_lowest_room_rate_calendars([overridden_room_rate.room_rate_id],overridden_room_rate.stay_date,overridden_room_rate.stay_date)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class OverriddenRoomRateBulkAPI(APIView):
+    @swagger_auto_schema(
+        operation_description="Create or update many overridden room rates in one transaction, "
+            "given as single nights or as date range rules. Single nights win over rules for the same night.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'overrides': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'room_rate': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
+                            'overridden_rate': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=120.5),
+                            'stay_date': openapi.Schema(type=openapi.FORMAT_DATE, format=openapi.FORMAT_DATE, example='2024-07-10')
+                        },
+                    ),
+                ),
+                'rules': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'room_rate': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
+                            'overridden_rate': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=120.5),
+                            'start_date': openapi.Schema(type=openapi.FORMAT_DATE, format=openapi.FORMAT_DATE, example='2024-07-10'),
+                            'end_date': openapi.Schema(type=openapi.FORMAT_DATE, format=openapi.FORMAT_DATE, example='2024-08-10')
+                        },
+                    ),
+                ),
+            },
+        ),
+        responses={
+            200: openapi.Response(
+                description="Successful operation, with the status of every single night and rule",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'overrides': openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Schema(
+                                type=openapi.TYPE_OBJECT,
+                                properties={
+                                    'index': openapi.Schema(type=openapi.TYPE_INTEGER, example=0),
+                                    'status': openapi.Schema(type=openapi.TYPE_STRING, example="created, updated, rejected"),
+                                    'errors': openapi.Schema(type=openapi.TYPE_OBJECT)
+                                },
+                            ),
+                        ),
+                        'rules': openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Schema(
+                                type=openapi.TYPE_OBJECT,
+                                properties={
+                                    'index': openapi.Schema(type=openapi.TYPE_INTEGER, example=0),
+                                    'status': openapi.Schema(type=openapi.TYPE_STRING, example="upserted, rejected"),
+                                    'nights': openapi.Schema(type=openapi.TYPE_INTEGER, example=31),
+                                    'errors': openapi.Schema(type=openapi.TYPE_OBJECT)
+                                },
+                            ),
+                        ),
+                    },
+                ),
+            ),
+            400: "Invalid input",
+            500: "Internal server error",
+        }
+    )
+    def post(self, request):
+        overrides = request.data.get('overrides', []) if isinstance(request.data, dict) else None
+        rules = request.data.get('rules', []) if isinstance(request.data, dict) else None
+        if not isinstance(overrides, list) or not isinstance(rules, list):
+            return Response({"error_message":"Overrides and rules must be lists"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            override_results, rule_results = upsert_overridden_room_rates(overrides, rules)
+        except TooManyOverriddenRoomRates as error:
+            return Response({"error_message":str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"overrides":override_results,"rules":rule_results}, status=status.HTTP_200_OK)
+
 class OverriddenRoomRateDetailAPI(APIView):
+    renderer_classes = [FastJSONRenderer]
 
     @swagger_auto_schema(
         operation_description="Get all overridden room rates of a specific room id",
+        manual_parameters=[
+            openapi.Parameter(
+                name="from",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="First stay date",
+                required=False,
+                example="2024-07-01",
+            ),
+            openapi.Parameter(
+                name="to",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="Last stay date",
+                required=False,
+                example="2024-07-31",
+            ),
+            openapi.Parameter(
+                name="only",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="Comma separated fields to return, from " + ", ".join(OVERRIDDEN_ROOM_RATE_FIELDS),
+                required=False,
+                example="stay_date,overridden_rate",
+            ),
+            openapi.Parameter(
+                name="compact",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_BOOLEAN,
+                description="Return the room once as room_rate, with the overridden rates without the room under overridden_room_rates",
+                required=False,
+                example=True,
+            ),
+        ] + pagination_parameters,
         responses={
             200: openapi.Response(
                 description="Successful operation",
@@ -92,9 +215,51 @@ class OverriddenRoomRateDetailAPI(APIView):
             overridden_room_rate = OverriddenRoomRate.objects.filter(room_rate = room_rate)
         except OverriddenRoomRate.DoesNotExist:
             return Response({"error_message":"Overridden room rate not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        #the stay date filters are range scans on the (room_rate, stay_date) unique index
+        try:
+            if request.query_params.get('from'):
+                overridden_room_rate = overridden_room_rate.filter(stay_date__gte=datetime.strptime(request.query_params['from'], '%Y-%m-%d').date())
+            if request.query_params.get('to'):
+                overridden_room_rate = overridden_room_rate.filter(stay_date__lte=datetime.strptime(request.query_params['to'], '%Y-%m-%d').date())
+        except ValueError:
+            return Response({'error': 'Invalid date format. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        fields = None
+        if request.query_params.get('only'):
+            fields = [field.strip() for field in request.query_params['only'].split(',')]
+            unknown_fields = set(fields) - set(OVERRIDDEN_ROOM_RATE_FIELDS)
+            if unknown_fields:
+                return Response({"error_message":f"Unknown fields: {', '.join(sorted(unknown_fields))}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        compact = request.query_params.get('compact', '').lower() in ('true', '1')
+        if compact:
+            #the room is emitted once at the top level instead of being nested in every row
+            fields = [field for field in fields or OVERRIDDEN_ROOM_RATE_FIELDS if field != 'room_rate']
+
+        #only read the columns of the requested fields and the key columns the pagination needs,
+        #the nested room is joined in the same query instead of one query per row
+        overridden_room_rate = overridden_room_rate.values_list(*get_overridden_room_rate_columns(fields),named=True)
         
-        serializer = OverriddenRoomRateSerializer(overridden_room_rate,many=True)
-        return Response(serializer.data, status = status.HTTP_200_OK)
+        paginator = KeysetPaginator(OverriddenRoomRate, ['room_rate', 'stay_date'])
+        next_cursor = None
+        if paginator.is_requested(request):
+            try:
+                overridden_room_rate, next_cursor = paginator.paginate(request, overridden_room_rate)
+            except InvalidPage as error:
+                return Response({"error_message":str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        #a queryset which is not paginated is only read while it is serialized
+        with record_timing('serializer'):
+            overridden_room_rates = serialize_overridden_room_rates(overridden_room_rate,fields)
+        if compact:
+            data = {"room_rate":RoomRateSerializer(room_rate).data,"overridden_room_rates":overridden_room_rates}
+            if paginator.is_requested(request):
+                data["next_cursor"] = next_cursor
+            return Response(data, status = status.HTTP_200_OK)
+        if paginator.is_requested(request):
+            return Response({"results":overridden_room_rates,"next_cursor":next_cursor}, status = status.HTTP_200_OK)
+        return Response(overridden_room_rates, status = status.HTTP_200_OK)
     
     @swagger_auto_schema(
         operation_description="Update an existing overridden room rate by room id and stay date",
@@ -161,9 +326,13 @@ class OverriddenRoomRateDetailAPI(APIView):
         except OverriddenRoomRate.DoesNotExist:
             return Response({"error_message":"Overridden room rate not found"}, status=status.HTTP_404_NOT_FOUND)
         
+        old_room_id, old_stay_date = overridden_room_rate.room_rate_id, overridden_room_rate.stay_date
         serializer = OverriddenRoomRateSerializer(overridden_room_rate, data=request.data, partial= True)
         if serializer.is_valid():
-            serializer.save()
+            overridden_room_rate = serializer.save()
+            #recalculate the night the override covered before and covers now
+            refresh_lowest_room_rate_calendars([old_room_id],old_stay_date,old_stay_date)
+            refresh_lowest_room_rate_calendars([overridden_room_rate.room_rate_id],overridden_room_rate.stay_date,overridden_room_rate.stay_date)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -210,6 +379,7 @@ class OverriddenRoomRateDetailAPI(APIView):
             return Response({"error_message":"Overridden room rate not found"}, status=status.HTTP_404_NOT_FOUND)
         
         overridden_room_rate.delete()
+        refresh_lowest_room_rate_calendars([room_rate.room_id],stay_date,stay_date)
         return Response(status=status.HTTP_204_NO_CONTENT)
     
 
@@ -0,0 +1,144 @@
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.api.models import OverriddenRoomRateRange
+from apps.api.serializers import OverriddenRoomRateRangeSerializer
+from apps.api.services.LowestRoomRateCalendarService import refresh_lowest_room_rate_calendars
+
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+# Create your views here.
+
+overridden_room_rate_range_schema = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        'id': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
+        'room_rate': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
+        'start_date': openapi.Schema(type=openapi.FORMAT_DATE, format=openapi.FORMAT_DATE, example='2024-06-01'),
+        'end_date': openapi.Schema(type=openapi.FORMAT_DATE, format=openapi.FORMAT_DATE, example='2024-08-31'),
+        'weekdays': openapi.Schema(type=openapi.TYPE_INTEGER, example=127, description="Bit mask of the weekdays, bit 0 is Monday and bit 6 is Sunday"),
+        'overridden_rate': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=120.5)
+    },
+)
+
+overridden_room_rate_range_request_schema = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        'room_rate': openapi.Schema(type=openapi.TYPE_INTEGER, example=1),
+        'start_date': openapi.Schema(type=openapi.FORMAT_DATE, format=openapi.FORMAT_DATE, example='2024-06-01'),
+        'end_date': openapi.Schema(type=openapi.FORMAT_DATE, format=openapi.FORMAT_DATE, example='2024-08-31'),
+        'weekdays': openapi.Schema(type=openapi.TYPE_INTEGER, example=96, description="Bit mask of the weekdays, bit 0 is Monday and bit 6 is Sunday, all days if not provided"),
+        'overridden_rate': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT, example=120.5)
+    },
+)
+
+class OverriddenRoomRateRangeListAPI(APIView):
+    @swagger_auto_schema(
+        operation_description="Get the date range overridden room rates, optionally of a specific room id",
+        manual_parameters=[
+            openapi.Parameter(
+                name="room_id",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_INTEGER,
+                description="Room id",
+                required=False,
+                example=1,
+            )
+        ],
+        responses={
+            200: openapi.Response(
+                description="Successful operation",
+                schema=openapi.Schema(type=openapi.TYPE_ARRAY, items=overridden_room_rate_range_schema),
+            ),
+            400: "Invalid input",
+            500: "Internal server error",
+        }
+    )
+    def get(self, request):
+        overridden_room_rate_ranges = OverriddenRoomRateRange.objects.order_by('start_date','id')
+        room_id=request.query_params.get('room_id', None)
+        if room_id is not None:
+            if not room_id.isdigit():
+                return Response({"error_message":"Invalid room id"}, status=status.HTTP_400_BAD_REQUEST)
+            overridden_room_rate_ranges = overridden_room_rate_ranges.filter(room_rate_id=room_id)
+        serializer = OverriddenRoomRateRangeSerializer(overridden_room_rate_ranges, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_description="Create a new overridden room rate for a date range. When date ranges overlap the lowest rate wins.",
+        request_body=overridden_room_rate_range_request_schema,
+        responses={
+            201: openapi.Response(description="Successful operation", schema=overridden_room_rate_range_schema),
+            400: "Invalid input",
+            500: "Internal server error",
+        }
+    )
+    def post(self, request):
+        serializer = OverriddenRoomRateRangeSerializer(data=request.data)
+        if serializer.is_valid():
+            overridden_room_rate_range = serializer.save()
+            refresh_lowest_room_rate_calendars([overridden_room_rate_range.room_rate_id],overridden_room_rate_range.start_date,overridden_room_rate_range.end_date)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class OverriddenRoomRateRangeDetailAPI(APIView):
+    @swagger_auto_schema(
+        operation_description="Get a date range overridden room rate",
+        responses={
+            200: openapi.Response(description="Successful operation", schema=overridden_room_rate_range_schema),
+            404: "Overridden room rate range not found",
+            500: "Internal server error",
+        }
+    )
+    def get(self, request, range_id=None):
+        try:
+            overridden_room_rate_range = OverriddenRoomRateRange.objects.get(id=range_id)
+        except OverriddenRoomRateRange.DoesNotExist:
+            return Response({"error_message":"Overridden room rate range not found"}, status=status.HTTP_404_NOT_FOUND)
+        serializer = OverriddenRoomRateRangeSerializer(overridden_room_rate_range)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_description="Update an existing date range overridden room rate",
+        request_body=overridden_room_rate_range_request_schema,
+        responses={
+            200: openapi.Response(description="Successful operation", schema=overridden_room_rate_range_schema),
+            400: "Invalid input",
+            404: "Overridden room rate range not found",
+            500: "Internal server error",
+        }
+    )
+    def put(self, request, range_id=None):
+        try:
+            overridden_room_rate_range = OverriddenRoomRateRange.objects.get(id=range_id)
+        except OverriddenRoomRateRange.DoesNotExist:
+            return Response({"error_message":"Overridden room rate range not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        old_room_id = overridden_room_rate_range.room_rate_id
+        old_start_date, old_end_date = overridden_room_rate_range.start_date, overridden_room_rate_range.end_date
+        serializer = OverriddenRoomRateRangeSerializer(overridden_room_rate_range, data=request.data, partial= True)
+        if serializer.is_valid():
+            overridden_room_rate_range = serializer.save()
+            #recalculate the nights the range covered before and covers now
+            refresh_lowest_room_rate_calendars([old_room_id],old_start_date,old_end_date)
+            refresh_lowest_room_rate_calendars([overridden_room_rate_range.room_rate_id],overridden_room_rate_range.start_date,overridden_room_rate_range.end_date)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @swagger_auto_schema(
+        operation_description="Delete an existing date range overridden room rate",
+        responses={
+            204: "Successful deletion",
+            404: "Overridden room rate range not found",
+            500: "Internal server error",
+        }
+    )
+    def delete(self, request, range_id=None):
+        try:
+            overridden_room_rate_range = OverriddenRoomRateRange.objects.get(id=range_id)
+        except OverriddenRoomRateRange.DoesNotExist:
+            return Response({"error_message":"Overridden room rate range not found"}, status=status.HTTP_404_NOT_FOUND)
+        overridden_room_rate_range.delete()
+        refresh_lowest_room_rate_calendars([overridden_room_rate_range.room_rate_id],overridden_room_rate_range.start_date,overridden_room_rate_range.end_date)
+        return Response(status=status.HTTP_204_NO_CONTENT)
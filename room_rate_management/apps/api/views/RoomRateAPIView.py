@@ -3,16 +3,21 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from apps.api.models import RoomRate
-from apps.api.serializers import RoomRateSerializer
+from apps.api.pagination import InvalidPage, KeysetPaginator, pagination_parameters
+from apps.api.renderers import FastJSONRenderer
+from apps.api.serializers import ROOM_RATE_COLUMNS, RoomRateSerializer, serialize_room_rates
+from apps.api.services.LowestRoomRateCalendarService import refresh_lowest_room_rate_calendars
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 # Create your views here.
 
 class RoomRateListAPI(APIView):
+    renderer_classes = [FastJSONRenderer]
 
     @swagger_auto_schema(
         operation_description="Get all room rates",
+        manual_parameters=pagination_parameters,
         responses={
             200: openapi.Response(
                 description="Successful operation",
@@ -32,9 +37,16 @@ class RoomRateListAPI(APIView):
         }
     )
     def get(self, request): 
-        room_rates = RoomRate.objects.all()
-        serializer = RoomRateSerializer(room_rates, many = True)
-        return Response(serializer.data, status = status.HTTP_200_OK)
+        room_rates = RoomRate.objects.values_list(*ROOM_RATE_COLUMNS, named=True)
+        paginator = KeysetPaginator(RoomRate, ['room_id'])
+        if paginator.is_requested(request):
+            try:
+                room_rates, next_cursor = paginator.paginate(request, room_rates)
+            except InvalidPage as error:
+                return Response({"error_message":str(error)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"results":serialize_room_rates(room_rates),"next_cursor":next_cursor}, status = status.HTTP_200_OK)
+
+        return Response(serialize_room_rates(room_rates), status = status.HTTP_200_OK)
     
     @swagger_auto_schema(
         operation_description="Create a new room rate",
@@ -64,7 +76,8 @@ class RoomRateListAPI(APIView):
     def post(self, request):
         serializer = RoomRateSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            room_rate = serializer.save()
+            refresh_lowest_room_rate_calendars([room_rate.room_id])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -136,6 +149,8 @@ class RoomRateDetailAPI(APIView):
         serializer = RoomRateSerializer(room_rate, data=request.data, partial= True)
         if serializer.is_valid():
             serializer.save()
+            #the default rate is used on every day without an override, so recalculate the whole horizon
+            refresh_lowest_room_rate_calendars([room_rate.room_id])
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apps.api.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -153,3 +154,70 @@ SWAGGER_SETTINGS = {
 }
 
 
+# Number of days from today for which the lowest room rates are precomputed
+LOWEST_ROOM_RATE_CALENDAR_DAYS = 540
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Cache of the lowest room rate responses, TIMEOUT is in seconds.
+# BACKEND 'local' keeps an LRU cache of MAX_SIZE entries in every process,
+# BACKEND 'django' shares the entries through the CACHES entry named by ALIAS.
+LOWEST_ROOM_RATE_CACHE = {
+    'BACKEND': 'local',
+    'ALIAS': 'default',
+    'MAX_SIZE': 1024,
+    'TIMEOUT': 300,
+}
+
+# Maximum number of nights written by one bulk overridden room rate request
+OVERRIDDEN_ROOM_RATE_BULK_MAX_ROWS = 100000
+
+# Number of overridden room rates read from the database at a time when streaming lowest room rates
+LOWEST_ROOM_RATE_STREAM_CHUNK_SIZE = 2000
+
+# Smallest number of rooms x days priced with the NumPy kernel instead of the Decimal loop, None disables the kernel.
+# The kernel is only used when numpy is installed.
+LOWEST_ROOM_RATE_KERNEL_THRESHOLD = 20000
+
+# Smallest number of rooms x days of the calendar rebuild and the export priced in a pool of worker processes,
+# None disables the pool. Requests are always priced in-process.
+LOWEST_ROOM_RATE_PROCESS_POOL_THRESHOLD = 1000000
+
+# Number of pricing worker processes, None uses one per CPU
+LOWEST_ROOM_RATE_PROCESS_POOL_WORKERS = None
+
+# Page sizes of the keyset paginated list endpoints, used when page_size or cursor is passed
+KEYSET_PAGINATION = {
+    'DEFAULT_PAGE_SIZE': 100,
+    'MAX_PAGE_SIZE': 1000,
+}
+
+# Per request SQL count, SQL, view, serializer and render timings, independent of DEBUG.
+# SERVER_TIMING_HEADER sends them as a Server-Timing header, LOG logs them as JSON lines to apps.api.middleware.
+REQUEST_TIMING = {
+    'ENABLED': os.environ.get('REQUEST_TIMING', '').lower() in ('true', '1'),
+    'SERVER_TIMING_HEADER': True,
+    'LOG': True,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'apps.api.middleware': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
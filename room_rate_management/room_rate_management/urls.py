@@ -19,9 +19,11 @@ from django.urls import path
 
 from apps.api.views.RoomRateAPIView import RoomRateListAPI, RoomRateDetailAPI
 from apps.api.views.DiscountAPIView import DiscountListAPI, DiscountDetailAPI
-from apps.api.views.OverriddenRoomRateAPIView import  OverriddenRoomRateDetailAPI, OverriddenRoomRatePostAPI
-from apps.api.views.DiscountRoomRateAPIView import DiscountRoomRateAPI
-from apps.api.views.LowestRoomRateAPIView import LowestRoomRateAPI    
+from apps.api.views.OverriddenRoomRateAPIView import  OverriddenRoomRateBulkAPI, OverriddenRoomRateDetailAPI, OverriddenRoomRatePostAPI
+from apps.api.views.OverriddenRoomRateRangeAPIView import OverriddenRoomRateRangeDetailAPI, OverriddenRoomRateRangeListAPI
+from apps.api.views.DiscountRoomRateAPIView import DiscountRoomRateAPI, DiscountRoomRateBulkAPI
+from apps.api.views.AsyncLowestRoomRateAPIView import AsyncDiscountListAPI, AsyncLowestRoomRateAPI, AsyncLowestRoomRateSearchAPI, AsyncRoomRateListAPI
+from apps.api.views.LowestRoomRateAPIView import LowestRoomRateAPI, LowestRoomRateCacheStatsAPI, LowestRoomRateSearchAPI
 
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
@@ -34,9 +36,20 @@ urlpatterns = [
     path('api/Discounts/',DiscountListAPI.as_view(),name="discount-list"),
     path('api/Discounts/<int:discount_id>',DiscountDetailAPI.as_view(),name="discount-detail"),
     path('api/OverriddenRoomRates/',OverriddenRoomRatePostAPI.as_view(),name="overridden-room-rate-detail"),
+    path('api/OverriddenRoomRates/bulk',OverriddenRoomRateBulkAPI.as_view(),name="overridden-room-rate-bulk"),
     path('api/OverriddenRoomRates/<int:room_id>',OverriddenRoomRateDetailAPI.as_view(),name="overridden-room-rate-detail"),
+    path('api/OverriddenRoomRateRanges/',OverriddenRoomRateRangeListAPI.as_view(),name="overridden-room-rate-range-list"),
+    path('api/OverriddenRoomRateRanges/<int:range_id>',OverriddenRoomRateRangeDetailAPI.as_view(),name="overridden-room-rate-range-detail"),
     path('api/RoomRateDiscounts/',DiscountRoomRateAPI.as_view(),name="overridden-room-rate-detail"),
-    path('api/LowestRoomRates/<int:room_id>',LowestRoomRateAPI.as_view(),name="lowest-room-rate")
+    path('api/RoomRateDiscounts/bulk',DiscountRoomRateBulkAPI.as_view(),name="room-rate-discount-bulk"),
+    path('api/LowestRoomRates/',LowestRoomRateSearchAPI.as_view(),name="lowest-room-rate-search"),
+    path('api/LowestRoomRates/<int:room_id>',LowestRoomRateAPI.as_view(),name="lowest-room-rate"),
+    path('api/LowestRoomRates/cache',LowestRoomRateCacheStatsAPI.as_view(),name="lowest-room-rate-cache"),
+    #async versions of the read endpoints for ASGI servers
+    path('api/async/RoomRates/',AsyncRoomRateListAPI.as_view(),name="async-room-list"),
+    path('api/async/Discounts/',AsyncDiscountListAPI.as_view(),name="async-discount-list"),
+    path('api/async/LowestRoomRates/',AsyncLowestRoomRateSearchAPI.as_view(),name="async-lowest-room-rate-search"),
+    path('api/async/LowestRoomRates/<int:room_id>',AsyncLowestRoomRateAPI.as_view(),name="async-lowest-room-rate"),
 ]
 
 schema_view = get_schema_view(